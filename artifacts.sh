@@ -0,0 +1,25 @@
+# Helpers for the artifacts store, sourced by run-testcase.sh. The store is the
+# artifacts bucket (ARTIFACTS_ROOT=gs://<bucket>) on GCE, or a local directory
+# standing in for it when running with run-local.sh.
+
+# Copies files to or from the artifacts store.
+# Usage: artifacts_cp <source>... <destination>
+# Sources may contain wildcards; a destination ending in / is a directory.
+artifacts_cp() {
+  if [[ "$*" == *gs://* ]]; then
+    gsutil -m cp "$@"
+    return
+  fi
+  local destination="${@: -1}"
+  local sources=("${@:1:$#-1}")
+  if [[ "$destination" == */ ]]; then
+    mkdir -p "$destination"
+  else
+    mkdir -p "$(dirname "$destination")"
+  fi
+  local source
+  for source in "${sources[@]}"; do
+    # Unquoted, so wildcards expand like they do for gsutil.
+    cp $source "$destination" || return 1
+  done
+}
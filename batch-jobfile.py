@@ -0,0 +1,180 @@
+import argparse
+import importlib.util
+import os
+import re
+import sys
+
+# Directory of this script, which also holds sweep-planner.py.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ${NAME} references of a jobfile line.
+VARIABLE = re.compile(r'\$\{(\w+)\}')
+
+def load_sweep_planner():
+  """
+  Loads sweep-planner.py as a module.
+
+  Returns:
+      module: The sweep-planner module.
+  """
+  path = os.path.join(SCRIPT_DIR, 'sweep-planner.py')
+  spec = importlib.util.spec_from_file_location('sweep_planner', path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+def read_template(file_path):
+  """
+  Reads a single-section jobfile such as jobfile.fio.
+
+  Args:
+      file_path (str): Path of the jobfile.
+
+  Returns:
+      tuple[list[str], list[str]]: A tuple (global_lines, section_lines) of the
+          lines of the [global] section and of the one job section (without its
+          header).
+  """
+  global_lines, section_lines = [], []
+  current = None
+  with open(file_path, 'r') as f:
+    for line in f:
+      line = line.rstrip('\n')
+      header = re.match(r'^\[(.+)\]$', line.strip())
+      if header:
+        if header.group(1) == 'global':
+          current = global_lines
+        elif current is section_lines:
+          raise ValueError(f"{file_path} has more than one job section.")
+        else:
+          current = section_lines
+        continue
+      if current is not None:
+        current.append(line)
+  return global_lines, section_lines
+
+def section_names(cases, planner):
+  """
+  Names the sections of a batch and the TESTCASE each one is reported as.
+
+  A section is named after the TESTCASE of its case plus its IODEPTH, which
+  the TESTCASE name leaves out (the numjobs, FILEHANDLECOUNT, is part of it),
+  so every block size, iodepth and numjobs point is its own section. A section
+  is reported under its TESTCASE, unless cases differing only in IODEPTH share
+  that name; then each is reported under its section name instead.
+
+  Args:
+      cases (list[dict]): A list of parameter dictionaries, one per case.
+      planner (module): The sweep-planner module.
+
+  Returns:
+      list[tuple[str, str]]: A list of (section, TESTCASE) tuples, one per case.
+
+  Raises:
+      ValueError: If two cases have the same section name.
+  """
+  testcases = [planner.testcase_name(params) for params in cases]
+  sections = [f"{testcase}-iod-{params['IODEPTH']}" for testcase, params in zip(testcases, cases)]
+  duplicates = sorted({section for section in sections if sections.count(section) > 1})
+  if duplicates:
+    raise ValueError(f"Cases share the section names {', '.join(duplicates)}; sections must be unique.")
+  return [(section, testcase if testcases.count(testcase) == 1 else section)
+          for section, testcase in zip(sections, testcases)]
+
+def generate_jobfile(template, cases, names, planner):
+  """
+  Builds one jobfile running every case as its own stonewalled section.
+
+  Each section starts a new reporting group, so FIO reports it as one job
+  under the section name. Lines of the template that use a case parameter (or
+  TESTCASE, DATASET) are moved from [global] into every section with the
+  case's values filled in; the time-series logs get a per-section prefix,
+  ${LOGPREFIX}-<section>. Other variables, such as ${MNTDIR} or ${RAMP_TIME},
+  are left for FIO to take from the environment.
+
+  Args:
+      template (tuple): A tuple as returned by read_template().
+      cases (list[dict]): A list of parameter dictionaries, one per case.
+      names (list[tuple]): The (section, TESTCASE) tuples of the cases, from
+                           section_names().
+      planner (module): The sweep-planner module.
+
+  Returns:
+      str: The text of the jobfile.
+  """
+  global_lines, section_lines = template
+  case_variables = set(planner.CASE_KEYS) | {'TESTCASE', 'DATASET'}
+
+  def per_case(line):
+    return any(name in case_variables or name == 'LOGPREFIX' for name in VARIABLE.findall(line))
+
+  lines = ['[global]'] + [line for line in global_lines if not per_case(line)]
+  for params, (section, testcase) in zip(cases, names):
+    values = dict(params, TESTCASE=testcase, DATASET=planner.dataset_name(params),
+                  LOGPREFIX=f"${{LOGPREFIX}}-{section}")
+
+    def fill(match):
+      return values.get(match.group(1), match.group(0))
+
+    lines.append(f"[{section}]")
+    lines.append("stonewall")
+    lines.append("new_group")
+    for line in [line for line in global_lines if per_case(line)] + section_lines:
+      if line.strip() in ('', 'stonewall') or line.lstrip().startswith(';'):
+        continue
+      lines.append(VARIABLE.sub(fill, line))
+    lines.append("")
+  return '\n'.join(lines)
+
+def main():
+  """
+  Writes a jobfile that runs all cases of a cases file in one FIO invocation.
+  """
+  parser = argparse.ArgumentParser(
+      description="Batch the cases of a sweep into one multi-section FIO jobfile."
+  )
+  parser.add_argument("cases_file", type=str, help="Cases file, as for run-sweep.sh")
+  parser.add_argument("--template", type=str, default="jobfile.fio", help="Single-section jobfile to expand")
+  parser.add_argument("--output", type=str, default="-", help="Jobfile to write ('-' for stdout)")
+  parser.add_argument("--list", type=str, default=None,
+                      help="File to write the sections to, one '<section> <TESTCASE>' line each")
+  args = parser.parse_args()
+
+  planner = load_sweep_planner()
+  cases = []
+  try:
+    template = read_template(args.template)
+    with open(args.cases_file, 'r') as f:
+      for line in f:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+          continue
+        # Parameters a case leaves out come from the environment, as in run-sweep.sh.
+        params = {key: os.environ[key] for key in planner.REQUIRED_KEYS if key in os.environ}
+        params.update(assignment.split('=', 1) for assignment in line.split())
+        missing = [key for key in planner.REQUIRED_KEYS if key not in params]
+        if missing:
+          raise ValueError(f"Case \"{line}\" does not set {', '.join(missing)}.")
+        # All sections run on the mount as it is; its settings can't change between them.
+        tuning = [key for key in planner.TUNING_KEYS if key in params]
+        if tuning:
+          raise ValueError(f"Case \"{line}\" sets {', '.join(tuning)}, which a batch can't apply per case.")
+        cases.append(params)
+    names = section_names(cases, planner)
+  except (OSError, ValueError) as e:
+    print(f"Error: Could not batch {args.cases_file}: {e}", file=sys.stderr)
+    return 1
+
+  jobfile = generate_jobfile(template, cases, names, planner)
+  if args.output == '-':
+    print(jobfile)
+  else:
+    with open(args.output, 'w') as f:
+      f.write(jobfile)
+  if args.list:
+    with open(args.list, 'w') as f:
+      f.write(''.join(f"{section} {testcase}\n" for section, testcase in names))
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
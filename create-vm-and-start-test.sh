@@ -1,5 +1,12 @@
 set -e
 set -x
+# Usage: bash create-vm-and-start-test.sh <blocksize>
+#    or: bash create-vm-and-start-test.sh --sweep <cases-file>
+# The second form runs every case of the cases file (see run-sweep.sh) in
+# sequence on one VM, which builds fio and gcsfuse only once.
+# ARTIFACTS_BUCKET, RUN_DIR (the artifacts directory of the run's scripts) and
+# ZONE can be overridden from the environment, e.g. by sweep-scheduler.py.
+
 #VARIABLES
 BLOCKSIZE=$1
 FILEHANDLECOUNT=1
@@ -8,35 +15,86 @@ NUMFILES=1
 
 #CONSTANTS
 ITERATIONS=5
+# Adaptive iteration count: with CI_TOLERANCE > 0, iterations stop once the 95%
+# confidence interval half-width of bandwidth and p99 latency is within
+# CI_TOLERANCE of the mean, after at least MIN_ITERATIONS and at most ITERATIONS.
+MIN_ITERATIONS=2
+CI_TOLERANCE=0
 IODEPTH=1
 READ_AHEAD_KB=1024
 FILESIZE="1gb"
+# Averaging window of the FIO bw/iops/lat time-series logs; 0 disables them.
+LOG_AVG_MSEC=0
+# FIO ramp_time in seconds. With ADAPTIVE_RAMP=1 (needs LOG_AVG_MSEC > 0) a
+# calibration run without ramp detects the warm-up and replaces RAMP_TIME.
+RAMP_TIME=60
+ADAPTIVE_RAMP=0
+# With BATCH=1 every iteration runs all cases of a sweep as sections of one
+# jobfile, in one FIO invocation (see run-batch.sh).
+BATCH=0
+# Samples per second of resource-sampler.py during every iteration (CPU,
+# gcsfuse, network and pressure counters); 0 disables it.
+RESOURCE_HZ=100
 BUCKET="<BUCKET-TO-TEST-AGAINST>"
-ARTIFACTS_BUCKET="<BUCKET-FOR-ARTIFACTS>"
+ARTIFACTS_BUCKET=${ARTIFACTS_BUCKET:-"<BUCKET-FOR-ARTIFACTS>"}
+ZONE=${ZONE:-us-west4-a}
+REGION=${ZONE%-*}
 
 
-TESTCASE="numfile-${NUMFILES}-io-${IOTYPE}-fs-${FILESIZE}-bs-${BLOCKSIZE}-fh-${FILEHANDLECOUNT}"
+if [[ "$1" == "--sweep" ]]; then
+  CASES_FILE=$2
+  RUN_DIR=${RUN_DIR:-"sweep-$(date +%Y%m%d-%H%M%S)"}
+  # Every case sets its own BLOCKSIZE; the other variables default to the
+  # values above.
+  BLOCKSIZE=""
+else
+  TESTCASE="numfile-${NUMFILES}-io-${IOTYPE}-fs-${FILESIZE}-bs-${BLOCKSIZE}-fh-${FILEHANDLECOUNT}"
+  RUN_DIR=${RUN_DIR:-$TESTCASE}
+  CASES_FILE=$(mktemp)
+  echo "BLOCKSIZE=${BLOCKSIZE}" > "$CASES_FILE"
+fi
+VM_NAME="rapid-perf-${RUN_DIR}"
 
-gsutil cp ./jobfile.fio. gs://${ARTIFACTS_BUCKET}/${TESTCASE}/
-gsutil cp ./parser-script.py gs://${ARTIFACTS_BUCKET}/${TESTCASE}/
-gsutil cp ./mount-config.yml gs://${ARTIFACTS_BUCKET}/${TESTCASE}/
+gsutil cp ./jobfile.fio gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./parser-script.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./mount-config.yml gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./run-testcase.sh gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./run-sweep.sh gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./run-manifest.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./artifacts.sh gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./run-batch.sh gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./batch-jobfile.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./sweep-planner.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./dataset-prep.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./resource-sampler.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./gcsfuse-log-analyzer.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./metrics-scraper.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./fuse-instrument.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./mount-gcsfuse.sh gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp ./mount-variants.py gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+if [[ -d ./mount-configs ]]; then
+  # Written by mount-variants.py for cases with MOUNT_CONFIG.
+  gsutil -m cp -r ./mount-configs gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+fi
+gsutil cp ./toolchain-cache.sh gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/
+gsutil cp "$CASES_FILE" gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/cases.txt
 
-gcloud compute instances create rapid-perf-$TESTCASE \
+gcloud compute instances create $VM_NAME \
     --project=gcs-fuse-test \
-    --zone=us-west4-a \
+    --zone=${ZONE} \
     --machine-type=c4-standard-192 \
     --network-interface=network-tier=PREMIUM,nic-type=GVNIC,stack-type=IPV4_ONLY,subnet=default \
     --maintenance-policy=MIGRATE \
     --provisioning-model=STANDARD \
     --service-account=927584127901-compute@developer.gserviceaccount.com \
     --scopes=https://www.googleapis.com/auth/cloud-platform \
-    --create-disk=auto-delete=yes,boot=yes,device-name=rapid-perf,disk-resource-policy=projects/gcs-fuse-test/regions/us-west4/resourcePolicies/default-schedule-1,image=projects/ubuntu-os-cloud/global/images/ubuntu-2404-noble-amd64-v20250624,mode=rw,provisioned-iops=9000,provisioned-throughput=1640,size=1000,type=hyperdisk-balanced \
+    --create-disk=auto-delete=yes,boot=yes,device-name=rapid-perf,disk-resource-policy=projects/gcs-fuse-test/regions/${REGION}/resourcePolicies/default-schedule-1,image=projects/ubuntu-os-cloud/global/images/ubuntu-2404-noble-amd64-v20250624,mode=rw,provisioned-iops=9000,provisioned-throughput=1640,size=1000,type=hyperdisk-balanced \
     --no-shielded-secure-boot \
     --shielded-vtpm \
     --shielded-integrity-monitoring \
     --labels=goog-ops-agent-policy=v2-x86-template-1-4-0,goog-ec-src=vm_add-gcloud \
     --reservation-affinity=any \
     --network-performance-configs=total-egress-bandwidth-tier=TIER_1 \
-    --metadata=enable-osconfig=TRUE,enable-oslogin=true,BUCKET=${BUCKET},NUMFILES=${NUMFILES},ITERATIONS=${ITERATIONS},IODEPTH=${IODEPTH},READ_AHEAD_KB=${READ_AHEAD_KB},BLOCKSIZE=${BLOCKSIZE},FILESIZE=${FILESIZE},FILEHANDLECOUNT=${FILEHANDLECOUNT},IOTYPE=${IOTYPE} \
-    --metadata-from-file=startup-script=starter-script.sh \
+    --metadata=enable-osconfig=TRUE,enable-oslogin=true,BUCKET=${BUCKET},NUMFILES=${NUMFILES},ITERATIONS=${ITERATIONS},IODEPTH=${IODEPTH},READ_AHEAD_KB=${READ_AHEAD_KB},BLOCKSIZE=${BLOCKSIZE},FILESIZE=${FILESIZE},FILEHANDLECOUNT=${FILEHANDLECOUNT},IOTYPE=${IOTYPE},LOG_AVG_MSEC=${LOG_AVG_MSEC},RAMP_TIME=${RAMP_TIME},ADAPTIVE_RAMP=${ADAPTIVE_RAMP},MIN_ITERATIONS=${MIN_ITERATIONS},CI_TOLERANCE=${CI_TOLERANCE},RUN_DIR=${RUN_DIR},ARTIFACTS_BUCKET=${ARTIFACTS_BUCKET},BATCH=${BATCH},RESOURCE_HZ=${RESOURCE_HZ} \
+    --metadata-from-file=startup-script=starter-script.sh,metadata-bootstrap=metadata-bootstrap.py \
 #
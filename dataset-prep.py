@@ -0,0 +1,198 @@
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Directory of this script, which also holds sweep-planner.py.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# FIO size suffixes; like FIO (kb_base=1024), kb and kib both mean 1024 bytes.
+SIZE_SUFFIXES = {'': 1, 'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30, 't': 1 << 40}
+SIZE = re.compile(r'^(\d+)([kmgt]?)(?:i?b)?$')
+
+# Size of the buffer each file is written with.
+WRITE_BLOCK = 8 << 20
+
+# IOTYPEs that read the dataset; write-only cases need no layout.
+READ_IOTYPES = {'read', 'randread', 'rw', 'readwrite', 'randrw'}
+
+def load_sweep_planner():
+  """
+  Loads sweep-planner.py as a module.
+
+  Returns:
+      module: The sweep-planner module.
+  """
+  path = os.path.join(SCRIPT_DIR, 'sweep-planner.py')
+  spec = importlib.util.spec_from_file_location('sweep_planner', path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+def parse_size(size):
+  """
+  Converts a FIO size such as 1gb, 64m or 4096 to bytes.
+  """
+  match = SIZE.match(size.strip().lower())
+  if not match:
+    raise ValueError(f"Invalid size {size!r}.")
+  return int(match.group(1)) * SIZE_SUFFIXES[match.group(2)]
+
+def dataset_files(directory, dataset, numfiles, jobs):
+  """
+  Returns the paths FIO uses for a dataset with
+  filename_format=${DATASET}.$jobnum/$filenum, for every job and file.
+  """
+  return [os.path.join(directory, f"{dataset}.{jobnum}", str(filenum))
+          for jobnum in range(jobs) for filenum in range(numfiles)]
+
+def file_size(path):
+  """Returns the size of a file, or None if it does not exist."""
+  try:
+    return os.stat(path).st_size
+  except FileNotFoundError:
+    return None
+
+def write_file(path, size, block):
+  """Writes size bytes to path, repeating block."""
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'wb') as f:
+    remaining = size
+    while remaining > 0:
+      chunk = block if remaining >= len(block) else block[:remaining]
+      f.write(chunk)
+      remaining -= len(chunk)
+
+def prepare_dataset(directory, dataset, numfiles, filesize, jobs, workers, verify=False):
+  """
+  Lays out the files of a dataset before FIO runs, so the layout is not part
+  of the measured run, and checks their sizes.
+
+  Once every file has its size, a manifest <directory>/<dataset>.manifest.json
+  records the dataset. A dataset whose manifest matches is taken as complete
+  without looking at its files, unless `verify` is set. Otherwise files that
+  already exist with the right size are kept, so an interrupted layout resumes,
+  and missing or short files are written concurrently.
+
+  Args:
+      directory (str): Directory FIO runs in (the mount).
+      dataset (str): Name of the dataset, as in filename_format.
+      numfiles (int): Files per job (nrfiles).
+      filesize (int): Size of every file in bytes.
+      jobs (int): Number of jobs (numjobs), each with its own files.
+      workers (int): Number of files written at once.
+      verify (bool): Check the files even if the manifest matches.
+
+  Returns:
+      int: The number of files written; 0 if the dataset was already complete,
+          None if its manifest said so and the files were not checked.
+
+  Raises:
+      OSError: If a file can't be written or does not have its size afterwards.
+  """
+  manifest_path = os.path.join(directory, f"{dataset}.manifest.json")
+  paths = dataset_files(directory, dataset, numfiles, jobs)
+  manifest = {'dataset': dataset, 'numfiles': numfiles, 'filesize': filesize, 'jobs': jobs,
+              'files': len(paths)}
+  try:
+    with open(manifest_path, 'r') as f:
+      unchanged = json.load(f) == manifest
+  except (OSError, ValueError):
+    unchanged = False
+  if unchanged and not verify:
+    return None
+
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    sizes = list(executor.map(file_size, paths))
+    missing = [path for path, size in zip(paths, sizes) if size != filesize]
+    if missing:
+      block = os.urandom(min(WRITE_BLOCK, filesize) or 1)
+      list(executor.map(lambda path: write_file(path, filesize, block), missing))
+      sizes = list(executor.map(file_size, paths))
+
+  wrong = [path for path, size in zip(paths, sizes) if size != filesize]
+  if wrong:
+    raise OSError(f"{len(wrong)} file(s) of dataset {dataset} do not have {filesize} bytes, e.g. {wrong[0]}.")
+
+  if not unchanged or missing:
+    with open(manifest_path, 'w') as f:
+      json.dump(manifest, f, indent=2)
+  return len(missing)
+
+def read_datasets(cases_file, planner):
+  """
+  Reads the datasets the read cases of a cases file need, in order.
+
+  Parameters a case leaves out come from the environment, as in run-sweep.sh.
+
+  Returns:
+      list[tuple]: A list of (dataset, numfiles, filesize, jobs) tuples without
+          duplicates.
+  """
+  datasets = []
+  with open(cases_file, 'r') as f:
+    for line in f:
+      line = line.split('#', 1)[0].strip()
+      if not line:
+        continue
+      params = {key: os.environ[key] for key in planner.CASE_KEYS if key in os.environ}
+      params.update(assignment.split('=', 1) for assignment in line.split())
+      if params.get('IOTYPE') not in READ_IOTYPES:
+        continue
+      dataset = (planner.dataset_name(params), int(params['NUMFILES']),
+                 parse_size(params['FILESIZE']), int(params['FILEHANDLECOUNT']))
+      if dataset not in datasets:
+        datasets.append(dataset)
+  return datasets
+
+def main():
+  """
+  Lays out the datasets of one case or of all read cases of a cases file.
+  """
+  parser = argparse.ArgumentParser(
+      description="Lay out and verify FIO datasets concurrently before the timed runs."
+  )
+  parser.add_argument("--directory", type=str, required=True, help="Directory FIO runs in (MNTDIR)")
+  parser.add_argument("--cases-file", type=str, default=None,
+                      help="Prepare the datasets of every read case of this cases file")
+  parser.add_argument("--dataset", type=str, help="Dataset name (DATASET of the jobfile)")
+  parser.add_argument("--numfiles", type=int, help="Files per job (NUMFILES)")
+  parser.add_argument("--filesize", type=str, help="Size of each file, e.g. 1gb (FILESIZE)")
+  parser.add_argument("--jobs", type=int, default=1, help="Number of jobs (FILEHANDLECOUNT)")
+  parser.add_argument("--workers", type=int, default=32, help="Number of files written at once")
+  parser.add_argument("--verify", action="store_true",
+                      help="Check every file even if the dataset's manifest says it is complete")
+  args = parser.parse_args()
+
+  try:
+    if args.cases_file:
+      datasets = read_datasets(args.cases_file, load_sweep_planner())
+    elif args.dataset and args.numfiles and args.filesize:
+      datasets = [(args.dataset, args.numfiles, parse_size(args.filesize), args.jobs)]
+    else:
+      parser.error("Either --cases-file or --dataset, --numfiles and --filesize are required.")
+  except (OSError, ValueError, KeyError) as e:
+    print(f"Error: Could not read the datasets to prepare: {e}", file=sys.stderr)
+    return 1
+
+  for dataset, numfiles, filesize, jobs in datasets:
+    start = time.time()
+    try:
+      written = prepare_dataset(args.directory, dataset, numfiles, filesize, jobs, args.workers, args.verify)
+    except OSError as e:
+      print(f"Error: Could not prepare dataset {dataset}: {e}", file=sys.stderr)
+      return 1
+    if written is None:
+      print(f"Dataset {dataset}: complete according to its manifest; not verified (see --verify).")
+    elif written:
+      print(f"Dataset {dataset}: wrote {written} of {numfiles * jobs} file(s) in {time.time() - start:.1f}s.")
+    else:
+      print(f"Dataset {dataset}: all {numfiles * jobs} file(s) present, verified in {time.time() - start:.1f}s.")
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+
+# Files of a FUSE connection in the fusectl filesystem. They belong to the
+# user who mounted the filesystem, so no root is needed to read them.
+FUSE_CONNECTIONS = '/sys/fs/fuse/connections'
+FUSE_FILES = ('waiting', 'max_background', 'congestion_threshold')
+# Settings of the backing device info (bdi) of the mount.
+BDI_FILES = ('read_ahead_kb', 'min_ratio', 'max_ratio', 'strict_limit')
+
+# Settings `apply` can change, by option name: (group, file name).
+TUNABLES = {
+    'read_ahead_kb': ('bdi', 'read_ahead_kb'),
+    'max_background': ('fuse', 'max_background'),
+    'congestion_threshold': ('fuse', 'congestion_threshold'),
+}
+
+# Percentiles of the number of waiting requests reported.
+WAITING_PERCENTILES = (50, 90, 99)
+
+def mount_paths(mount_point):
+  """
+  Returns the fusectl connection directory and the bdi directory of a mount.
+
+  Both are named after the device number of the mount (the connection after
+  its minor number), so they exist only for a FUSE mount.
+  """
+  device = os.stat(mount_point).st_dev
+  connection = os.path.join(FUSE_CONNECTIONS, str(os.minor(device)))
+  bdi = f"/sys/class/bdi/{os.major(device)}:{os.minor(device)}"
+  return connection, bdi
+
+def read_int(path):
+  """Returns the integer in a sysfs file, or None if it can't be read."""
+  try:
+    with open(path, 'r') as f:
+      return int(f.read().strip())
+  except (OSError, ValueError):
+    return None
+
+def snapshot(mount_point):
+  """
+  Reads the FUSE connection and bdi settings of a mount.
+
+  Returns:
+      dict: A dict with the 'fuse' and 'bdi' values by file name; files that
+          don't exist (e.g. on older kernels, or if the mount is not FUSE) are
+          None.
+  """
+  connection, bdi = mount_paths(mount_point)
+  return {
+      'fuse': {name: read_int(os.path.join(connection, name)) for name in FUSE_FILES},
+      'bdi': {name: read_int(os.path.join(bdi, name)) for name in BDI_FILES},
+  }
+
+def apply_settings(mount_point, settings):
+  """
+  Writes FUSE connection and bdi settings of a mount and reads them back.
+
+  Writing the bdi settings needs root; the FUSE connection settings only
+  need the user who mounted the filesystem.
+
+  Args:
+      mount_point (str): Mount point of the FUSE filesystem.
+      settings (dict): A dict of TUNABLES names to their new values.
+
+  Returns:
+      dict: The previous values of the settings, by TUNABLES name.
+
+  Raises:
+      OSError: If the mount has no FUSE connection, or a setting can't be
+               written or does not have its new value afterwards.
+  """
+  connection, bdi = mount_paths(mount_point)
+  if not os.path.isdir(connection):
+    raise OSError(f"{mount_point} has no FUSE connection in {FUSE_CONNECTIONS}.")
+  directories = {'fuse': connection, 'bdi': bdi}
+  previous = {}
+  for name, value in settings.items():
+    group, file_name = TUNABLES[name]
+    path = os.path.join(directories[group], file_name)
+    previous[name] = read_int(path)
+    with open(path, 'w') as f:
+      f.write(f"{value}\n")
+    if read_int(path) != value:
+      raise OSError(f"{path} is {read_int(path)} after writing {value}.")
+  return previous
+
+def changed_settings(before, after):
+  """
+  Returns the settings that differ between two snapshots, as
+  {'<group>.<name>': [before, after]}. The waiting count is not a setting.
+  """
+  changes = {}
+  for group in ('fuse', 'bdi'):
+    for name, value in before[group].items():
+      if name != 'waiting' and after[group].get(name) != value:
+        changes[f"{group}.{name}"] = [value, after[group].get(name)]
+  return changes
+
+class WaitingRecorder:
+  """
+  Samples the number of requests waiting in a FUSE connection into a
+  histogram of counts, so memory stays bounded however long it runs.
+  """
+
+  def __init__(self, mount_point):
+    connection, _ = mount_paths(mount_point)
+    self.path = os.path.join(connection, 'waiting')
+    self.histogram = {}
+    self.samples = 0
+    self.total = 0
+
+  def sample(self):
+    waiting = read_int(self.path)
+    if waiting is None:
+      return
+    self.histogram[waiting] = self.histogram.get(waiting, 0) + 1
+    self.samples += 1
+    self.total += waiting
+
+  def summary(self):
+    """Returns the mean, percentiles and maximum of the samples."""
+    if not self.samples:
+      return None
+    result = {'samples': self.samples, 'mean': self.total / self.samples, 'max': max(self.histogram)}
+    for percentile in WAITING_PERCENTILES:
+      rank = percentile / 100.0 * self.samples
+      cumulative = 0
+      for value in sorted(self.histogram):
+        cumulative += self.histogram[value]
+        if cumulative >= rank:
+          result[f"p{percentile}"] = value
+          break
+    return result
+
+def write_json(file_path, data):
+  """Writes data as JSON, replacing the old file atomically."""
+  temp_path = f"{file_path}.tmp"
+  with open(temp_path, 'w') as f:
+    json.dump(data, f, indent=2)
+  os.replace(temp_path, file_path)
+
+def main():
+  """
+  Shows the FUSE connection and bdi settings of a mount, or records them
+  before and after a FIO iteration with the waiting requests sampled during it.
+  """
+  parser = argparse.ArgumentParser(
+      description="Snapshot the kernel FUSE connection and bdi settings of a mount."
+  )
+  subparsers = parser.add_subparsers(dest="command", required=True)
+
+  show_parser = subparsers.add_parser("show", help="Print the current settings as JSON")
+  show_parser.add_argument("--mount", type=str, required=True, help="Mount point")
+  show_parser.add_argument("--expect-read-ahead-kb", type=int, default=None,
+                           help="Fail unless the bdi read_ahead_kb has this value")
+
+  apply_parser = subparsers.add_parser("apply", help="Change settings and check that they took")
+  apply_parser.add_argument("--mount", type=str, required=True, help="Mount point")
+  for name in TUNABLES:
+    apply_parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=None, help=f"New {name}")
+  apply_parser.add_argument("--save", type=str, default=None,
+                            help="JSON file to save the previous values to for `restore`, unless it exists")
+
+  restore_parser = subparsers.add_parser("restore", help="Restore the values saved by `apply --save`")
+  restore_parser.add_argument("--mount", type=str, required=True, help="Mount point")
+  restore_parser.add_argument("--saved", type=str, required=True, help="JSON file written by `apply --save`")
+
+  record_parser = subparsers.add_parser(
+      "record", help="Record the settings, sample waiting until SIGINT or SIGTERM, and record them again")
+  record_parser.add_argument("--mount", type=str, required=True, help="Mount point")
+  record_parser.add_argument("--output", type=str, required=True,
+                             help="JSON file to write (created with the first snapshot)")
+  record_parser.add_argument("--hz", type=float, default=100, help="Samples of waiting per second")
+  args = parser.parse_args()
+
+  try:
+    before = snapshot(args.mount)
+  except OSError as e:
+    print(f"Error: Could not read {args.mount}: {e}", file=sys.stderr)
+    return 1
+
+  if args.command in ("apply", "restore"):
+    try:
+      if args.command == "apply":
+        settings = {name: getattr(args, name) for name in TUNABLES if getattr(args, name) is not None}
+      else:
+        with open(args.saved, 'r') as f:
+          settings = {name: value for name, value in json.load(f).items() if value is not None}
+      previous = apply_settings(args.mount, settings)
+    except (OSError, ValueError) as e:
+      print(f"Error: Could not {args.command} the settings of {args.mount}: {e}", file=sys.stderr)
+      return 1
+    # Only the first `apply` of a case saves, so `restore` returns to the values from before the case.
+    if args.command == "apply" and args.save and not os.path.exists(args.save):
+      write_json(args.save, previous)
+    print(f"Settings of {args.mount}: {', '.join(f'{name}={value}' for name, value in settings.items())}")
+    return 0
+
+  if args.command == "show":
+    print(json.dumps(before, indent=2))
+    read_ahead_kb = before['bdi']['read_ahead_kb']
+    if args.expect_read_ahead_kb is not None and read_ahead_kb != args.expect_read_ahead_kb:
+      print(f"Error: read_ahead_kb of {args.mount} is {read_ahead_kb}, not {args.expect_read_ahead_kb}.",
+            file=sys.stderr)
+      return 1
+    return 0
+
+  if args.hz <= 0:
+    parser.error("--hz must be positive.")
+  stop = threading.Event()
+  signal.signal(signal.SIGTERM, lambda *_: stop.set())
+  signal.signal(signal.SIGINT, lambda *_: stop.set())
+  write_json(args.output, {'before': before})
+  if before['fuse']['waiting'] is None:
+    print(f"Warning: {args.mount} has no FUSE connection in {FUSE_CONNECTIONS}.", file=sys.stderr)
+
+  recorder = WaitingRecorder(args.mount)
+  interval = 1.0 / args.hz
+  while not stop.is_set():
+    recorder.sample()
+    stop.wait(interval)
+  after = snapshot(args.mount)
+  changes = changed_settings(before, after)
+  if changes:
+    print(f"Warning: Settings of {args.mount} changed during the run: {changes}", file=sys.stderr)
+  write_json(args.output, {'before': before, 'after': after, 'changed': changes,
+                           'waiting': recorder.summary()})
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,319 @@
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import re
+import signal
+import sys
+import time
+
+# Directory of this script, which also holds parser-script.py.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Trace lines of a FUSE op, as logged by the fuse library gcsfuse uses:
+#   fuse_debug: Op 0x00000042        connection.go:416] <- ReadFile (inode 5, ...)
+#   fuse_debug: Op 0x00000042        connection.go:500] -> OK ()
+FUSE_OP = re.compile(r'Op (0x[0-9a-fA-F]+)\s+\S+\]\s+(<-|->)\s+(\S+)')
+# Trace lines of a GCS request of gcsfuse's debug bucket:
+#   gcs: Req 0x2b: <- NewReader("a/b", [0, 1048576))
+#   gcs: Req 0x2b: -> NewReader("a/b", [0, 1048576)) (52.3ms): OK
+GCS_REQUEST = re.compile(r'Req\s+(0x[0-9a-fA-F]+):\s+(<-|->)\s+(\w+)')
+# The Go duration and result at the end of a GCS response line.
+GCS_RESULT = re.compile(r'\(((?:\d+(?:\.\d+)?(?:ns|us|µs|ms|s|m|h))+)\): (.*)$')
+GO_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h)')
+GO_DURATION_UNITS = {'ns': 1e-9, 'us': 1e-6, 'µs': 1e-6, 'ms': 1e-3, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+# Time of a line in gcsfuse's text log format: time="17/10/2026 20:04:33.123456"
+TEXT_TIME = re.compile(r'time="(\d+)/(\d+)/(\d+) (\d+):(\d+):(\d+(?:\.\d+)?)"')
+
+# Lines longer than this are cut off; they can't be FUSE or GCS trace lines.
+MAX_LINE = 1 << 20
+
+def load_parser():
+  """
+  Loads parser-script.py as a module.
+
+  Returns:
+      module: The parser-script module.
+  """
+  path = os.path.join(SCRIPT_DIR, 'parser-script.py')
+  spec = importlib.util.spec_from_file_location('parser_script', path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+def go_duration(text):
+  """Converts a Go duration such as 1m2.5s or 52.3ms to seconds."""
+  return sum(float(value) * GO_DURATION_UNITS[unit] for value, unit in GO_DURATION_PART.findall(text))
+
+def read_lines(f, offset=0, chunk_size=4 << 20, follow=None):
+  """
+  Reads the lines of a log file in chunks, so memory stays bounded however
+  large the log is.
+
+  Args:
+      f (file): The log file, opened in binary mode.
+      offset (int): Byte offset to start at. If the file is shorter (it was
+                    truncated), reading starts at the beginning.
+      chunk_size (int): Bytes read at once.
+      follow (callable): If given, a callable returning True once following
+                         should stop; until then, new data appended to the file
+                         is read as it arrives.
+
+  Yields:
+      tuple[bytes, int]: Tuples (line, end_offset) of every complete line
+          (bytes, without the newline) and the offset just past it.
+  """
+  if os.fstat(f.fileno()).st_size < offset:
+    print(f"{f.name} is shorter than offset {offset}; reading it from the start.", file=sys.stderr)
+    offset = 0
+  f.seek(offset)
+  partial = b''
+  while True:
+    chunk = f.read(chunk_size)
+    if not chunk:
+      if follow is None or follow():
+        return
+      time.sleep(0.5)
+      continue
+    lines = (partial + chunk).split(b'\n')
+    partial = lines.pop()
+    for line in lines:
+      offset += len(line) + 1
+      yield line, offset
+    if len(partial) > MAX_LINE:
+      offset += len(partial)
+      partial = b''
+
+def parse_log_line(line):
+  """
+  Extracts the time and message of a gcsfuse log line in JSON or text format.
+
+  Returns:
+      tuple[float, str]: A tuple (timestamp, message), or None if the line is
+          not a log record.
+  """
+  if line.startswith(b'{'):
+    try:
+      record = json.loads(line)
+      timestamp = record['timestamp']
+      return timestamp['seconds'] + timestamp.get('nanos', 0) / 1e9, record.get('message', '')
+    except (ValueError, KeyError, TypeError):
+      return None
+  text = line.decode('utf-8', 'replace')
+  match = TEXT_TIME.search(text)
+  if not match:
+    return None
+  day, month, year, hour, minute, second = match.groups()
+  timestamp = time.mktime((int(year), int(month), int(day), int(hour), int(minute), 0, 0, 0, -1))
+  message = text.split('message="', 1)[1].rstrip('"') if 'message="' in text else text
+  return timestamp + float(second), message
+
+class OpPairer:
+  """
+  Pairs the request and response trace lines of FUSE ops and GCS requests by
+  their ID.
+
+  At most `max_pending` requests wait for their response; beyond that the
+  oldest are dropped (e.g. ops interrupted without a response), which keeps
+  memory bounded.
+  """
+
+  def __init__(self, max_pending=100000):
+    self.max_pending = max_pending
+    self.pending = {}  # (kind, ID) -> (start time, operation)
+    self.dropped = 0
+
+  def add(self, timestamp, message):
+    """
+    Takes one log message.
+
+    Returns:
+        tuple: A tuple (operation, start, latency in seconds, ok) when the
+            message completes an operation, otherwise None.
+    """
+    match = FUSE_OP.search(message)
+    kind = 'fuse'
+    if not match:
+      match = GCS_REQUEST.search(message)
+      kind = 'gcs'
+      if not match:
+        return None
+    op_id, direction, name = match.groups()
+    key = (kind, op_id)
+    if direction == '<-':
+      if len(self.pending) >= self.max_pending:
+        del self.pending[next(iter(self.pending))]
+        self.dropped += 1
+      self.pending[key] = (timestamp, name if kind == 'fuse' else f"GCS {name}")
+      return None
+
+    request = self.pending.pop(key, None)
+    if request is None:
+      return None
+    start, operation = request
+    latency = timestamp - start
+    if kind == 'fuse':
+      ok = name == 'OK'
+    else:
+      result = GCS_RESULT.search(message)
+      ok = result is None or result.group(2).strip() == 'OK'
+      if result:
+        # GCS responses carry the duration measured by gcsfuse itself.
+        latency = go_duration(result.group(1))
+    return operation, start, latency, ok
+
+def read_windows(file_path, skip_seconds=0):
+  """
+  Reads the time windows of the FIO iterations.
+
+  Args:
+      file_path (str): File with one "<iteration> <start> <end>" line per
+                       iteration, times in seconds since the epoch.
+      skip_seconds (float): Seconds at the start of every window to leave out
+                            (the ramp_time).
+
+  Returns:
+      list[tuple]: A list of (iteration, start, end) tuples.
+  """
+  windows = []
+  with open(file_path, 'r') as f:
+    for line in f:
+      fields = line.split()
+      if len(fields) == 3:
+        windows.append((fields[0], float(fields[1]) + skip_seconds, float(fields[2])))
+  return windows
+
+def analyze_log(lines, windows, stats_factory, max_pending):
+  """
+  Builds per-iteration, per-operation latency statistics from log lines.
+
+  Args:
+      lines (iterable): Iterable of (line, end_offset) tuples, as from
+                        read_lines().
+      windows (list[tuple]): List of (iteration, start, end) tuples; an
+                             operation belongs to the window it started in.
+                             Without windows, all operations are counted under
+                             iteration 'all'.
+      stats_factory (callable): Callable returning a new latency summary
+                                (OnlineStats of parser-script.py).
+      max_pending (int): Bound of the requests waiting for their response.
+
+  Returns:
+      tuple: A tuple (stats, errors, offset, pairer): dicts keyed by (iteration,
+          operation) of the latency summaries in seconds and of the failed
+          operations, the offset after the last line read, and the OpPairer.
+  """
+  pairer = OpPairer(max_pending)
+  stats, errors = {}, {}
+  offset = None
+  for line, offset in lines:
+    # Cheap test before decoding: only trace lines of ops and requests matter.
+    if b'Op 0x' not in line and b'Req ' not in line:
+      continue
+    record = parse_log_line(line)
+    if record is None:
+      continue
+    completed = pairer.add(*record)
+    if completed is None:
+      continue
+    operation, start, latency, ok = completed
+    if windows:
+      iteration = next((name for name, begin, end in windows if begin <= start < end), None)
+      if iteration is None:
+        continue
+    else:
+      iteration = 'all'
+    key = (iteration, operation)
+    if key not in stats:
+      stats[key] = stats_factory()
+      errors[key] = 0
+    stats[key].add(latency)
+    if not ok:
+      errors[key] += 1
+  return stats, errors, offset, pairer
+
+def write_csv(file_path, stats, errors):
+  """
+  Writes one row per iteration and operation: count, failures and latency
+  mean, percentiles and maximum in milliseconds, and the total time spent.
+  """
+  with open(file_path, 'w', newline='') as f:
+    writer = csv.writer(f)
+    writer.writerow(['iteration', 'operation', 'count', 'errors', 'mean (ms)', 'p50 (ms)', 'p90 (ms)',
+                     'p99 (ms)', 'max (ms)', 'total (s)'])
+    for (iteration, operation), summary in sorted(stats.items()):
+      writer.writerow([iteration, operation, summary.count, errors[(iteration, operation)],
+                       f"{summary.mean * 1e3:.3f}", f"{summary.quantile(0.5) * 1e3:.3f}",
+                       f"{summary.quantile(0.9) * 1e3:.3f}", f"{summary.quantile(0.99) * 1e3:.3f}",
+                       f"{summary.max * 1e3:.3f}", f"{summary.mean * summary.count:.3f}"])
+
+def main():
+  """
+  Derives per-operation latency histograms of FUSE ops and GCS requests from
+  a gcsfuse trace log, per FIO iteration.
+  """
+  parser = argparse.ArgumentParser(
+      description="Pair the request and response lines of a gcsfuse trace log and summarize "
+                  "the latency of every FUSE op and GCS request type."
+  )
+  parser.add_argument("log_file", type=str, help="gcsfuse log file (logging.severity: trace)")
+  parser.add_argument("--windows", type=str, default=None,
+                      help="File of '<iteration> <start> <end>' lines (epoch seconds) to attribute ops to")
+  parser.add_argument("--skip-seconds", type=float, default=0,
+                      help="Seconds at the start of every window to leave out (the ramp_time)")
+  parser.add_argument("--offset-file", type=str, default=None,
+                      help="File holding the byte offset to start at and the inode of the log it is in; "
+                           "updated with the offset reached, so the next run only reads what was logged since")
+  parser.add_argument("--follow", action="store_true",
+                      help="Keep reading what is appended to the log until SIGINT or SIGTERM")
+  parser.add_argument("--max-pending", type=int, default=100000,
+                      help="Maximum number of requests waiting for their response")
+  parser.add_argument("--output", type=str, default="gcsfuse_ops.csv", help="CSV file to write")
+  args = parser.parse_args()
+
+  offset, inode = 0, None
+  if args.offset_file and os.path.exists(args.offset_file):
+    with open(args.offset_file, 'r') as f:
+      fields = f.read().split()
+    offset = int(fields[0]) if fields else 0
+    inode = int(fields[1]) if len(fields) > 1 else None
+  try:
+    windows = read_windows(args.windows, args.skip_seconds) if args.windows else []
+  except (OSError, ValueError) as e:
+    print(f"Error: Could not read the iteration windows: {e}", file=sys.stderr)
+    return 1
+
+  follow = None
+  if args.follow:
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+    follow = lambda: bool(stop)
+
+  parser_module = load_parser()
+  try:
+    with open(args.log_file, 'rb') as f:
+      log_inode = os.fstat(f.fileno()).st_ino
+      if inode is not None and inode != log_inode:
+        # gcsfuse rotated the log; the offset belongs to the rotated file.
+        print(f"{args.log_file} was rotated since offset {offset}; reading it from the start.",
+              file=sys.stderr)
+        offset = 0
+      stats, errors, end_offset, pairer = analyze_log(
+          read_lines(f, offset, follow=follow), windows, parser_module.OnlineStats, args.max_pending)
+  except OSError as e:
+    print(f"Error: Could not read {args.log_file}: {e}", file=sys.stderr)
+    return 1
+
+  write_csv(args.output, stats, errors)
+  if args.offset_file and end_offset is not None:
+    with open(args.offset_file, 'w') as f:
+      f.write(f"{end_offset} {log_inode}\n")
+  operations = sum(summary.count for summary in stats.values())
+  print(f"{operations} operation(s) of {len(stats)} kind(s) per iteration written to {args.output}; "
+        f"{len(pairer.pending)} unanswered, {pairer.dropped} dropped.")
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,133 @@
+import argparse
+import json
+import math
+import re
+import shlex
+import sys
+import urllib.error
+import urllib.request
+
+METADATA_URL = "http://metadata.google.internal/computeMetadata/v1/instance/attributes/?recursive=true"
+
+# Values passed as strings are restricted to characters that are safe in
+# bucket names, paths and FIO parameters, so they can be pasted into the
+# quoted startup script as they are.
+SAFE_STRING = re.compile(r'^[A-Za-z0-9._/-]+$')
+
+# Run parameters the startup script expects as VM metadata: name -> (type,
+# default). Parameters without a default (None) are required.
+SCHEMA = {
+    'BUCKET': (str, None),
+    'ARTIFACTS_BUCKET': (str, None),
+    'RUN_DIR': (str, None),
+    'ITERATIONS': (int, None),
+    'IODEPTH': (int, None),
+    'READ_AHEAD_KB': (int, None),
+    'FILESIZE': (str, None),
+    'BLOCKSIZE': (str, ''),
+    'FILEHANDLECOUNT': (int, None),
+    'IOTYPE': (str, None),
+    'NUMFILES': (int, None),
+    'LOG_AVG_MSEC': (int, 0),
+    'RAMP_TIME': (int, 60),
+    'ADAPTIVE_RAMP': (int, 0),
+    'MIN_ITERATIONS': (int, 2),
+    'CI_TOLERANCE': (float, 0),
+    'BATCH': (int, 0),
+    'RESOURCE_HZ': (int, 100),
+}
+
+def fetch_attributes(url, timeout):
+  """
+  Fetches all metadata attributes of the VM in one request.
+
+  Args:
+      url (str): URL of the recursive attributes listing of the metadata server.
+      timeout (float): Timeout of the request in seconds.
+
+  Returns:
+      dict: A dictionary of attribute names to their string values.
+  """
+  request = urllib.request.Request(url, headers={"Metadata-Flavor": "Google"})
+  with urllib.request.urlopen(request, timeout=timeout) as response:
+    return json.load(response)
+
+def validate_attributes(attributes):
+  """
+  Checks the attributes against SCHEMA and fills in defaults.
+
+  Args:
+      attributes (dict): A dictionary of attribute names to their string values.
+                         Attributes that are not in SCHEMA are ignored.
+
+  Returns:
+      tuple[dict, list[str]]: A tuple (params, errors): the validated parameters
+          in SCHEMA order, and a list of error messages (empty if all parameters
+          are valid).
+  """
+  params = {}
+  errors = []
+  for name, (kind, default) in SCHEMA.items():
+    value = attributes.get(name, '')
+    if value == '':
+      if default is None:
+        errors.append(f"Missing required metadata attribute {name}.")
+      else:
+        params[name] = str(default)
+      continue
+    if kind is str:
+      if not SAFE_STRING.match(value):
+        errors.append(f"Invalid value {value!r} for {name}.")
+        continue
+    else:
+      try:
+        number = kind(value)
+      except ValueError:
+        errors.append(f"Invalid value {value!r} for {name}: expected {kind.__name__}.")
+        continue
+      if not math.isfinite(number) or number < 0:
+        errors.append(f"Invalid value {value!r} for {name}: must be a non-negative number.")
+        continue
+    params[name] = value
+  return params, errors
+
+def main():
+  """
+  Reads the run parameters from the metadata server and prints them as shell
+  export statements, to be evaluated by the startup script.
+  """
+  parser = argparse.ArgumentParser(
+      description="Fetch and validate the run parameters from the GCE metadata server."
+  )
+  parser.add_argument(
+      "--metadata-url",
+      type=str,
+      default=METADATA_URL,
+      help="Recursive attributes URL of the metadata server (e.g. a local fake server for testing)"
+  )
+  parser.add_argument(
+      "--timeout",
+      type=float,
+      default=10,
+      help="Timeout of the metadata request in seconds"
+  )
+  args = parser.parse_args()
+
+  try:
+    attributes = fetch_attributes(args.metadata_url, args.timeout)
+  except (urllib.error.URLError, OSError, ValueError) as e:
+    print(f"Error: Could not read metadata from {args.metadata_url}: {e}", file=sys.stderr)
+    return 1
+
+  params, errors = validate_attributes(attributes)
+  for error in errors:
+    print(f"Error: {error}", file=sys.stderr)
+  if errors:
+    return 1
+
+  for name, value in params.items():
+    print(f"export {name}={shlex.quote(value)}")
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,253 @@
+import argparse
+import json
+import math
+import os
+import re
+import signal
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A sample line of the Prometheus text format: name, optional {labels}, value
+# and an optional timestamp.
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)(?:\s+\d+)?$')
+# `prometheus-port: <port>` under `metrics:` in mount-config.yml.
+PROMETHEUS_PORT = re.compile(r'^metrics:\s*\n(?:[ \t]+.*\n)*?[ \t]+prometheus-port:\s*(\d+)', re.M)
+
+def parse_metrics(text):
+  """
+  Parses the Prometheus text exposition format.
+
+  Args:
+      text (str): The body of a /metrics response.
+
+  Returns:
+      tuple[dict, dict]: A tuple (values, types): the value of every series,
+          keyed by its name and labels as written (e.g.
+          'fs_ops_count{fs_op="ReadFile"}'), and the type of every metric family
+          declared with # TYPE.
+  """
+  values, types = {}, {}
+  for line in text.splitlines():
+    line = line.strip()
+    if line.startswith('# TYPE '):
+      fields = line.split()
+      if len(fields) >= 4:
+        types[fields[2]] = fields[3]
+      continue
+    if not line or line.startswith('#'):
+      continue
+    match = SAMPLE.match(line)
+    if not match:
+      continue
+    try:
+      value = float(match.group(3))
+    except ValueError:
+      continue
+    if math.isfinite(value):
+      values[match.group(1) + (match.group(2) or '')] = value
+  return values, types
+
+def series_type(series, types):
+  """
+  Returns the type of a series. The _bucket, _sum and _count series of
+  histograms and summaries only grow, so they count as counters.
+  """
+  name = series.split('{', 1)[0]
+  if name in types:
+    return types[name]
+  for suffix in ('_bucket', '_sum', '_count', '_total'):
+    if name.endswith(suffix) and types.get(name[:-len(suffix)]) in ('histogram', 'summary', 'counter'):
+      return 'counter'
+  return 'untyped'
+
+class MetricsWindow:
+  """
+  Accumulates the scrapes of one FIO iteration into per-series deltas and
+  rates (counters) or min/max/last values (gauges). Only the baseline scrape,
+  the previous one and the running results are kept.
+  """
+
+  def __init__(self, skip_seconds=0):
+    self.skip_seconds = skip_seconds
+    self.first_time = None
+    self.start = None
+    self.previous = None  # (time, values) of the previous scrape after the skip
+    self.types = {}
+    self.scrapes = 0
+    self.counters = {}  # series -> {'delta', 'peak_rate'}
+    self.gauges = {}  # series -> {'min', 'max', 'last'}
+
+  def add(self, timestamp, values, types):
+    if self.first_time is None:
+      self.first_time = timestamp
+    if timestamp < self.first_time + self.skip_seconds:
+      return
+    self.types.update(types)
+    self.scrapes += 1
+    if self.previous is None:
+      self.start = timestamp
+    else:
+      previous_time, previous_values = self.previous
+      elapsed = timestamp - previous_time
+      for series, value in values.items():
+        if series_type(series, self.types) != 'counter' or series not in previous_values:
+          continue
+        delta = value - previous_values[series]
+        if delta < 0:
+          # The counter was reset (e.g. gcsfuse restarted).
+          delta = value
+        counter = self.counters.setdefault(series, {'delta': 0.0, 'peak_rate': 0.0})
+        counter['delta'] += delta
+        if elapsed > 0:
+          counter['peak_rate'] = max(counter['peak_rate'], delta / elapsed)
+    for series, value in values.items():
+      if series_type(series, self.types) == 'gauge':
+        gauge = self.gauges.setdefault(series, {'min': value, 'max': value, 'last': value})
+        gauge['min'] = min(gauge['min'], value)
+        gauge['max'] = max(gauge['max'], value)
+        gauge['last'] = value
+    self.previous = (timestamp, values)
+
+  def summary(self):
+    """Returns the results as a JSON-serializable dict."""
+    end = self.previous[0] if self.previous else None
+    elapsed = end - self.start if self.previous else 0
+    counters = {
+        series: dict(counter, rate=counter['delta'] / elapsed if elapsed > 0 else 0.0)
+        for series, counter in sorted(self.counters.items())
+    }
+    return {'start': self.start, 'end': end, 'scrapes': self.scrapes, 'counters': counters,
+            'gauges': dict(sorted(self.gauges.items()))}
+
+def scrape(url, timeout):
+  """Fetches and parses the metrics at url; returns None if that fails."""
+  try:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+      return parse_metrics(response.read().decode('utf-8', 'replace'))
+  except (urllib.error.URLError, OSError) as e:
+    print(f"Warning: Could not scrape {url}: {e}", file=sys.stderr)
+    return None
+
+def save_summary(file_path, window):
+  """Writes the summary so far, replacing the old file atomically."""
+  temp_path = f"{file_path}.tmp"
+  with open(temp_path, 'w') as f:
+    json.dump(window.summary(), f, indent=2)
+  os.replace(temp_path, file_path)
+
+def metrics_url(mount_config):
+  """
+  Returns the URL of the Prometheus endpoint turned on in a gcsfuse mount
+  config, or None if it has none.
+  """
+  with open(mount_config, 'r') as f:
+    match = PROMETHEUS_PORT.search(f.read())
+  return f"http://localhost:{match.group(1)}/metrics" if match else None
+
+class FakeExporter(BaseHTTPRequestHandler):
+  """
+  Serves metrics named like gcsfuse's, growing with time, so the scraping
+  can be tried without gcsfuse (see run-local.sh).
+  """
+
+  started = time.time()
+
+  def do_GET(self):
+    seconds = time.time() - self.started
+    body = '\n'.join([
+        '# TYPE gcs_read_bytes_count counter',
+        f'gcs_read_bytes_count {int(seconds * 100 * (1 << 20))}',
+        '# TYPE gcs_request_count counter',
+        f'gcs_request_count{{gcs_method="NewReader"}} {int(seconds * 100)}',
+        '# TYPE file_cache_read_count counter',
+        f'file_cache_read_count{{cache_hit="true"}} {int(seconds * 30)}',
+        f'file_cache_read_count{{cache_hit="false"}} {int(seconds * 70)}',
+        '# TYPE fs_ops_count counter',
+        f'fs_ops_count{{fs_op="ReadFile"}} {int(seconds * 400)}',
+        '# TYPE process_resident_memory_bytes gauge',
+        f'process_resident_memory_bytes {int(100e6 + 1e6 * math.sin(seconds))}',
+        '',
+    ]).encode()
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+def main():
+  """
+  Scrapes the gcsfuse Prometheus endpoint during one FIO iteration, prints
+  the endpoint of a mount config, or serves fake metrics.
+  """
+  parser = argparse.ArgumentParser(
+      description="Scrape gcsfuse's Prometheus metrics into per-iteration deltas and rates."
+  )
+  subparsers = parser.add_subparsers(dest="command", required=True)
+
+  scrape_parser = subparsers.add_parser(
+      "scrape", help="Scrape until SIGINT or SIGTERM and write the deltas and rates")
+  scrape_parser.add_argument("--url", type=str, required=True, help="Metrics endpoint")
+  scrape_parser.add_argument("--output", type=str, required=True,
+                             help="JSON file to write, updated after every scrape")
+  scrape_parser.add_argument("--interval", type=float, default=1.0, help="Seconds between scrapes")
+  scrape_parser.add_argument("--skip-seconds", type=float, default=0,
+                             help="Seconds at the start to leave out (the ramp_time)")
+  scrape_parser.add_argument("--timeout", type=float, default=2.0, help="Timeout of one scrape in seconds")
+
+  url_parser = subparsers.add_parser(
+      "url", help="Print the metrics endpoint a gcsfuse mount config turns on, if any")
+  url_parser.add_argument("mount_config", type=str, help="gcsfuse config file (mount-config.yml)")
+
+  fake_parser = subparsers.add_parser("fake-exporter", help="Serve fake gcsfuse metrics until interrupted")
+  fake_parser.add_argument("--port", type=int, default=9191, help="Port to listen on")
+  args = parser.parse_args()
+
+  if args.command == "url":
+    try:
+      url = metrics_url(args.mount_config)
+    except OSError as e:
+      print(f"Error: Could not read {args.mount_config}: {e}", file=sys.stderr)
+      return 1
+    if url:
+      print(url)
+    return 0
+
+  if args.command == "fake-exporter":
+    server = ThreadingHTTPServer(('localhost', args.port), FakeExporter)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+      server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    server.server_close()
+    return 0
+
+  stop = threading.Event()
+  signal.signal(signal.SIGTERM, lambda *_: stop.set())
+  signal.signal(signal.SIGINT, lambda *_: stop.set())
+  window = MetricsWindow(args.skip_seconds)
+  # Written right away, so callers know scraping has started.
+  save_summary(args.output, window)
+  while not stop.is_set():
+    started = time.monotonic()
+    result = scrape(args.url, args.timeout)
+    if result is not None:
+      window.add(time.time(), *result)
+      save_summary(args.output, window)
+    stop.wait(max(args.interval - (time.monotonic() - started), 0))
+  # One last scrape, so the window ends when the iteration does.
+  result = scrape(args.url, args.timeout)
+  if result is not None:
+    window.add(time.time(), *result)
+  save_summary(args.output, window)
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,25 @@
+# Mounts BUCKET at MNT with gcsfuse and the given config, replacing the
+# current mount if there is one, then sets READ_AHEAD_KB on the mount and
+# prints its FUSE connection and bdi settings (see fuse-instrument.py).
+# Usage: bash mount-gcsfuse.sh <config-file>
+# Takes HOMEDIR (holding toolchain/gcsfuse and fuse-instrument.py), BUCKET,
+# MNT, READ_AHEAD_KB and GCSFUSE_LOG from the environment.
+set -e
+set -x
+
+CONFIG=$1
+
+if mountpoint -q "$MNT"; then
+  umount "$MNT"
+fi
+mkdir -p "$MNT"
+# The trace log (logging.severity of the config) goes to a file of its own,
+# which run-testcase.sh analyzes per case; remounts keep appending to it.
+${HOMEDIR}/toolchain/gcsfuse --config-file="$CONFIG" --log-file=${GCSFUSE_LOG} --log-format=json $BUCKET "$MNT" >&2
+
+# Get device ID from mount path (as root)
+DEVICE_ID=$(stat -c "%d" "$MNT")
+# Then use the device ID to write to the read_ahead_kb as root
+echo "${READ_AHEAD_KB}" | sudo tee /sys/class/bdi/0:${DEVICE_ID}/read_ahead_kb > /dev/null
+# Fails unless the setting took.
+python3 ${HOMEDIR}/fuse-instrument.py show --mount="$MNT" --expect-read-ahead-kb=${READ_AHEAD_KB}
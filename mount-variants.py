@@ -0,0 +1,171 @@
+import argparse
+import copy
+import hashlib
+import importlib.util
+import itertools
+import json
+import os
+import sys
+
+try:
+  import yaml
+except ImportError:  # Needed to read and write gcsfuse configs
+  yaml = None
+
+# Directory of this script, which also holds sweep-planner.py.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_sweep_planner():
+  """
+  Loads sweep-planner.py as a module.
+
+  Returns:
+      module: The sweep-planner module.
+  """
+  path = os.path.join(SCRIPT_DIR, 'sweep-planner.py')
+  spec = importlib.util.spec_from_file_location('sweep_planner', path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+def set_dotted(config, key, value):
+  """
+  Sets a setting given as a dotted path, e.g. file-cache.max-size-mb, creating
+  the sections on the way.
+  """
+  *sections, name = key.split('.')
+  for section in sections:
+    if not isinstance(config.get(section), dict):
+      config[section] = {}
+    config = config[section]
+  config[name] = value
+
+def config_hash(config):
+  """
+  Returns the hash of a gcsfuse config: the first 12 hex digits of the SHA-256
+  of its canonical JSON, so equal settings hash equally whatever their order.
+  """
+  canonical = json.dumps(config, sort_keys=True, separators=(',', ':'))
+  return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+def plan_variants(base, spec, planner):
+  """
+  Expands an overlay spec into variants of a gcsfuse config.
+
+  A spec has the sections:
+    axes: dotted setting -> list of values; every combination is a variant.
+    defaults: dotted setting -> value, set in every variant.
+    exclude: list of conditions (setting -> value or list of values);
+      combinations matching any of them are dropped.
+
+  Args:
+      base (dict): The base config (mount-config.yml) as a dictionary.
+      spec (dict): The overlay spec as a dictionary.
+      planner (module): The sweep-planner module, for its condition matching.
+
+  Returns:
+      list[tuple]: A list of (hash, overlay, config) tuples in spec order,
+          without duplicate configs; overlay holds the settings of the variant
+          as strings.
+  """
+  axes = spec.get('axes', {})
+  defaults = spec.get('defaults', {})
+  exclusions = spec.get('exclude', [])
+  variants = []
+  seen = set()
+  axis_keys = list(axes)
+  for values in itertools.product(*(axes[key] for key in axis_keys)):
+    overlay = dict(defaults)
+    overlay.update(zip(axis_keys, values))
+    if any(planner.matches({key: str(value) for key, value in overlay.items()}, condition)
+           for condition in exclusions):
+      continue
+    config = copy.deepcopy(base)
+    for key, value in overlay.items():
+      set_dotted(config, key, value)
+    variant_hash = config_hash(config)
+    if variant_hash in seen:
+      continue
+    seen.add(variant_hash)
+    variants.append((variant_hash, {key: str(value) for key, value in overlay.items()}, config))
+  return variants
+
+def read_cases(file_path):
+  """Returns the case lines of a cases file, without comments and blank lines."""
+  with open(file_path, 'r') as f:
+    lines = [line.split('#', 1)[0].strip() for line in f]
+  return [line for line in lines if line]
+
+def main():
+  """
+  Writes the gcsfuse config variants of an overlay spec, and optionally runs
+  every case of a cases file with every variant.
+  """
+  parser = argparse.ArgumentParser(
+      description="Generate variants of the gcsfuse mount config from an overlay spec."
+  )
+  parser.add_argument("spec", type=str, nargs="?", help="Overlay spec (.toml, or .yml/.yaml)")
+  parser.add_argument("--base", type=str, default="mount-config.yml", help="Base gcsfuse config")
+  parser.add_argument("--output-dir", type=str, default="mount-configs",
+                      help="Directory to write the variants to, as <hash>.yml, with index.json")
+  parser.add_argument("--cases", type=str, default=None,
+                      help="Cases file to cross with the variants (MOUNT_CONFIG=<hash> per case)")
+  parser.add_argument("--output", type=str, default="-",
+                      help="Cases file to write with --cases ('-' for stdout)")
+  parser.add_argument("--hash", type=str, default=None, metavar="CONFIG",
+                      help="Print the hash of a gcsfuse config instead, as its variants are named")
+  args = parser.parse_args()
+
+  if yaml is None:
+    print("Error: PyYAML is needed to read and write gcsfuse configs.", file=sys.stderr)
+    return 1
+  if args.hash:
+    try:
+      with open(args.hash, 'r') as f:
+        print(config_hash(yaml.safe_load(f) or {}))
+    except (OSError, yaml.YAMLError) as e:
+      print(f"Error: Could not hash the mount config {args.hash}: {e}", file=sys.stderr)
+      return 1
+    return 0
+  if not args.spec:
+    parser.error("the spec is required unless --hash is given")
+  planner = load_sweep_planner()
+  try:
+    with open(args.base, 'r') as f:
+      base = yaml.safe_load(f) or {}
+    variants = plan_variants(base, planner.load_spec(args.spec), planner)
+    cases = read_cases(args.cases) if args.cases else []
+  except (OSError, ValueError, yaml.YAMLError) as e:
+    print(f"Error: Could not plan the mount config variants of {args.spec}: {e}", file=sys.stderr)
+    return 1
+  if not variants:
+    print(f"Error: {args.spec} has no variants.", file=sys.stderr)
+    return 1
+  if any('MOUNT_CONFIG=' in line for line in cases):
+    print(f"Error: Cases of {args.cases} already set MOUNT_CONFIG.", file=sys.stderr)
+    return 1
+
+  os.makedirs(args.output_dir, exist_ok=True)
+  index = {}
+  for variant_hash, overlay, config in variants:
+    with open(os.path.join(args.output_dir, f"{variant_hash}.yml"), 'w') as f:
+      yaml.safe_dump(config, f, default_flow_style=False, sort_keys=False)
+    index[variant_hash] = overlay
+    settings = ' '.join(f"{key}={value}" for key, value in overlay.items())
+    print(f"{variant_hash} {settings}", file=sys.stderr)
+  with open(os.path.join(args.output_dir, 'index.json'), 'w') as f:
+    json.dump(index, f, indent=2)
+
+  if args.cases:
+    # Variants outermost, so gcsfuse is remounted once per variant.
+    lines = [f"MOUNT_CONFIG={variant_hash} {line}" for variant_hash, _, _ in variants for line in cases]
+    if args.output == '-':
+      print('\n'.join(lines))
+    else:
+      with open(args.output, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+  print(f"Wrote {len(variants)} mount config variant(s) to {args.output_dir}.", file=sys.stderr)
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -1,96 +1,1549 @@
+import glob
+import hashlib
+import io
 import json
+import marshal
+import mmap
 import os
 import subprocess
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 import math
 import argparse
 import csv # Import the csv module
+import re
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 
-def parse_fio_output(file_path):
+try:
+  import numpy as np
+except ImportError:  # Only needed to analyze FIO time-series logs (--log-prefix)
+  np = None
+
+# Result of parsing one FIO output file: aggregated metrics over all jobs, their
+# units, one row of metrics per job so per-job skew stays visible, the
+# completion latency histograms of the file per direction, and the lines of
+# the file that were not part of FIO's JSON output.
+FioResult = namedtuple('FioResult', ['metrics', 'units', 'jobs', 'histograms', 'diagnostics'])
+
+# Percentiles reported from the merged completion latency histograms.
+LATENCY_PERCENTILES = (50.0, 90.0, 99.0, 99.9, 99.99)
+
+# Latency blocks FIO may report, in order of preference, with the factor that
+# converts each of them to milliseconds.
+LATENCY_KEYS = (
+    ('lat_ns', 1_000_000.0),  # ns to ms
+    ('lat_us', 1_000.0),  # us to ms
+    ('lat_ms', 1.0),  # ms to ms (no conversion)
+)
+
+class QuantileSketch:
   """
-  Parses a single FIO JSON output file and extracts relevant metrics along with their units.
-  Assumes a single job per FIO run for simplicity.
-  Adjust if you have multiple jobs defined within one FIO job file.
+  Mergeable streaming quantile sketch with bounded relative error.
+
+  Values are counted in logarithmically sized buckets (as in DDSketch), so
+  any quantile is returned within `relative_accuracy` of the true value, the
+  memory used depends only on the range of the values, not on how many there
+  are, and two sketches merge exactly by adding their bucket counts.
+  """
+
+  __slots__ = ('relative_accuracy', '_log_gamma', 'buckets', 'zero_count', 'count')
+
+  def __init__(self, relative_accuracy=0.01):
+    self.relative_accuracy = relative_accuracy
+    self._log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+    self.buckets = {}  # Bucket index (signed for negative values) -> count
+    self.zero_count = 0
+    self.count = 0
+
+  def _index(self, value):
+    index = math.ceil(math.log(abs(value)) / self._log_gamma)
+    return index * 2 if value > 0 else index * 2 + 1
+
+  def _value(self, index):
+    gamma = math.exp(self._log_gamma)
+    value = 2 * gamma ** (index // 2) / (gamma + 1)
+    return value if index % 2 == 0 else -value
+
+  def add(self, value):
+    if value == 0:
+      self.zero_count += 1
+    else:
+      index = self._index(value)
+      self.buckets[index] = self.buckets.get(index, 0) + 1
+    self.count += 1
+
+  def add_array(self, values):
+    """Adds a NumPy array of values with vectorized bucketing."""
+    nonzero = values[values != 0].astype(np.float64)
+    self.zero_count += len(values) - len(nonzero)
+    self.count += len(values)
+    if not len(nonzero):
+      return
+    indices = np.ceil(np.log(np.abs(nonzero)) / self._log_gamma).astype(np.int64) * 2
+    indices += (nonzero < 0)
+    for index, count in zip(*np.unique(indices, return_counts=True)):
+      self.buckets[int(index)] = self.buckets.get(int(index), 0) + int(count)
+
+  def merge(self, other):
+    if other.relative_accuracy != self.relative_accuracy:
+      raise ValueError("Cannot merge quantile sketches of different accuracy.")
+    merge_histograms(self.buckets, other.buckets)
+    self.zero_count += other.zero_count
+    self.count += other.count
+
+  def quantile(self, q):
+    """Returns the q-quantile (0 <= q <= 1), or None if the sketch is empty."""
+    if self.count == 0:
+      return None
+    rank = q * (self.count - 1)
+    # Negative buckets in ascending value order, then zero, then positive ones.
+    negative = sorted((index for index in self.buckets if index % 2), key=lambda index: -index)
+    positive = sorted(index for index in self.buckets if index % 2 == 0)
+    cumulative = 0
+    for index in negative:
+      cumulative += self.buckets[index]
+      if cumulative > rank:
+        return self._value(index)
+    cumulative += self.zero_count
+    if cumulative > rank:
+      return 0.0
+    for index in positive:
+      cumulative += self.buckets[index]
+      if cumulative > rank:
+        return self._value(index)
+    return self._value(positive[-1]) if positive else 0.0
+
+class OnlineStats:
+  """
+  Single-pass, mergeable summary of a stream of values.
+
+  Keeps the count, mean and sum of squared differences from the mean (M2) with
+  Welford's algorithm, the minimum and maximum, and a QuantileSketch, so memory
+  is O(1) per metric however many values are added. Summaries built in
+  different processes, files or runs combine exactly with merge().
+  """
+
+  __slots__ = ('count', 'mean', 'm2', 'min', 'max', 'sketch')
+
+  def __init__(self):
+    self.count = 0
+    self.mean = 0.0
+    self.m2 = 0.0
+    self.min = math.inf
+    self.max = -math.inf
+    self.sketch = QuantileSketch()
+
+  @classmethod
+  def from_summary(cls, count, mean, stdev):
+    """
+    Builds a summary from a count, mean and sample standard deviation alone
+    (no min, max or quantiles), e.g. from a FIO latency block.
+    """
+    stats = cls()
+    if count > 0:
+      stats.count = count
+      stats.mean = mean
+      stats.m2 = stdev ** 2 * (count - 1)
+    return stats
+
+  def add(self, value):
+    self.count += 1
+    delta = value - self.mean
+    self.mean += delta / self.count
+    self.m2 += delta * (value - self.mean)
+    self.min = min(self.min, value)
+    self.max = max(self.max, value)
+    self.sketch.add(value)
+
+  def add_array(self, values):
+    """Adds a NumPy array of values in one vectorized step."""
+    if not len(values):
+      return
+    batch = OnlineStats()
+    batch.count = len(values)
+    batch.mean = float(values.mean())
+    batch.m2 = float(((values - batch.mean) ** 2).sum())
+    batch.min = float(values.min())
+    batch.max = float(values.max())
+    batch.sketch.add_array(values)
+    self.merge(batch)
+
+  def merge(self, other):
+    """Combines another summary into this one (Chan et al.'s parallel update)."""
+    if other.count == 0:
+      return
+    total = self.count + other.count
+    delta = other.mean - self.mean
+    self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+    self.mean += delta * other.count / total
+    self.count = total
+    self.min = min(self.min, other.min)
+    self.max = max(self.max, other.max)
+    self.sketch.merge(other.sketch)
+
+  @property
+  def stdev(self):
+    """Sample standard deviation; 0 with fewer than two values."""
+    return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+  def quantile(self, q):
+    return self.sketch.quantile(q)
+
+def merge_latency_stats(stats_list):
+  """
+  Pools several latency summaries into one, exactly.
+
+  Each entry is a dict with 'N' (sample count), 'mean' and 'stddev' (sample
+  standard deviation, as FIO reports it). The summaries are combined with
+  OnlineStats.merge(), so the pooled standard deviation equals the standard
+  deviation over all underlying samples rather than an average of the
+  per-job standard deviations.
+
+  Args:
+      stats_list (list[dict]): Latency summaries with 'N', 'mean' and 'stddev'.
+
+  Returns:
+      dict: The pooled summary with 'N', 'mean' and 'stddev'.
+  """
+  pooled = OnlineStats()
+  for stats in stats_list:
+    pooled.merge(OnlineStats.from_summary(stats.get('N', 0), stats.get('mean', 0), stats.get('stddev', 0)))
+  return {'N': pooled.count, 'mean': pooled.mean, 'stddev': pooled.stdev}
+
+def job_latency_stats(job_data, direction):
+  """
+  Returns the latency summary of one job for one direction ('read'/'write'),
+  converted to milliseconds, or None if the job reports no latency block.
+  """
+  direction_data = job_data.get(direction, {})
+  for key, conversion_factor in LATENCY_KEYS:
+    latency_data = direction_data.get(key)
+    if latency_data:
+      # Older FIO versions do not report a sample count; fall back to the
+      # number of completed IOs so the job still carries a weight.
+      count = latency_data.get('N', direction_data.get('total_ios', 1))
+      return {
+          'N': count,
+          'mean': latency_data.get('mean', 0) / conversion_factor,
+          'stddev': latency_data.get('stddev', 0) / conversion_factor,
+      }
+  return None
+
+def latency_direction(jobs):
+  """
+  Picks the direction whose latency is reported: read if any job has read
+  samples, otherwise write if any job has write samples, otherwise read.
+  """
+  for direction in ('read', 'write'):
+    for job_data in jobs:
+      stats = job_latency_stats(job_data, direction)
+      if stats and stats['N'] > 0:
+        return direction
+  return 'read'
+
+def summarize_jobs(jobs):
+  """
+  Aggregates the metrics of one or more FIO jobs.
+
+  Bandwidth and IOPS are summed over the jobs, CPU usage is averaged weighted
+  by each job's runtime (as FIO does for group reporting) and latency
+  statistics are pooled with merge_latency_stats().
+
+  Args:
+      jobs (list[dict]): Entries of the 'jobs' array of a FIO JSON output.
+
+  Returns:
+      tuple[dict, dict]: The aggregated metrics and their units.
   """
   metrics = {}
   units = {}  # Dictionary to store units for each metric
 
+  # --- CPU Usage ---
+  weights = [job_data.get('job_runtime', 0) for job_data in jobs]
+  if sum(weights) <= 0:
+    weights = [1] * len(jobs)
+  total_weight = sum(weights)
+  metrics['cpu_usr'] = sum(
+      job_data.get('usr_cpu', 0) * weight for job_data, weight in zip(jobs, weights)
+  ) / total_weight
+  units['cpu_usr'] = '%'
+  metrics['cpu_sys'] = sum(
+      job_data.get('sys_cpu', 0) * weight for job_data, weight in zip(jobs, weights)
+  ) / total_weight
+  units['cpu_sys'] = '%'
+  metrics['cpu_total'] = metrics['cpu_usr'] + metrics['cpu_sys']
+  units['cpu_total'] = '%'
+
+  # --- Bandwidth (read + write if both exist, otherwise just one) ---
+  read_bw = sum(job_data.get('read', {}).get('bw', 0) for job_data in jobs)
+  write_bw = sum(job_data.get('write', {}).get('bw', 0) for job_data in jobs)
+  # FIO's bw is typically in KiB/s. Convert to MiB/s.
+  metrics['bandwidth'] = (read_bw + write_bw) / 1024.0
+  units['bandwidth'] = 'MiB/s'
+
+  # --- Latency (pooled over all jobs, converted to ms) ---
+  direction = latency_direction(jobs)
+  latency_stats = [job_latency_stats(job_data, direction) for job_data in jobs]
+  latency_stats = [stats for stats in latency_stats if stats]
+  if latency_stats:
+    merged = merge_latency_stats(latency_stats)
+    metrics['avg_latency'] = merged['mean']
+    units['avg_latency'] = 'ms'
+    metrics['stdev_latency'] = merged['stddev']
+    units['stdev_latency'] = 'ms'  # Stddev has the same unit as mean
+  else:
+    # If no latency data found, set to 0 and 'N/A' unit
+    metrics['avg_latency'] = 0
+    units['avg_latency'] = 'N/A'
+    metrics['stdev_latency'] = 0
+    units['stdev_latency'] = 'N/A'
+
+  # --- IOPS (read + write if both exist, otherwise just one) ---
+  read_iops = sum(job_data.get('read', {}).get('iops', 0) for job_data in jobs)
+  write_iops = sum(job_data.get('write', {}).get('iops', 0) for job_data in jobs)
+  metrics['iops'] = read_iops + write_iops
+  units['iops'] = 'ops/s'  # Operations per second
+
+  return metrics, units
+
+def job_latency_histogram(job_data, direction):
+  """
+  Returns the completion latency histogram of one job for one direction as a
+  dict mapping latency in ns to sample count. FIO only reports the histogram
+  bins ('clat_ns' -> 'bins') with --output-format=json+; otherwise the
+  histogram is empty.
+  """
+  bins = job_data.get(direction, {}).get('clat_ns', {}).get('bins') or {}
+  return {int(value): count for value, count in bins.items() if count}
+
+def merge_histograms(target, source):
+  """
+  Adds the counts of the sparse histogram `source` into `target` in place.
+  Both map a bin value to its sample count. Returns `target`.
+  """
+  for value, count in source.items():
+    target[value] = target.get(value, 0) + count
+  return target
+
+def histogram_percentiles(histogram, percentiles=LATENCY_PERCENTILES):
+  """
+  Computes percentiles from a sparse latency histogram.
+
+  A percentile is the value of the first bin at which the cumulative count
+  reaches that fraction of all samples, the same rule FIO uses for the
+  percentiles of a single run. Because the histograms of several runs can be
+  merged exactly, this yields percentiles valid over all of them, which
+  averaging per-run percentiles does not.
+
+  Args:
+      histogram (dict): Maps a bin value to its sample count.
+      percentiles (tuple[float]): Percentiles to compute, in ascending order.
+
+  Returns:
+      dict: Maps each percentile to its bin value. Empty if the histogram
+            holds no samples.
+  """
+  total = sum(histogram.values())
+  if total <= 0:
+    return {}
+
+  results = {}
+  remaining = list(percentiles)
+  cumulative = 0
+  for value in sorted(histogram):
+    cumulative += histogram[value]
+    while remaining and cumulative >= remaining[0] / 100.0 * total:
+      results[remaining.pop(0)] = value
+    if not remaining:
+      break
+  return results
+
+# Fields of each entry of 'jobs', and of its 'read'/'write' blocks, that the
+# parser needs. Everything else in a FIO JSON output is skipped while reading.
+JOB_FIELDS = {'jobname', 'job_runtime', 'usr_cpu', 'sys_cpu'}
+DIRECTION_FIELDS = {'bw', 'iops', 'total_ios', 'lat_ns', 'lat_us', 'lat_ms', 'clat_ns'}
+# Outputs smaller than this are decoded whole with json.load, which is much
+# faster; larger ones are streamed with a JsonStreamReader to bound memory.
+STREAM_THRESHOLD_BYTES = 64 << 20
+
+class JsonStreamReader:
+  """
+  Incremental, event-based reader over a JSON document in a text file.
+
+  The file is read in fixed-size chunks and only the part of the document that
+  has not been consumed yet is buffered, so peak memory depends on the chunk
+  size and on the values the caller chooses to build with parse_value(), not
+  on the size of the file. Values the caller is not interested in are passed
+  over with skip_value(), which scans them line by line with regular
+  expressions without creating Python objects for their contents.
+
+  Lines that cannot belong to a pretty-printed JSON document, such as warnings
+  FIO writes to stderr when both streams go to the same file, are recognised
+  at the start of every line, before any of their quotes or brackets are
+  read, set aside in `diagnostics` and otherwise ignored.
+  """
+
+  _WHITESPACE = re.compile(r'[ \t\n\r]*')
+  _INDENT = re.compile(r'[ \t]*')
+  # Remainder of a string after its opening quote, including the closing
+  # quote. JSON strings hold no raw newline, so a string never spans lines.
+  _STRING_REST = re.compile(r'[^"\\\n]*(?:\\[^\n][^"\\\n]*)*"')
+  # An object or array that holds no nested object or array.
+  _FLAT_CONTAINER = re.compile(
+      r'[\[{][^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*[\]}]', re.DOTALL)
+  # A run of scalars, separators, complete strings and complete leaf
+  # containers, up to the next bracket of a nested container.
+  _SKIPPABLE = re.compile(
+      r'[^"\[\]{}]*(?:(?:"[^"\\]*(?:\\.[^"\\]*)*"|' + _FLAT_CONTAINER.pattern + r')[^"\[\]{}]*)*',
+      re.DOTALL)
+  # A number, true, false or null.
+  _SCALAR = re.compile(r'[^,:\]}\s]+')
+  # Start of a line that no JSON token starts like.
+  _NOISE_LINE = re.compile(r'(?![{}\[\],:"\-0-9]|true\b|false\b|null\b)\S')
+  # A whole line that starts like a JSON token (so is no diagnostic line) and
+  # holds no bracket outside a string, so it can't change the nesting.
+  _PLAIN_LINE = (r'[ \t]*(?=["\-0-9,:]|true\b|false\b|null\b)'
+                 r'[^"\[\]{}\n]*(?:"[^"\\\n]*(?:\\.[^"\\\n]*)*"[^"\[\]{}\n]*)*\n')
+  # A run of plain lines and of pretty-printed leaf containers made of plain
+  # lines: most of a skipped value, such as histogram bins or log arrays,
+  # passed over in one step.
+  _PLAIN_LINES = re.compile(
+      r'(?:' + _PLAIN_LINE + r'|[ \t]*(?:"[^"\\\n]*(?:\\.[^"\\\n]*)*"[ \t]*:[ \t]*)?[\[{][ \t]*\n'
+      r'(?:' + _PLAIN_LINE + r')*[ \t]*[\]}][ \t]*,?[ \t]*\n)+')
+  # Diagnostic lines kept; further ones are only counted.
+  MAX_DIAGNOSTICS = 100
+
+  def __init__(self, file, chunk_size=1 << 20):
+    self._file = file
+    self._chunk_size = chunk_size
+    self._buffer = ''
+    self._pos = 0
+    self._consumed = 0  # Characters dropped from the front of the buffer
+    self._eof = False
+    self._at_line_start = True
+    self._buffer_starts_line = True
+    self.diagnostics = []  # Non-JSON lines found in the file
+    self.diagnostic_count = 0
+
+  def _fill(self):
+    """Reads the next chunk. Returns False once the file is exhausted."""
+    if self._eof:
+      return False
+    chunk = self._file.read(self._chunk_size)
+    if not chunk:
+      self._eof = True
+      return False
+    if self._pos > 0:
+      self._buffer_starts_line = self._buffer[self._pos - 1] == '\n'
+    self._consumed += self._pos
+    self._buffer = self._buffer[self._pos:] + chunk
+    self._pos = 0
+    return True
+
+  def _error(self, message):
+    return json.JSONDecodeError(message, '', self._consumed + self._pos)
+
+  def _match(self, pattern):
+    """
+    Matches `pattern` at the current position, reading more input while the
+    match runs into the end of the buffer. Returns the match or None.
+    """
+    while True:
+      match = pattern.match(self._buffer, self._pos)
+      if match and match.end() < len(self._buffer):
+        return match
+      if not self._fill():
+        return match
+
+  def peek(self):
+    """
+    Skips whitespace and diagnostic lines, and returns the next character, or
+    '' at the end.
+    """
+    while True:
+      start = self._consumed + self._pos
+      end = self._match(self._WHITESPACE).end()
+      at_line_start = self._at_line_start or '\n' in self._buffer[start - self._consumed:end]
+      self._pos = end
+      self._at_line_start = False
+      if self._pos >= len(self._buffer) and not self._fill():
+        return ''
+      if not at_line_start:
+        return self._buffer[self._pos]
+      # Make sure a literal such as 'false' is buffered whole before judging.
+      while len(self._buffer) - self._pos < 6 and self._fill():
+        pass
+      if not self._NOISE_LINE.match(self._buffer, self._pos):
+        return self._buffer[self._pos]
+      self.skip_line()
+
+  def _add_diagnostic(self, line):
+    self.diagnostic_count += 1
+    if len(self.diagnostics) < self.MAX_DIAGNOSTICS:
+      self.diagnostics.append(line.rstrip())
+
+  def skip_line(self):
+    """Sets the rest of the current line aside as a diagnostic line."""
+    while True:
+      newline = self._buffer.find('\n', self._pos)
+      if newline >= 0 or not self._fill():
+        break
+    end = newline if newline >= 0 else len(self._buffer)
+    self._add_diagnostic(self._buffer[self._pos:end])
+    self._pos = end + 1 if newline >= 0 else end
+    self._at_line_start = True
+
+  def _skip_noise_line(self):
+    """
+    At the start of a line inside a skipped value, passes over its indent and
+    sets the line aside if it is a diagnostic line. Returns True if it was.
+    """
+    self._pos = self._match(self._INDENT).end()
+    # Make sure a literal such as 'false' is buffered whole before judging.
+    while len(self._buffer) - self._pos < 6 and self._fill():
+      pass
+    if not self._NOISE_LINE.match(self._buffer, self._pos):
+      return False
+    self.skip_line()
+    return True
+
+  def expect(self, char):
+    if self.peek() != char:
+      raise self._error(f"Expecting '{char}'")
+    self._pos += 1
+
+  def _read_string(self):
+    self.expect('"')
+    match = self._match(self._STRING_REST)
+    if not match:
+      raise self._error('Unterminated string')
+    self._pos = match.end()
+    return json.loads('"' + match.group(0))
+
+  def _read_scalar(self):
+    self.peek()
+    match = self._match(self._SCALAR)
+    if not match:
+      raise self._error('Expecting value')
+    self._pos = match.end()
+    try:
+      return json.loads(match.group(0))
+    except json.JSONDecodeError:
+      raise self._error('Expecting value') from None
+
+  def iter_object(self):
+    """
+    Iterates over the keys of the object at the current position. After each
+    key is yielded, the caller must consume its value with parse_value() or
+    skip_value() before advancing the iterator.
+    """
+    self.expect('{')
+    if self.peek() == '}':
+      self._pos += 1
+      return
+    while True:
+      key = self._read_string()
+      self.expect(':')
+      yield key
+      char = self.peek()
+      self._pos += 1
+      if char == '}':
+        return
+      if char != ',':
+        raise self._error("Expecting ',' delimiter")
+
+  def iter_array(self):
+    """
+    Iterates over the elements of the array at the current position, yielding
+    their index. The caller must consume each element, as for iter_object().
+    """
+    self.expect('[')
+    if self.peek() == ']':
+      self._pos += 1
+      return
+    index = 0
+    while True:
+      yield index
+      index += 1
+      char = self.peek()
+      self._pos += 1
+      if char == ']':
+        return
+      if char != ',':
+        raise self._error("Expecting ',' delimiter")
+
+  def parse_value(self):
+    """Builds and returns the value at the current position."""
+    char = self.peek()
+    if char == '{':
+      return {key: self.parse_value() for key in self.iter_object()}
+    if char == '[':
+      return [self.parse_value() for _ in self.iter_array()]
+    if char == '"':
+      return self._read_string()
+    return self._read_scalar()
+
+  def skip_value(self):
+    """Passes over the value at the current position without building it."""
+    char = self.peek()
+    if char == '"':
+      self._read_string()
+      return
+    if char not in ('{', '['):
+      self._read_scalar()
+      return
+
+    # Regular expressions never look past the end of the current line, so
+    # every line start is seen here and checked for a diagnostic line first.
+    depth = 0
+    while True:
+      if self._pos >= len(self._buffer) and not self._fill():
+        raise self._error('Unterminated container')
+      at_line_start = (self._buffer[self._pos - 1] == '\n' if self._pos > 0
+                       else self._buffer_starts_line)
+      if at_line_start:
+        plain = self._PLAIN_LINES.match(self._buffer, self._pos)
+        if plain:
+          self._pos = plain.end()
+          continue
+        if self._skip_noise_line():
+          continue
+      if self._pos >= len(self._buffer):
+        continue
+      line_end = self._buffer.find('\n', self._pos)
+      if line_end < 0:
+        line_end = len(self._buffer)
+      char = self._buffer[self._pos]
+      if char == '\n':
+        self._pos += 1
+      elif char == '"':
+        self._pos += 1
+        match = self._match(self._STRING_REST)
+        if not match:
+          raise self._error('Unterminated string')
+        self._pos = match.end()
+      elif char in '{[':
+        # Leaf containers within the line are passed over in one step; others
+        # (spanning lines, or the end of the buffer) bracket by bracket.
+        match = self._FLAT_CONTAINER.match(self._buffer, self._pos, line_end)
+        if match:
+          self._pos = match.end()
+          if depth == 0:
+            return
+        else:
+          depth += 1
+          self._pos += 1
+      elif char in '}]':
+        depth -= 1
+        self._pos += 1
+        if depth == 0:
+          return
+      else:
+        # Stops before a string or leaf container cut off by the end of the
+        # buffer, which the next round reads on into.
+        self._pos = self._SKIPPABLE.match(self._buffer, self._pos, line_end).end()
+
+def _read_fio_job(reader):
+  """Reads one entry of 'jobs', keeping only the fields the parser needs."""
+  job_data = {}
+  for key in reader.iter_object():
+    if key in JOB_FIELDS:
+      job_data[key] = reader.parse_value()
+    elif key in ('read', 'write'):
+      direction_data = {}
+      for direction_key in reader.iter_object():
+        if direction_key in DIRECTION_FIELDS:
+          direction_data[direction_key] = reader.parse_value()
+        else:
+          reader.skip_value()
+      job_data[key] = direction_data
+    else:
+      reader.skip_value()
+  return job_data
+
+def _filter_fio_job(job):
+  """Keeps the fields of a decoded entry of 'jobs' that _read_fio_job() reads."""
+  job_data = {}
+  for key, value in job.items():
+    if key in JOB_FIELDS:
+      job_data[key] = value
+    elif key in ('read', 'write'):
+      job_data[key] = {name: field for name, field in value.items() if name in DIRECTION_FIELDS}
+  return job_data
+
+def load_fio_jobs(file):
+  """
+  Reads the 'jobs' array of a FIO JSON output from an open text file, keeping
+  only JOB_FIELDS and the DIRECTION_FIELDS of the 'read' and 'write' blocks of
+  each job.
+
+  A file smaller than STREAM_THRESHOLD_BYTES that holds nothing but the JSON
+  document is decoded with json.load. Otherwise a JsonStreamReader skips the
+  histograms, log data and every other field without decoding them, so memory
+  stays bounded however large the output is. The JSON document may then be
+  surrounded by, or have whole lines of, other output (FIO warnings, libaio
+  notices); those lines are returned as diagnostics.
+
+  Returns:
+      tuple[list[dict], list[str]]: The jobs and the diagnostic lines.
+
+  Raises:
+      json.JSONDecodeError: If the file does not hold a valid JSON object.
+  """
   try:
-    with open(file_path, 'r') as f:
-      data = json.load(f)
+    size = os.fstat(file.fileno()).st_size
+  except (AttributeError, OSError, ValueError):
+    size = None
+  if size is not None and size < STREAM_THRESHOLD_BYTES:
+    try:
+      document = json.load(file)
+    except json.JSONDecodeError:
+      document = None
+    if isinstance(document, dict) and isinstance(document.get('jobs', []), list):
+      return [_filter_fio_job(job) for job in document.get('jobs', [])], []
+    # Other output around the JSON; the reader sets it aside.
+    file.seek(0)
+
+  reader = JsonStreamReader(file)
+  while reader.peek() not in ('{', ''):
+    reader.skip_line()
+
+  jobs = []
+  for key in reader.iter_object():
+    if key == 'jobs':
+      for _ in reader.iter_array():
+        jobs.append(_read_fio_job(reader))
+    else:
+      reader.skip_value()
+
+  while reader.peek() != '':
+    reader.skip_line()
+  diagnostics = reader.diagnostics
+  if reader.diagnostic_count > len(diagnostics):
+    diagnostics.append(f"... {reader.diagnostic_count - len(diagnostics)} more line(s)")
+  return jobs, diagnostics
+
+def split_fio_output(file_path, output_dir):
+  """
+  Splits a FIO JSON output holding several jobfile sections (e.g. one per
+  TESTCASE of a batched sweep) into one FIO JSON output per section.
+
+  Jobs are grouped by their 'jobname' and each group is written, with the
+  other top-level fields of the file, to output_dir/<jobname>/<file name>, so
+  each section can then be parsed like the output of a single-section run.
+  Jobs are read and written one at a time.
+
+  Args:
+      file_path (str): Path of the FIO JSON output.
+      output_dir (str): Directory to create the per-section directories in.
+
+  Returns:
+      list[str]: The section names, in the order they first appear.
+
+  Raises:
+      json.JSONDecodeError: If the file does not hold a valid JSON object.
+  """
+  file_name = os.path.basename(file_path)
+  outputs = {}
+  top_level = {}
+  try:
+    with open(file_path, 'r', errors='replace') as f:
+      reader = JsonStreamReader(f)
+      while reader.peek() not in ('{', ''):
+        reader.skip_line()
+      for key in reader.iter_object():
+        if key != 'jobs':
+          top_level[key] = reader.parse_value()
+          continue
+        for _ in reader.iter_array():
+          job_data = reader.parse_value()
+          section = re.sub(r'[^A-Za-z0-9._-]', '_', str(job_data.get('jobname', 'job')))
+          if section not in outputs:
+            os.makedirs(os.path.join(output_dir, section), exist_ok=True)
+            outputs[section] = open(os.path.join(output_dir, section, file_name), 'w')
+            outputs[section].write('{"jobs": [\n')
+          else:
+            outputs[section].write(',\n')
+          json.dump(job_data, outputs[section])
+    for output in outputs.values():
+      output.write('\n]')
+      for key, value in top_level.items():
+        output.write(f', {json.dumps(key)}: {json.dumps(value)}')
+      output.write('}\n')
+  finally:
+    for output in outputs.values():
+      output.close()
+  return list(outputs)
+
+def parse_fio_output(file_path):
+  """
+  Parses a single FIO JSON output file and extracts relevant metrics along with their units.
+  Metrics are aggregated over every job in the file (several sections, or
+  numjobs>1 without group_reporting); the per-job metrics are kept as well.
+
+  Returns:
+      FioResult: Aggregated metrics, their units, a list of per-job rows,
+                 the completion latency histograms and the diagnostic lines.
+                 Each per-job row is a dict with 'job' (the job label) and
+                 'metrics'. The histograms map 'read'/'write' to the histogram
+                 merged over all jobs. All fields are empty if the file could
+                 not be parsed.
+  """
+  try:
+    with open(file_path, 'r', errors='replace') as f:
+      jobs, diagnostics = load_fio_jobs(f)
   except FileNotFoundError:
     print(f"Error: File not found at {file_path}")
+    return FioResult({}, {}, [], {}, [])
+  except json.JSONDecodeError as e:
+    print(f"Error: Invalid JSON in {file_path} ({e})")
+    return FioResult({}, {}, [], {}, [])
+
+  if not jobs:
+    return FioResult({}, {}, [], {}, diagnostics)
+
+  metrics, units = summarize_jobs(jobs)
+  job_rows = []
+  for index, job_data in enumerate(jobs):
+    job_metrics, _ = summarize_jobs([job_data])
+    label = f"{job_data.get('jobname', 'job')}.{index}"
+    job_rows.append({'job': label, 'metrics': job_metrics})
+
+  histograms = {}
+  for direction in ('read', 'write'):
+    histogram = {}
+    for job_data in jobs:
+      merge_histograms(histogram, job_latency_histogram(job_data, direction))
+    if histogram:
+      histograms[direction] = histogram
+
+  return FioResult(metrics, units, job_rows, histograms, diagnostics)
+
+class ResultCache:
+  """
+  Persistent on-disk cache of parse_fio_output() results.
+
+  Results are stored once per content hash of the FIO output file, as
+  zlib-compressed marshal data, in a SQLite database inside `directory`. A
+  second table remembers the size, mtime and content hash last seen for each
+  path, so an unchanged file is recognised from a stat() alone; a file whose
+  size or mtime changed is hashed and still hits the cache if its content is
+  already known (e.g. the same output copied from another TESTCASE directory).
+  The stored results are evicted least recently used first once their total
+  size exceeds `max_bytes`. marshal data is only readable by the Python
+  version that wrote it, so the cache is reset when that version changes.
+  """
+
+  # Bump whenever the layout of FioResult or the way it is computed changes,
+  # so results of older versions of this script are not reused.
+  SCHEMA_VERSION = 2
+  DATABASE_NAME = 'fio-parse-cache.sqlite3'
+
+  def __init__(self, directory, max_bytes):
+    os.makedirs(directory, exist_ok=True)
+    self.max_bytes = max_bytes
+    self._db = sqlite3.connect(os.path.join(directory, self.DATABASE_NAME), timeout=30)
+    self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+    meta = {'schema_version': str(self.SCHEMA_VERSION),
+            'python_version': '.'.join(map(str, sys.version_info[:2]))}
+    stored = dict(self._db.execute('SELECT key, value FROM meta').fetchall())
+    if any(stored.get(key) != value for key, value in meta.items()):
+      self._db.execute('DROP TABLE IF EXISTS results')
+      self._db.execute('DROP TABLE IF EXISTS files')
+      self._db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', meta.items())
+    self._db.execute('CREATE TABLE IF NOT EXISTS results ('
+                     'content_hash TEXT PRIMARY KEY, payload BLOB, size INTEGER, last_used REAL)')
+    self._db.execute('CREATE TABLE IF NOT EXISTS files ('
+                     'path TEXT PRIMARY KEY, file_size INTEGER, mtime_ns INTEGER, content_hash TEXT)')
+    self._db.commit()
+
+  @staticmethod
+  def hash_file(file_path):
+    """Returns the hex content hash of a file, read in 1 MiB blocks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+      for block in iter(lambda: f.read(1 << 20), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+  def lookup(self, file_path):
+    """
+    Looks up the cached result of a file.
+
+    Returns:
+        tuple[FioResult | None, tuple | None]: The cached result, or None on a
+            miss, and the key to pass to store() once the file has been parsed
+            (None if the file cannot be read).
+    """
+    path = os.path.abspath(file_path)
+    try:
+      stat = os.stat(path)
+    except OSError:
+      return None, None
+
+    row = self._db.execute('SELECT file_size, mtime_ns, content_hash FROM files WHERE path = ?',
+                           (path,)).fetchone()
+    if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+      content_hash = row[2]
+    else:
+      try:
+        content_hash = self.hash_file(path)
+      except OSError:
+        return None, None
+    key = (path, stat.st_size, stat.st_mtime_ns, content_hash)
+
+    row = self._db.execute('SELECT payload FROM results WHERE content_hash = ?',
+                           (content_hash,)).fetchone()
+    if row is None:
+      return None, key
+    try:
+      result = FioResult(*marshal.loads(zlib.decompress(row[0])))
+    except (zlib.error, ValueError, EOFError, TypeError):
+      # A corrupt row counts as a miss; the file is parsed and stored again.
+      self._db.execute('DELETE FROM results WHERE content_hash = ?', (content_hash,))
+      return None, key
+    self._db.execute('UPDATE results SET last_used = ? WHERE content_hash = ?',
+                     (time.time(), content_hash))
+    self._db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', key)
+    return result, key
+
+  def store(self, key, result):
+    """Stores the result of the file identified by `key` (from lookup())."""
+    payload = zlib.compress(marshal.dumps(tuple(result)))
+    self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                     (key[3], payload, len(payload), time.time()))
+    self._db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', key)
+
+  def flush(self):
+    """Evicts least recently used results beyond max_bytes and commits."""
+    total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+    if total > self.max_bytes:
+      for content_hash, size in self._db.execute(
+          'SELECT content_hash, size FROM results ORDER BY last_used').fetchall():
+        if total <= self.max_bytes:
+          break
+        self._db.execute('DELETE FROM results WHERE content_hash = ?', (content_hash,))
+        self._db.execute('DELETE FROM files WHERE content_hash = ?', (content_hash,))
+        total -= size
+    self._db.commit()
+
+def parse_fio_outputs(file_paths, jobs=1, cache=None):
+  """
+  Parses several FIO output files with parse_fio_output(), across a pool of
+  `jobs` worker processes when jobs > 1.
+
+  Results are yielded in the order of `file_paths` regardless of which worker
+  finishes first, so merging them gives exactly the same aggregates as a
+  serial run.
+
+  When a ResultCache is given, only the files it does not hold are parsed,
+  and their results are added to it; call its flush() once done.
+
+  Args:
+      file_paths (list[str]): FIO output files to parse.
+      jobs (int): Number of worker processes; 0 uses one per CPU.
+      cache (ResultCache): Optional cache of earlier results.
+
+  Yields:
+      FioResult: The result of each file, in order.
+  """
+  if cache is None:
+    yield from _parse_fio_outputs(file_paths, jobs)
+    return
+
+  cached_results = {}
+  cache_keys = {}
+  for file_path in file_paths:
+    result, cache_keys[file_path] = cache.lookup(file_path)
+    if result is not None:
+      cached_results[file_path] = result
+  pending = [file_path for file_path in file_paths if file_path not in cached_results]
+  print(f"Result cache: {len(file_paths) - len(pending)} hit(s), {len(pending)} miss(es)")
+
+  parsed = _parse_fio_outputs(pending, jobs)
+  for file_path in file_paths:
+    if file_path in cached_results:
+      yield cached_results[file_path]
+      continue
+    result = next(parsed)
+    # Failed parses are not cached, the file may still be being written.
+    if result.metrics and cache_keys[file_path]:
+      cache.store(cache_keys[file_path], result)
+    yield result
+
+def _parse_fio_outputs(file_paths, jobs):
+  if jobs == 0:
+    jobs = os.cpu_count() or 1
+  if jobs <= 1 or len(file_paths) <= 1:
+    yield from map(parse_fio_output, file_paths)
+    return
+
+  # Hand out files in batches so per-task overhead stays small for sweeps of
+  # thousands of files, while still spreading the work over every worker.
+  chunksize = max(1, len(file_paths) // (jobs * 4))
+  with ProcessPoolExecutor(max_workers=min(jobs, len(file_paths))) as executor:
+    yield from executor.map(parse_fio_output, file_paths, chunksize=chunksize)
+
+# Time-series logs FIO writes with write_bw_log/write_iops_log/write_lat_log
+# set to a prefix, one file per job named <prefix>_<kind>.<job>.log. Each line
+# is 'time (ms), value, direction, block size[, offset[, priority]]'.
+FioLog = namedtuple('FioLog', ['time', 'value', 'direction', 'bs'])
+# A byte that cannot occur in a FIO log.
+FOREIGN_LOG_BYTE = re.compile(rb'[^0-9, \t\r\n-]')
+
+def load_fio_log(file_path, block_bytes=64 << 20):
+  """
+  Loads a FIO time-series log into NumPy int64 arrays.
+
+  The file is memory-mapped and converted in blocks of about `block_bytes`
+  that end on a line boundary, each by a single call to np.loadtxt(), so no
+  Python code runs per line (with NumPy >= 1.23) and memory beyond the result
+  is bounded by the block size. Every line must have as many values as the
+  first one. Only complete lines are read: a truncated last line (e.g.
+  FIO was killed) is dropped, and so is an unparseable tail such as the NUL
+  padding a preempted VM leaves behind.
+
+  Args:
+      file_path (str): Path of the log file.
+      block_bytes (int): Approximate size of the blocks converted at once.
+
+  Returns:
+      FioLog: Arrays of sample time (ms), value, direction (0 read, 1 write,
+              2 trim) and block size, one element per line.
+
+  Raises:
+      ValueError: If the log is not in FIO's format, or has unparseable text
+                  before its last block.
+  """
+  with open(file_path, 'rb') as f:
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+      return FioLog(*(np.empty(0, dtype=np.int64) for _ in FioLog._fields))
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+      first_newline = mm.find(b'\n')
+      columns = mm[:first_newline if first_newline >= 0 else size].count(b',') + 1
+      if columns < len(FioLog._fields):
+        raise ValueError(f"Unexpected FIO log format in {file_path}")
+
+      blocks = []
+      start = 0
+      # Blocks end on a newline, so a partial last line is never parsed.
+      size = mm.rfind(b'\n') + 1
+      while start < size:
+        end = min(start + block_bytes, size)
+        if end < size:
+          end = (mm.rfind(b'\n', start, end) + 1) or (mm.find(b'\n', end) + 1)
+        text = mm[start:end]
+        try:
+          values = parse_fio_log_block(text, columns)
+        except ValueError:
+          if end < size:
+            raise
+          # The last block has a tail that is not FIO output: keep the
+          # complete lines before its first foreign byte.
+          foreign = FOREIGN_LOG_BYTE.search(text)
+          if foreign is None:
+            raise
+          values = parse_fio_log_block(text[:text.rfind(b'\n', 0, foreign.start()) + 1], columns)
+        blocks.append(values)
+        start = end
+
+  if not blocks:
+    return FioLog(*(np.empty(0, dtype=np.int64) for _ in FioLog._fields))
+  data = np.concatenate(blocks)
+  return FioLog(*(data[:, column] for column in range(len(FioLog._fields))))
+
+def parse_fio_log_block(text, columns):
+  """
+  Parses complete lines of a FIO log into an int64 array of shape
+  (lines, columns), raising ValueError unless every line has `columns`
+  integers.
+  """
+  if not text.strip():
+    return np.empty((0, columns), dtype=np.int64)
+  values = np.loadtxt(io.BytesIO(text), dtype=np.int64, delimiter=',', comments=None, ndmin=2)
+  if values.shape[1] != columns:
+    raise ValueError(f"Expected {columns} values per line, found {values.shape[1]}")
+  return values
+
+def load_fio_logs(prefix, kind):
+  """
+  Loads the per-job logs of one kind, reporting and skipping the ones that
+  cannot be read.
+  """
+  logs = []
+  for path in fio_log_files(prefix, kind):
+    try:
+      logs.append(load_fio_log(path))
+    except (OSError, ValueError) as e:
+      print(f"Error: Skipping unreadable FIO log {path} ({e})")
+  return logs
+
+def fio_log_files(prefix, kind):
+  """Returns the per-job log files of one kind ('bw', 'iops', 'lat', ...)."""
+  return sorted(glob.glob(f"{glob.escape(prefix)}_{kind}.*.log"))
+
+def per_second_sum(logs, first_second, seconds):
+  """
+  Aggregates per-job logs into one value per second.
+
+  The samples of each job and direction are averaged within each second (so
+  any log_avg_msec gives the same scale), then summed over directions and
+  jobs, matching how the summary bandwidth and IOPS add up.
+
+  Returns:
+      numpy.ndarray: `seconds` values starting at `first_second`.
+  """
+  total = np.zeros(seconds)
+  for log in logs:
+    if not len(log.time):
+      continue
+    keys = (log.time // 1000 - first_second) * 3 + np.minimum(log.direction, 2)
+    sums = np.bincount(keys, weights=log.value, minlength=seconds * 3)[:seconds * 3]
+    counts = np.bincount(keys, minlength=seconds * 3)[:seconds * 3]
+    means = np.divide(sums, counts, out=np.zeros(seconds * 3), where=counts > 0)
+    total += means.reshape(seconds, 3).sum(axis=1)
+  return total
+
+def per_second_percentiles(logs, first_second, seconds, percentiles):
+  """
+  Computes percentiles of the samples of several logs within each second,
+  with the same cumulative-count rule as histogram_percentiles().
+
+  Returns:
+      numpy.ndarray: A (seconds, len(percentiles)) array; NaN for seconds
+                     without samples.
+  """
+  time_ms = np.concatenate([log.time for log in logs])
+  values = np.concatenate([log.value for log in logs])
+  second = time_ms // 1000 - first_second
+  order = np.lexsort((values, second))
+  second, values = second[order], values[order]
+
+  starts = np.searchsorted(second, np.arange(seconds), side='left')
+  counts = np.searchsorted(second, np.arange(seconds), side='right') - starts
+  has_samples = counts > 0
+  results = np.full((seconds, len(percentiles)), np.nan)
+  for column, percentile in enumerate(percentiles):
+    rank = np.maximum(np.ceil(percentile / 100.0 * counts).astype(np.int64) - 1, 0)
+    results[has_samples, column] = values[(starts + rank)[has_samples]]
+  return results
+
+def detect_stalls(bandwidth, fraction):
+  """
+  Finds stalls: runs of consecutive seconds whose bandwidth is below
+  `fraction` of the median per-second bandwidth.
+
+  Returns:
+      list[tuple[int, int]]: (first second, length in seconds) of each stall.
+  """
+  threshold = fraction * np.median(bandwidth)
+  if threshold <= 0:
+    return []
+  low = (bandwidth < threshold).astype(np.int8)
+  edges = np.diff(np.concatenate(([0], low, [0])))
+  starts = np.flatnonzero(edges == 1)
+  ends = np.flatnonzero(edges == -1)
+  return [(int(start), int(end - start)) for start, end in zip(starts, ends)]
+
+# Criteria of detect_steady_state(): length in seconds of the sliding window,
+# largest drift of its least-squares trend across the window and largest
+# coefficient of variation within it, both relative to the window mean.
+SteadyStateCriteria = namedtuple('SteadyStateCriteria', ['window', 'slope_tolerance', 'cv_tolerance'])
+
+def detect_steady_state(series, criteria):
+  """
+  Finds where a per-second series reaches its steady state.
+
+  A window of `criteria.window` seconds is steady when its least-squares trend
+  changes by at most `criteria.slope_tolerance` of the window mean from its
+  first to its last second, and its coefficient of variation is at most
+  `criteria.cv_tolerance`. Every window is evaluated at once from cumulative
+  sums.
+
+  Args:
+      series (numpy.ndarray): One value per second.
+      criteria (SteadyStateCriteria): The steadiness criteria.
+
+  Returns:
+      int | None: The first second of the first steady window, or None if no
+                  window is steady.
+  """
+  window = criteria.window
+  count = len(series)
+  if window < 2 or count < window:
+    return None
+
+  series = series.astype(np.float64)
+  positions = np.arange(count, dtype=np.float64)
+  sum_y = np.concatenate(([0.0], np.cumsum(series)))
+  sum_y2 = np.concatenate(([0.0], np.cumsum(series * series)))
+  sum_xy = np.concatenate(([0.0], np.cumsum(positions * series)))
+  starts = np.arange(count - window + 1, dtype=np.float64)
+
+  window_sum = sum_y[window:] - sum_y[:-window]
+  window_mean = window_sum / window
+  # Covariance sum of position (relative to the window start) and value.
+  centered_xy = (sum_xy[window:] - sum_xy[:-window]) - starts * window_sum - (window - 1) / 2.0 * window_sum
+  slope = centered_xy / (window * (window * window - 1) / 12.0)
+  variance = np.maximum((sum_y2[window:] - sum_y2[:-window]) / window - window_mean ** 2, 0.0)
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    drift = np.abs(slope) * (window - 1) / window_mean
+    variation = np.sqrt(variance) / window_mean
+  steady = (window_mean > 0) & (drift <= criteria.slope_tolerance) & (variation <= criteria.cv_tolerance)
+  steady_starts = np.flatnonzero(steady)
+  return int(steady_starts[0]) if len(steady_starts) else None
+
+def sample_percentile(values, percentile):
+  """Percentile of raw samples, with the rule of histogram_percentiles()."""
+  ordered = np.sort(values)
+  rank = max(math.ceil(percentile / 100.0 * len(ordered)) - 1, 0)
+  return ordered[rank]
+
+def analyze_fio_logs(prefix, rolling_seconds=5, stall_fraction=0.1, steady_state=None,
+                     latency_stats=None):
+  """
+  Analyzes the bw/iops/lat time-series logs of one FIO run.
+
+  With `steady_state` criteria, the warm-up at the start of the run is found
+  with detect_steady_state() on the per-second bandwidth and mean latency, and
+  bandwidth and p99 latency are also reported over the steady window only.
+
+  Args:
+      prefix (str): The write_*_log prefix of the run.
+      rolling_seconds (int): Window of the rolling bandwidth average.
+      stall_fraction (float): A second is stalled if its bandwidth is below
+                              this fraction of the median.
+      steady_state (SteadyStateCriteria): Optional steady-state criteria.
+      latency_stats (OnlineStats): Optional summary every latency sample of
+                                   the logs is added to, in ms.
+
+  Returns:
+      tuple[dict, dict, list[dict]]: Summary metrics, their units and one row
+          per second for the time-series CSV. All empty if no bw log exists.
+  """
+  bw_logs = load_fio_logs(prefix, 'bw')
+  bw_logs = [log for log in bw_logs if len(log.time)]
+  if not bw_logs:
+    return {}, {}, []
+  iops_logs = load_fio_logs(prefix, 'iops')
+  lat_logs = load_fio_logs(prefix, 'lat')
+  lat_logs = [log for log in lat_logs if len(log.time)]
+
+  all_times = [log.time for log in bw_logs + lat_logs]
+  first_second = int(min(times.min() for times in all_times)) // 1000
+  seconds = int(max(times.max() for times in all_times)) // 1000 - first_second + 1
+
+  # FIO logs bandwidth in KiB/s. Convert to MiB/s.
+  bandwidth = per_second_sum(bw_logs, first_second, seconds) / 1024.0
+  iops = per_second_sum(iops_logs, first_second, seconds)
+  rolling = np.full(seconds, np.nan)
+  window = min(rolling_seconds, seconds)
+  rolling[window - 1:] = np.convolve(bandwidth, np.ones(window) / window, mode='valid')
+  stalls = detect_stalls(bandwidth, stall_fraction)
+  stalled = np.zeros(seconds, dtype=bool)
+  for start, length in stalls:
+    stalled[start:start + length] = True
+
+  metrics = {
+      'bw_1s_min': float(bandwidth.min()),
+      'bw_rolling_min': float(np.nanmin(rolling)),
+      'bw_1s_cv': float(bandwidth.std() / bandwidth.mean() * 100.0) if bandwidth.mean() > 0 else 0.0,
+      'stall_count': len(stalls),
+      'stall_seconds': int(stalled.sum()),
+  }
+  units = {
+      'bw_1s_min': 'MiB/s',
+      'bw_rolling_min': 'MiB/s',
+      'bw_1s_cv': '%',
+      'stall_count': 'count',
+      'stall_seconds': 's',
+  }
+
+  latency = None
+  if lat_logs:
+    if latency_stats is not None:
+      for log in lat_logs:
+        latency_stats.add_array(log.value / 1_000_000.0)  # ns to ms
+    # FIO logs latency in ns. Convert to ms.
+    latency = per_second_percentiles(lat_logs, first_second, seconds, (50.0, 99.0)) / 1_000_000.0
+    if not np.isnan(latency[:, 1]).all():
+      metrics['lat_1s_p99_max'] = float(np.nanmax(latency[:, 1]))
+      units['lat_1s_p99_max'] = 'ms'
+
+  if steady_state:
+    steady_start = detect_steady_state(bandwidth, steady_state)
+    if steady_start is not None and lat_logs:
+      # Latency must have settled too; its mean per second is judged the same way.
+      lat_mean = per_second_sum(lat_logs, first_second, seconds) / len(lat_logs)
+      lat_start = detect_steady_state(lat_mean, steady_state)
+      steady_start = None if lat_start is None else max(steady_start, lat_start)
+    if steady_start is None:
+      print(f"  No steady state found in the time-series logs of {prefix}")
+    else:
+      metrics['steady_start'] = steady_start
+      units['steady_start'] = 's'
+      metrics['steady_bandwidth'] = float(bandwidth[steady_start:].mean())
+      units['steady_bandwidth'] = 'MiB/s'
+      if lat_logs:
+        steady_from_ms = (first_second + steady_start) * 1000
+        steady_latency = np.concatenate([log.value[log.time >= steady_from_ms] for log in lat_logs])
+        metrics['steady_lat_p99'] = float(sample_percentile(steady_latency, 99.0)) / 1_000_000.0
+        units['steady_lat_p99'] = 'ms'
+
+  rows = []
+  for second in range(seconds):
+    row = {
+        'Second': first_second + second,
+        'bandwidth (MiB/s)': f"{bandwidth[second]:.2f}",
+        f"rolling {window}s bandwidth (MiB/s)": '' if np.isnan(rolling[second]) else f"{rolling[second]:.2f}",
+        'iops (ops/s)': f"{iops[second]:.2f}",
+        'stall': int(stalled[second]),
+    }
+    if latency is not None:
+      for column, label in enumerate(('lat p50 (ms)', 'lat p99 (ms)')):
+        value = latency[second, column]
+        row[label] = '' if np.isnan(value) else f"{value:.3f}"
+    rows.append(row)
+  return metrics, units, rows
+
+# Header of the ring buffer files of resource-sampler.py: magic, header size,
+# record size, capacity, records written, sampling rate, clock ticks per
+# second, number of CPUs, and the lengths of the record format and of the
+# comma-separated field names that follow.
+RESOURCE_HEADER = struct.Struct('<8sIIQQdIIHH')
+RESOURCE_MAGIC = b'FIORSMP1'
+# Per-CPU jiffies tick only USER_HZ (100) times a second, so the busiest core
+# is found over windows of at least this many seconds.
+CORE_WINDOW_SECONDS = 1.0
+
+def load_resource_samples(file_path):
+  """
+  Reads the ring buffer file written by resource-sampler.py.
+
+  Args:
+      file_path (str): Path of the ring buffer file.
+
+  Returns:
+      tuple[dict, dict]: The header fields ('hz', 'clk_tck', 'cpus') and the
+          samples as a dict of field name to list of values, oldest first.
+          Both are empty if the file is missing or not a sampler file.
+  """
+  try:
+    with open(file_path, 'rb') as f:
+      data = f.read()
+  except FileNotFoundError:
     return {}, {}
-  except json.JSONDecodeError:
-    print(f"Error: Invalid JSON in {file_path}")
+  if len(data) < RESOURCE_HEADER.size or not data.startswith(RESOURCE_MAGIC):
+    print(f"Error: {file_path} is not a resource sampler file")
+    return {}, {}
+  (_, header_size, record_size, capacity, count, hz, clk_tck, cpus, format_length,
+   names_length) = RESOURCE_HEADER.unpack_from(data)
+  offset = RESOURCE_HEADER.size
+  record = struct.Struct(data[offset:offset + format_length].decode())
+  names = data[offset + format_length:offset + format_length + names_length].decode().split(',')
+  if record.size != record_size:
+    print(f"Error: Inconsistent record size in {file_path}")
     return {}, {}
 
-  if 'jobs' in data and len(data['jobs']) > 0:
-    # Assuming we're interested in the first job's metrics.
-    job_data = data['jobs'][0]
-
-    # --- CPU Usage ---
-    metrics['cpu_usr'] = job_data.get('usr_cpu', 0)
-    units['cpu_usr'] = '%'
-    metrics['cpu_sys'] = job_data.get('sys_cpu', 0)
-    units['cpu_sys'] = '%'
-    metrics['cpu_total'] = metrics['cpu_usr'] + metrics['cpu_sys']
-    units['cpu_total'] = '%'
-
-    # --- Bandwidth (read + write if both exist, otherwise just one) ---
-    read_bw = job_data.get('read', {}).get('bw', 0)
-    write_bw = job_data.get('write', {}).get('bw', 0)
-    # FIO's bw_mean is typically in KiB/s. Convert to MiB/s.
-    metrics['bandwidth'] = (read_bw + write_bw) / 1024.0
-    units['bandwidth'] = 'MiB/s'
-
-    # --- Latency (checking for different units: ns, us, ms, and converting to ms) ---
-    latency_unit = 'ms'
-    latency_data = None
-    conversion_factor = 1.0  # Default for ms
-
-    # Prioritize nanoseconds (ns), then microseconds (us), then milliseconds (ms)
-    # Check read latency first
-    if job_data.get('read', {}).get('lat_ns'):
-      latency_data = job_data['read']['lat_ns']
-      conversion_factor = 1_000_000.0  # ns to ms
-    elif job_data.get('read', {}).get('lat_us'):
-      latency_data = job_data['read']['lat_us']
-      conversion_factor = 1_000.0  # us to ms
-    elif job_data.get('read', {}).get('lat_ms'):
-      latency_data = job_data['read']['lat_ms']
-      conversion_factor = 1.0  # ms to ms (no conversion)
-    # If no read latency, check write latency
-    elif job_data.get('write', {}).get('lat_ns'):
-      latency_data = job_data['write']['lat_ns']
-      conversion_factor = 1_000_000.0  # ns to ms
-    elif job_data.get('write', {}).get('lat_us'):
-      latency_data = job_data['write']['lat_us']
-      conversion_factor = 1_000.0  # us to ms
-    elif job_data.get('write', {}).get('lat_ms'):
-      latency_data = job_data['write']['lat_ms']
-      conversion_factor = 1.0  # ms to ms (no conversion)
+  # Once the ring buffer wrapped around, the oldest record is the next slot to be written.
+  records = data[header_size:header_size + capacity * record_size]
+  if count > capacity:
+    start = (count % capacity) * record_size
+    records = records[start:] + records[:start]
+  else:
+    records = records[:count * record_size]
+  columns = list(zip(*record.iter_unpack(records))) or [()] * len(names)
+  return {'hz': hz, 'clk_tck': clk_tck, 'cpus': cpus}, dict(zip(names, map(list, columns)))
 
-    if latency_data:
-      metrics['avg_latency'] = latency_data.get('mean', 0) / conversion_factor
-      units['avg_latency'] = latency_unit
-      metrics['stdev_latency'] = latency_data.get('stddev', 0) / conversion_factor
-      units['stdev_latency'] = latency_unit  # Stddev has the same unit as mean
-    else:
-      # If no latency data found, set to 0 and 'N/A' unit
-      metrics['avg_latency'] = 0
-      units['avg_latency'] = 'N/A'
-      metrics['stdev_latency'] = 0
-      units['stdev_latency'] = 'N/A'
-
-    # --- IOPS (read + write if both exist, otherwise just one) ---
-    read_iops = job_data.get('read', {}).get('iops', 0)
-    write_iops = job_data.get('write', {}).get('iops', 0)
-    metrics['iops'] = read_iops + write_iops
-    units['iops'] = 'ops/s'  # Operations per second
+def busiest_core_windows(samples, times, first, cpus):
+  """
+  Returns the busy fraction of the busiest CPU in each window of at least
+  CORE_WINDOW_SECONDS from sample `first` on, from the cumulative per-CPU
+  jiffies of the samples. Empty if the samples have none or span no window.
+  """
+  if f'core{cpus - 1}_total' not in samples:
+    return np.empty(0)
+  # Each window ends at the first sample CORE_WINDOW_SECONDS after its start.
+  edges = [first]
+  for index in range(first + 1, len(times)):
+    if times[index] - times[edges[-1]] >= CORE_WINDOW_SECONDS:
+      edges.append(index)
+  if len(edges) < 2:
+    return np.empty(0)
+  busy = np.diff(np.array([[samples[f'core{core}_busy'][index] for index in edges]
+                           for core in range(cpus)], dtype=np.float64), axis=1)
+  total = np.diff(np.array([[samples[f'core{core}_total'][index] for index in edges]
+                            for core in range(cpus)], dtype=np.float64), axis=1)
+  # Offline CPUs have no time in a window.
+  fractions = np.divide(busy, total, out=np.zeros_like(busy), where=total > 0)
+  return fractions.max(axis=0)
+
+def analyze_resource_samples(file_path, skip_seconds=0):
+  """
+  Summarizes the resource samples taken during one FIO run.
+
+  Counters are turned into rates over the samples after the first
+  `skip_seconds` (the ramp_time), so the numbers cover the measured part of
+  the run: CPU utilization of the machine, the busiest core, the gcsfuse
+  process's CPU and memory, network throughput and pressure stall time.
+
+  Args:
+      file_path (str): Path of the ring buffer file of the run.
+      skip_seconds (float): Seconds at the start of the samples to leave out.
+
+  Returns:
+      tuple[dict, dict]: The metrics and their units; empty if there are fewer
+          than two samples.
+  """
+  info, samples = load_resource_samples(file_path)
+  times = samples.get('time', [])
+  if not times:
+    return {}, {}
+  first = next((index for index, t in enumerate(times) if t >= times[0] + skip_seconds), len(times))
+  if len(times) - first < 2:
+    return {}, {}
+
+  def delta(name):
+    return samples[name][-1] - samples[name][first]
+
+  elapsed = times[-1] - times[first]
+  cpu_fields = ('cpu_user', 'cpu_nice', 'cpu_system', 'cpu_idle', 'cpu_iowait', 'cpu_irq',
+                'cpu_softirq', 'cpu_steal')
+  cpu_total = sum(delta(name) for name in cpu_fields) or 1
+  core_busy = busiest_core_windows(samples, times, first, info.get('cpus', 0))
+  metrics = {
+      'cpu_busy': (1.0 - (delta('cpu_idle') + delta('cpu_iowait')) / cpu_total) * 100.0,
+      'cpu_system': delta('cpu_system') / cpu_total * 100.0,
+      'cpu_softirq': delta('cpu_softirq') / cpu_total * 100.0,
+      'cpu_iowait': delta('cpu_iowait') / cpu_total * 100.0,
+      # Percent of one core
+      'gcsfuse_cpu': (delta('gcsfuse_utime') + delta('gcsfuse_stime')) / info['clk_tck'] / elapsed * 100.0,
+      'gcsfuse_rss_max': max(samples['gcsfuse_rss_kb'][first:]) / 1024.0,
+      'net_rx': delta('net_rx_bytes') / elapsed / (1024.0 * 1024.0),
+      'net_tx': delta('net_tx_bytes') / elapsed / (1024.0 * 1024.0),
+      'psi_cpu_some': delta('psi_cpu_us') / 1e6 / elapsed * 100.0,
+      'psi_io_some': delta('psi_io_us') / 1e6 / elapsed * 100.0,
+      'psi_memory_some': delta('psi_memory_us') / 1e6 / elapsed * 100.0,
+      'sample_rate': (len(times) - first - 1) / elapsed,
+  }
+  if len(core_busy):
+    metrics['busiest_core_p95'] = float(sample_percentile(core_busy, 95.0)) * 100.0
+    metrics['busiest_core_max'] = float(core_busy.max()) * 100.0
+  units = {name: '%' for name in metrics}
+  units.update({'gcsfuse_rss_max': 'MiB', 'net_rx': 'MiB/s', 'net_tx': 'MiB/s', 'sample_rate': 'Hz'})
+  return metrics, units
+
+# Characters of a Prometheus series (name and labels) that don't belong in a
+# column name.
+SERIES_LABEL_CHARS = re.compile(r'[{}"]')
+
+def load_gcsfuse_metrics(file_path):
+  """
+  Reads the per-iteration gcsfuse metrics written by metrics-scraper.py.
+
+  Every counter is reported as its rate over the iteration, named after the
+  series with its labels (e.g. 'gcsfuse.file_cache_read_count:cache_hit=true'), and
+  every gauge as its maximum (with the unit 'max'). Histogram buckets are left out.
+
+  Args:
+      file_path (str): Path of the JSON file of the iteration.
+
+  Returns:
+      tuple[dict, dict]: The metrics and their units; empty if the file is
+          missing or has fewer than two scrapes.
+  """
+  try:
+    with open(file_path, 'r') as f:
+      summary = json.load(f)
+  except FileNotFoundError:
+    return {}, {}
+  except ValueError as e:
+    print(f"Error: Could not parse {file_path}: {e}")
+    return {}, {}
+  if summary.get('scrapes', 0) < 2:
+    return {}, {}
+
+  def column(series):
+    return 'gcsfuse.' + SERIES_LABEL_CHARS.sub('', series.replace('{', ':', 1).replace(',', ':'))
+
+  metrics, units = {}, {}
+  for series, counter in summary.get('counters', {}).items():
+    if series.split('{', 1)[0].endswith('_bucket'):
+      continue
+    metrics[column(series)] = counter['rate']
+    units[column(series)] = '/s'
+  for series, gauge in summary.get('gauges', {}).items():
+    metrics[column(series)] = gauge['max']
+    units[column(series)] = 'max'
+  return metrics, units
+
+def load_fuse_snapshot(file_path):
+  """
+  Reads the FUSE connection and bdi record of one run, written by
+  fuse-instrument.py.
+
+  Reports the settings the run started with and the number of requests
+  waiting in the FUSE connection during it.
+
+  Args:
+      file_path (str): Path of the JSON file of the run.
+
+  Returns:
+      tuple[dict, dict]: The metrics and their units; empty if the file is
+          missing or the mount had no FUSE connection.
+  """
+  try:
+    with open(file_path, 'r') as f:
+      record = json.load(f)
+  except FileNotFoundError:
+    return {}, {}
+  except ValueError as e:
+    print(f"Error: Could not parse {file_path}: {e}")
+    return {}, {}
+  waiting = record.get('waiting')
+  if not waiting:
+    return {}, {}
+  if record.get('changed'):
+    print(f"Warning: FUSE/bdi settings changed during the run: {record['changed']}")
 
+  metrics, units = {}, {}
+  settings = (('fuse', 'max_background', 'requests'), ('fuse', 'congestion_threshold', 'requests'),
+              ('bdi', 'read_ahead_kb', 'KiB'))
+  for group, name, unit in settings:
+    value = record['before'][group].get(name)
+    if value is not None:
+      metrics[name] = value
+      units[name] = unit
+  for key in ('mean', 'p50', 'p90', 'p99', 'max'):
+    metrics[f"fuse_waiting_{key}"] = waiting[key]
+    units[f"fuse_waiting_{key}"] = 'requests'
   return metrics, units
 
+# Two-sided 95% quantiles of Student's t distribution for 1 to 30 degrees of
+# freedom; beyond that the normal quantile is close enough.
+T_95 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+
+def relative_ci_half_width(stats):
+  """
+  Returns the half-width of the 95% confidence interval of the mean of the
+  values summarized by an OnlineStats, relative to that mean, or None with
+  fewer than two values or a zero mean.
+  """
+  if stats.count < 2 or stats.mean == 0:
+    return None
+  t_value = T_95[stats.count - 2] if stats.count - 1 <= len(T_95) else 1.96
+  return t_value * stats.stdev / math.sqrt(stats.count) / abs(stats.mean)
+
 def generate_fio_filenames(num_iterations: int, prefix: str) -> list[str]:
   """
   Generates a list of FIO (Flexible I/O Tester) filenames based on a prefix
@@ -152,27 +1605,233 @@ def main():
       default="fio_results.csv",  # Default CSV output file name
       help="Name of the CSV file to write the aggregated results to"
   )
+  parser.add_argument(
+      "--jobs",
+      type=int,
+      default=1,  # Parse serially by default
+      help="Number of processes to parse the FIO output files with (0 uses one per CPU)"
+  )
+  parser.add_argument(
+      "--cache-dir",
+      type=str,
+      default=None,  # No caching by default
+      help="Directory of a persistent cache of parsed results, so unchanged files are not decoded again"
+  )
+  parser.add_argument(
+      "--cache-max-mb",
+      type=int,
+      default=256,
+      help="Size limit of the result cache in MiB; least recently used results are evicted beyond it"
+  )
+  parser.add_argument(
+      "--log-prefix",
+      type=str,
+      default=None,  # Time-series logs are not analyzed by default
+      help="Prefix of the FIO time-series logs (e.g., 'fio-log-' reads fio-log-1_bw.1.log, ... for run 1); requires NumPy"
+  )
+  parser.add_argument(
+      "--resource-prefix",
+      type=str,
+      default=None,  # Resource samples are not analyzed by default
+      help="Prefix of the resource-sampler.py files (e.g., 'resources-' reads resources-1.bin for run 1); "
+           "the first --ramp-time seconds are left out"
+  )
+  parser.add_argument(
+      "--metrics-prefix",
+      type=str,
+      default=None,  # gcsfuse metrics are not read by default
+      help="Prefix of the metrics-scraper.py files (e.g., 'metrics-' reads metrics-1.json for run 1)"
+  )
+  parser.add_argument(
+      "--fuse-prefix",
+      type=str,
+      default=None,  # FUSE connection records are not read by default
+      help="Prefix of the fuse-instrument.py records (e.g., 'fuse-' reads fuse-1.json for run 1)"
+  )
+  parser.add_argument(
+      "--timeseries-csv",
+      type=str,
+      default="fio_timeseries.csv",
+      help="Name of the CSV file to write the per-second time-series results to (with --log-prefix)"
+  )
+  parser.add_argument(
+      "--rolling-seconds",
+      type=int,
+      default=5,
+      help="Window in seconds of the rolling bandwidth average (with --log-prefix)"
+  )
+  parser.add_argument(
+      "--stall-fraction",
+      type=float,
+      default=0.1,
+      help="A second counts as stalled when its bandwidth is below this fraction of the median (with --log-prefix)"
+  )
+  parser.add_argument(
+      "--steady-window",
+      type=int,
+      default=0,  # Steady-state detection is off by default
+      help="Sliding window in seconds for steady-state detection in the time-series logs; 0 disables it (with --log-prefix)"
+  )
+  parser.add_argument(
+      "--steady-slope-tolerance",
+      type=float,
+      default=0.1,
+      help="Largest trend across a steady window, relative to its mean"
+  )
+  parser.add_argument(
+      "--steady-cv-tolerance",
+      type=float,
+      default=0.1,
+      help="Largest coefficient of variation within a steady window"
+  )
+  parser.add_argument(
+      "--ramp-time",
+      type=int,
+      default=0,
+      help="ramp_time in seconds the runs were made with; added to the detected warm-up to report the full ramp"
+  )
+  parser.add_argument(
+      "--ramp-output",
+      type=str,
+      default=None,
+      help="File to write the longest detected ramp in seconds to, to use as ramp_time of later runs (not written if none is detected)"
+  )
+  parser.add_argument(
+      "--split-output-dir",
+      type=str,
+      default=None,
+      help="Split each output file by jobfile section (job name) into <dir>/<section>/ instead of parsing, "
+           "for jobfiles that batch several test cases"
+  )
+  parser.add_argument(
+      "--check-convergence",
+      type=float,
+      default=None,
+      metavar="TOLERANCE",
+      help="Exit with status 0 only if the 95%% confidence interval half-width of bandwidth and p99 latency "
+           "over the runs is within TOLERANCE of the mean (e.g. 0.05), and 2 otherwise"
+  )
+  parser.add_argument(
+      "--mount-config-hash",
+      type=str,
+      default=None,
+      help="Hash of the gcsfuse config the runs were made with (see mount-variants.py --hash), "
+           "written with every run so results can be joined across configs"
+  )
 
 
   args = parser.parse_args()
   # Corrected attribute access for output-filepath
   generated_fio_files = generate_fio_filenames(args.iterations, args.output_filepath)
 
+  if args.split_output_dir:
+    print("\n--- Splitting FIO Output Files by Section ---")
+    # The other files are still split, so the runs that did finish are kept.
+    split_status = 0
+    for file_path in generated_fio_files:
+      try:
+        sections = split_fio_output(file_path, args.split_output_dir)
+      except (OSError, json.JSONDecodeError) as e:
+        print(f"Error: Could not split {file_path} ({e})")
+        split_status = 1
+        continue
+      print(f"{file_path}: {len(sections)} section(s): {', '.join(sections)}")
+    return split_status
+
   print("\n--- Parsing FIO Output Files ---")
-  all_metrics = defaultdict(list)
+  # Online summary of every metric over all runs
+  all_metrics = defaultdict(OnlineStats)
   global_units_map = {}  # To store units for each metric across all runs
 
-  # Lists to collect latency values for overall min/max
-  avg_latency_values = []
-  stdev_latency_values = []
+  # Online summaries of the latency metrics of runs with valid latency, for overall min/max
+  valid_latency_metrics = defaultdict(OnlineStats)
 
   # List to store individual run metrics for CSV output
   individual_run_data = []
+  # List to store per-job metrics of every run, so skew between jobs is visible
+  per_job_data = []
+
+  # Non-JSON lines of each run's output file, such as FIO warnings
+  diagnostic_data = []
+
+  # Completion latency histograms merged over all runs, per direction
+  merged_histograms = {}
+  # p99 completion latency of each run, to judge convergence over runs
+  p99_latency = OnlineStats()
+  # Every latency sample of the time-series logs of all runs, in ms
+  log_latency = OnlineStats()
+
+  # Per-second rows of every run, from the time-series logs
+  timeseries_data = []
+
+  if args.jobs < 0:
+    parser.error("--jobs must be zero or a positive integer.")
+  if args.log_prefix and np is None:
+    parser.error("--log-prefix requires NumPy (pip install numpy, or apt-get install python3-numpy).")
+  if args.rolling_seconds <= 0:
+    parser.error("--rolling-seconds must be a positive integer.")
+  steady_state = None
+  if args.steady_window:
+    if args.steady_window < 2:
+      parser.error("--steady-window must be at least 2 seconds.")
+    steady_state = SteadyStateCriteria(
+        args.steady_window, args.steady_slope_tolerance, args.steady_cv_tolerance)
+  if args.ramp_output and not steady_state:
+    parser.error("--ramp-output requires --steady-window.")
+  # Longest ramp detected over all runs, in seconds
+  detected_ramp = None
+  cache = None
+  if args.cache_dir:
+    cache = ResultCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+  results = parse_fio_outputs(generated_fio_files, args.jobs, cache)
 
   # Iterate through the files that were actually generated
-  for i, file_path in enumerate(generated_fio_files):
+  for i, (file_path, result) in enumerate(zip(generated_fio_files, results)):
     print(f"Parsing {file_path}...")
-    metrics, units = parse_fio_output(file_path)
+    metrics, units = result.metrics, result.units
+    if result.diagnostics:
+      print(f"  {len(result.diagnostics)} non-JSON line(s) in {os.path.basename(file_path)}:")
+      for line in result.diagnostics:
+        print(f"    | {line}")
+        diagnostic_data.append([i + 1, line])
+    if metrics and args.log_prefix:
+      log_metrics, log_units, log_rows = analyze_fio_logs(
+          f"{args.log_prefix}{i + 1}", args.rolling_seconds, args.stall_fraction, steady_state,
+          log_latency)
+      if 'steady_start' in log_metrics:
+        log_metrics['ramp_seconds'] = args.ramp_time + log_metrics['steady_start']
+        log_units['ramp_seconds'] = 's'
+        detected_ramp = max(detected_ramp or 0, log_metrics['ramp_seconds'])
+      if log_rows:
+        metrics = {**metrics, **log_metrics}
+        units = {**units, **log_units}
+        timeseries_data.extend({'Run': i + 1, **row} for row in log_rows)
+      else:
+        print(f"  No time-series logs found for run {i + 1} with prefix {args.log_prefix}")
+    if metrics and args.resource_prefix:
+      resource_file = f"{args.resource_prefix}{i + 1}.bin"
+      resource_metrics, resource_units = analyze_resource_samples(resource_file, args.ramp_time)
+      if resource_metrics:
+        metrics = {**metrics, **resource_metrics}
+        units = {**units, **resource_units}
+      else:
+        print(f"  No resource samples found for run {i + 1} in {resource_file}")
+    if metrics and args.metrics_prefix:
+      metrics_file = f"{args.metrics_prefix}{i + 1}.json"
+      gcsfuse_metrics, gcsfuse_units = load_gcsfuse_metrics(metrics_file)
+      if gcsfuse_metrics:
+        metrics = {**metrics, **gcsfuse_metrics}
+        units = {**units, **gcsfuse_units}
+      else:
+        print(f"  No gcsfuse metrics found for run {i + 1} in {metrics_file}")
+    if metrics and args.fuse_prefix:
+      fuse_file = f"{args.fuse_prefix}{i + 1}.json"
+      fuse_metrics, fuse_units = load_fuse_snapshot(fuse_file)
+      if fuse_metrics:
+        metrics = {**metrics, **fuse_metrics}
+        units = {**units, **fuse_units}
+      else:
+        print(f"  No FUSE connection record found for run {i + 1} in {fuse_file}")
     if metrics:
       global_units_map.update(units)  # Update the global units map with units from this file
       print(f"  Results from {os.path.basename(file_path)}:")
@@ -182,77 +1841,109 @@ def main():
       for key, value in metrics.items():
         unit = units.get(key, '')
         print(f"    {key}: {value:.2f} {unit}")
-        all_metrics[key].append(value)
+        all_metrics[key].add(value)
         run_data[f"{key} ({unit})"] = f"{value:.2f}" # Store with unit for CSV
 
       individual_run_data.append(run_data)
 
+      for direction, histogram in result.histograms.items():
+        merge_histograms(merged_histograms.setdefault(direction, {}), histogram)
+      for direction in ('read', 'write'):
+        if direction in result.histograms:
+          p99_latency.add(histogram_percentiles(result.histograms[direction], (99.0,))[99.0])
+          break
+
+      for job_row in result.jobs:
+        job_data = {'Run': i + 1, 'Job': job_row['job']}
+        for key, value in job_row['metrics'].items():
+          job_data[f"{key} ({units.get(key, '')})"] = f"{value:.2f}"
+        per_job_data.append(job_data)
+      if len(result.jobs) > 1:
+        print(f"    jobs: {len(result.jobs)}")
+        for job_row in result.jobs:
+          job_metrics = job_row['metrics']
+          print(f"      {job_row['job']}: bandwidth {job_metrics['bandwidth']:.2f} {units['bandwidth']}, "
+                f"avg_latency {job_metrics['avg_latency']:.2f} {units['avg_latency']}")
+
       # Collect latency values if they are valid
-      if 'avg_latency' in metrics and units.get('avg_latency') != 'N/A':
-        avg_latency_values.append(metrics['avg_latency'])
-      if 'stdev_latency' in metrics and units.get('stdev_latency') != 'N/A':
-        stdev_latency_values.append(metrics['stdev_latency'])
+      for key in ('avg_latency', 'stdev_latency'):
+        if key in metrics and units.get(key) != 'N/A':
+          valid_latency_metrics[key].add(metrics[key])
     else:
       print(f"  Could not extract metrics from {file_path}. Skipping.")
 
+  if cache:
+    cache.flush()
+
   if not all_metrics:
     print("No metrics extracted from any FIO output files. Exiting.")
-    return
+    return 1
 
   # --- Prepare Aggregated Results for CSV ---
   aggregated_results = []
   aggregated_results.append(['Metric', 'Average', 'Std Dev', 'Unit', 'Min', 'Max'])
 
-  for metric_name, values in all_metrics.items():
-    if values:
-      avg_value = sum(values) / len(values)
+  for metric_name, stats in all_metrics.items():
+    if stats.count:
       unit = global_units_map.get(metric_name, '')
-      min_value = min(values)
-      max_value = max(values)
-
-      stdev_value = 0
-      if len(values) > 1:
-        sum_sq_diff = sum([(x - avg_value) ** 2 for x in values])
-        stdev_value = math.sqrt(sum_sq_diff / (len(values) - 1))
-
       aggregated_results.append([
           metric_name.replace('_', ' ').title(),
-          f"{avg_value:.2f}",
-          f"{stdev_value:.2f}" if len(values) > 1 else "N/A",
+          f"{stats.mean:.2f}",
+          f"{stats.stdev:.2f}" if stats.count > 1 else "N/A",
           unit,
-          f"{min_value:.2f}",
-          f"{max_value:.2f}"
+          f"{stats.min:.2f}",
+          f"{stats.max:.2f}"
       ])
     else:
       aggregated_results.append([metric_name.replace('_', ' ').title(), "No data", "N/A", "N/A", "N/A", "N/A"])
 
   # Add Min/Max for Average Latency and Standard Deviation of Latency to aggregated results if available
-  if avg_latency_values:
-    min_avg_latency = min(avg_latency_values)
-    max_avg_latency = max(avg_latency_values)
-    latency_unit = global_units_map.get('avg_latency', 'ms')
-    aggregated_results.append([
-        'Average Latency',
-        '',
-        '',
-        latency_unit,
-        f"{min_avg_latency:.2f}",
-        f"{max_avg_latency:.2f}"
-    ])
-
-  if stdev_latency_values:
-    min_stdev_latency = min(stdev_latency_values)
-    max_stdev_latency = max(stdev_latency_values)
-    latency_unit = global_units_map.get('stdev_latency', 'ms')
-    aggregated_results.append([
-        'Standard Deviation Latency',
-        '',
-        '',
-        latency_unit,
-        f"{min_stdev_latency:.2f}",
-        f"{max_stdev_latency:.2f}"
-    ])
+  for key, label in (('avg_latency', 'Average Latency'), ('stdev_latency', 'Standard Deviation Latency')):
+    stats = valid_latency_metrics.get(key)
+    if stats and stats.count:
+      aggregated_results.append([
+          label,
+          '',
+          '',
+          global_units_map.get(key, 'ms'),
+          f"{stats.min:.2f}",
+          f"{stats.max:.2f}"
+      ])
+
+  # --- Latency percentiles over all runs, from the merged histograms ---
+  percentile_results = []
+  for direction, histogram in merged_histograms.items():
+    samples = sum(histogram.values())
+    for percentile, value in histogram_percentiles(histogram).items():
+      percentile_results.append([
+          direction,
+          f"p{percentile:g}",
+          f"{value / 1_000_000.0:.3f}",  # ns to ms
+          'ms',
+          samples
+      ])
+  # --- Latency over every sample of the time-series logs of all runs ---
+  log_latency_results = []
+  if log_latency.count:
+    log_latency_results = [
+        ['Samples', log_latency.count],
+        ['Mean', f"{log_latency.mean:.3f}"],
+        ['Std Dev', f"{log_latency.stdev:.3f}"],
+        ['Min', f"{log_latency.min:.3f}"],
+        ['p50', f"{log_latency.quantile(0.5):.3f}"],
+        ['p99', f"{log_latency.quantile(0.99):.3f}"],
+        ['Max', f"{log_latency.max:.3f}"],
+    ]
+    print("\n--- Time-Series Log Latency (all runs, ms, quantiles within 1%) ---")
+    for label, value in log_latency_results:
+      print(f"  {label}: {value}")
 
+  if percentile_results:
+    print("\n--- Completion Latency Percentiles (all runs) ---")
+    for direction, label, value, unit, samples in percentile_results:
+      print(f"  {direction} {label}: {value} {unit} ({samples} samples)")
+  else:
+    print("\nNo latency histograms found (run FIO with --output-format=json+ for percentiles).")
 
   # --- Write to CSV ---
   try:
@@ -263,6 +1954,8 @@ def main():
       if individual_run_data:
         # Get all unique keys for the header, maintaining order if possible
         fieldnames = ['Run']
+        if args.mount_config_hash:
+          fieldnames.append('Mount Config Hash')
         for row in individual_run_data:
           for key in row.keys():
             if key not in fieldnames:
@@ -271,18 +1964,105 @@ def main():
         writer.writerow(["Individual Run Metrics"])
         writer.writerow(fieldnames)
         for row in individual_run_data:
+          row = dict(row, **{'Mount Config Hash': args.mount_config_hash})
           writer.writerow([row.get(key, '') for key in fieldnames])
         writer.writerow([]) # Add an empty row for separation
 
+      # Write per-job data, one row per job of every run
+      if per_job_data:
+        fieldnames = ['Run', 'Job']
+        for row in per_job_data:
+          for key in row.keys():
+            if key not in fieldnames:
+              fieldnames.append(key)
+
+        writer.writerow(["Per-Job Metrics"])
+        writer.writerow(fieldnames)
+        for row in per_job_data:
+          writer.writerow([row.get(key, '') for key in fieldnames])
+        writer.writerow([])
+
       # Write aggregated results
       writer.writerow(["Aggregated Metrics"])
       for row in aggregated_results:
         writer.writerow(row)
+
+      # Write latency percentiles computed over all runs
+      if percentile_results:
+        writer.writerow([])
+        writer.writerow(["Completion Latency Percentiles"])
+        writer.writerow(['Direction', 'Percentile', 'Value', 'Unit', 'Samples'])
+        for row in percentile_results:
+          writer.writerow(row)
+
+      # Write the non-JSON lines found in the output files
+      if diagnostic_data:
+        writer.writerow([])
+        writer.writerow(["FIO Diagnostics"])
+        writer.writerow(['Run', 'Line'])
+        for row in diagnostic_data:
+          writer.writerow(row)
+
+      # Write the latency summary of the time-series logs
+      if log_latency_results:
+        writer.writerow([])
+        writer.writerow(["Time-Series Log Latency (ms)"])
+        for row in log_latency_results:
+          writer.writerow(row)
     print(f"\nResults successfully written to {args.csv_output}")
   except IOError as e:
     print(f"Error writing to CSV file {args.csv_output}: {e}")
 
+  # --- Feed the detected ramp back to later runs ---
+  if args.ramp_output and detected_ramp is None:
+    print(f"No ramp detected, {args.ramp_output} not written")
+  elif args.ramp_output:
+    try:
+      with open(args.ramp_output, 'w') as f:
+        f.write(f"{detected_ramp}\n")
+      print(f"Ramp of {detected_ramp}s written to {args.ramp_output}")
+    except IOError as e:
+      print(f"Error writing ramp to {args.ramp_output}: {e}")
+
+  # --- Write the per-second time series to its own CSV ---
+  if timeseries_data:
+    fieldnames = []
+    for row in timeseries_data:
+      for key in row.keys():
+        if key not in fieldnames:
+          fieldnames.append(key)
+    try:
+      with open(args.timeseries_csv, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        for row in timeseries_data:
+          writer.writerow([row.get(key, '') for key in fieldnames])
+      print(f"Time-series results successfully written to {args.timeseries_csv}")
+    except IOError as e:
+      print(f"Error writing to CSV file {args.timeseries_csv}: {e}")
+
+  # --- Convergence of the runs so far, for adaptive iteration counts ---
+  if args.check_convergence is not None:
+    print(f"\n--- Convergence (tolerance {args.check_convergence:.1%}) ---")
+    converged = True
+    checks = [('bandwidth', all_metrics['bandwidth'])]
+    if p99_latency.count:
+      checks.append(('p99 latency', p99_latency))
+    else:
+      print("  No latency histograms, judging bandwidth only.")
+    for name, stats in checks:
+      half_width = relative_ci_half_width(stats)
+      if half_width is None:
+        print(f"  {name}: not enough runs ({stats.count})")
+        converged = False
+      else:
+        print(f"  {name}: 95% CI half-width {half_width:.2%} of the mean over {stats.count} runs")
+        converged = converged and half_width <= args.check_convergence
+    print("  Converged." if converged else "  Not converged.")
+    if not converged:
+      return 2
+
   print("\nCombined FIO benchmark and parsing script completed.")
 
 if __name__ == "__main__":
-  main()
\ No newline at end of file
+  sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,228 @@
+import argparse
+import mmap
+import os
+import signal
+import struct
+import sys
+import time
+
+# Layout of the output file: a header followed by a ring buffer of
+# `capacity` fixed-size records. The header describes the records (struct
+# format and field names), so readers such as parser-script.py need no copy of
+# this layout.
+MAGIC = b'FIORSMP1'
+# The header is a multiple of this size, large enough for the format and
+# field names (which grow with the number of CPUs).
+HEADER_ALIGN = 1024
+# magic, header size, record size, capacity, records written, sampling rate,
+# clock ticks per second, number of CPUs, length of the format, length of the
+# field names; followed by the format and the comma-separated field names.
+HEADER = struct.Struct('<8sIIQQdIIHH')
+# Offset of the count of records written, updated after every record.
+COUNT_OFFSET = struct.calcsize('<8sIIQ')
+
+# One sample. CPU times are cumulative jiffies over all CPUs, the gcsfuse
+# times cumulative clock ticks, network counters cumulative bytes over all
+# interfaces but lo, and pressure totals cumulative microseconds of "some"
+# stall. Every record ends with the cumulative busy and total jiffies of each
+# CPU (see core_fields()); they tick only USER_HZ times a second, so readers
+# compare them over windows of a second or more, not between samples.
+FIELDS = (
+    ('time', 'd'),
+    ('cpu_user', 'Q'), ('cpu_nice', 'Q'), ('cpu_system', 'Q'), ('cpu_idle', 'Q'),
+    ('cpu_iowait', 'Q'), ('cpu_irq', 'Q'), ('cpu_softirq', 'Q'), ('cpu_steal', 'Q'),
+    ('gcsfuse_utime', 'Q'), ('gcsfuse_stime', 'Q'), ('gcsfuse_rss_kb', 'Q'),
+    ('net_rx_bytes', 'Q'), ('net_tx_bytes', 'Q'),
+    ('psi_cpu_us', 'Q'), ('psi_io_us', 'Q'), ('psi_memory_us', 'Q'),
+)
+
+def core_fields(cpus):
+  """Returns the per-CPU fields of a record: core<N>_busy and core<N>_total."""
+  return tuple((f'core{core}_{kind}', 'Q') for core in range(cpus) for kind in ('busy', 'total'))
+
+class ProcReader:
+  """
+  Reads a /proc file repeatedly through one open file descriptor, which is
+  much cheaper than opening it for every sample. Missing files read as ''.
+  """
+
+  def __init__(self, path):
+    try:
+      self.fd = os.open(path, os.O_RDONLY)
+    except OSError:
+      self.fd = None
+
+  def read(self):
+    if self.fd is None:
+      return ''
+    try:
+      return os.pread(self.fd, 1 << 20, 0).decode('ascii', 'replace')
+    except OSError:
+      # The process went away.
+      os.close(self.fd)
+      self.fd = None
+      return ''
+
+def find_pid(name):
+  """Returns the PID of the first process whose command is name, or None."""
+  for entry in os.listdir('/proc'):
+    if entry.isdigit():
+      try:
+        with open(f'/proc/{entry}/comm', 'r') as f:
+          if f.read().strip() == name:
+            return int(entry)
+      except OSError:
+        continue
+  return None
+
+class Sampler:
+  """
+  Samples CPU, gcsfuse, network and pressure counters from /proc into a
+  memory-mapped ring buffer file.
+  """
+
+  def __init__(self, output_path, hz, capacity, pid):
+    self.hz = hz
+    self.capacity = capacity
+    self.count = 0
+    self.stat = ProcReader('/proc/stat')
+    self.net = ProcReader('/proc/net/dev')
+    self.pressure = [ProcReader(f'/proc/pressure/{kind}') for kind in ('cpu', 'io', 'memory')]
+    self.process_stat = ProcReader(f'/proc/{pid}/stat') if pid else ProcReader('')
+    self.process_status = ProcReader(f'/proc/{pid}/status') if pid else ProcReader('')
+    self.cpus = os.cpu_count()
+
+    fields = FIELDS + core_fields(self.cpus)
+    self.record = struct.Struct('<' + ''.join(code for _, code in fields))
+    fmt = self.record.format.encode()
+    names = ','.join(name for name, _ in fields).encode()
+    self.header_size = -(-(HEADER.size + len(fmt) + len(names)) // HEADER_ALIGN) * HEADER_ALIGN
+    size = self.header_size + capacity * self.record.size
+    self.file = open(output_path, 'w+b')
+    self.file.truncate(size)
+    self.map = mmap.mmap(self.file.fileno(), size)
+    header = HEADER.pack(MAGIC, self.header_size, self.record.size, capacity, 0, hz,
+                         os.sysconf('SC_CLK_TCK'), self.cpus, len(fmt), len(names))
+    self.map[:len(header) + len(fmt) + len(names)] = header + fmt + names
+
+  def _cpu(self):
+    """
+    Returns the total CPU times, and the busy and total times of every CPU
+    (0 for offline CPUs) as one flat list.
+    """
+    total = [0] * 8
+    cores = [0] * (2 * self.cpus)
+    for line in self.stat.read().splitlines():
+      if not line.startswith('cpu'):
+        break
+      fields = line.split()
+      values = [int(value) for value in fields[1:9]]
+      if fields[0] == 'cpu':
+        total = values
+        continue
+      core = int(fields[0][3:])
+      if core < self.cpus:
+        all_time = sum(values)
+        cores[2 * core:2 * core + 2] = (all_time - values[3] - values[4], all_time)
+    return total, cores
+
+  def _process(self):
+    """Returns the user and system ticks and the RSS in kB of the process."""
+    stat = self.process_stat.read()
+    utime = stime = rss_kb = 0
+    if stat:
+      # Fields after the command, which may itself contain spaces.
+      fields = stat.rsplit(')', 1)[1].split()
+      utime, stime = int(fields[11]), int(fields[12])
+    for line in self.process_status.read().splitlines():
+      if line.startswith('VmRSS:'):
+        rss_kb = int(line.split()[1])
+        break
+    return utime, stime, rss_kb
+
+  def _net(self):
+    """Returns the bytes received and sent over all interfaces but lo."""
+    rx = tx = 0
+    for line in self.net.read().splitlines()[2:]:
+      interface, counters = line.split(':', 1)
+      if interface.strip() == 'lo':
+        continue
+      fields = counters.split()
+      rx += int(fields[0])
+      tx += int(fields[8])
+    return rx, tx
+
+  def _pressure(self):
+    """Returns the total "some" stall time of CPU, IO and memory in us."""
+    totals = []
+    for reader in self.pressure:
+      text = reader.read()
+      total = 0
+      if text.startswith('some'):
+        total = int(text.split('total=', 1)[1].split()[0])
+      totals.append(total)
+    return totals
+
+  def sample(self):
+    """Takes one sample and appends it to the ring buffer."""
+    cpu, cores = self._cpu()
+    record = self.record.pack(time.time(), *cpu, *self._process(), *self._net(),
+                              *self._pressure(), *cores)
+    offset = self.header_size + (self.count % self.capacity) * self.record.size
+    self.map[offset:offset + self.record.size] = record
+    self.count += 1
+    struct.pack_into('<Q', self.map, COUNT_OFFSET, self.count)
+
+  def close(self):
+    """Closes the file, cutting off the unused part of a ring that never wrapped."""
+    self.map.flush()
+    self.map.close()
+    if self.count < self.capacity:
+      self.file.truncate(self.header_size + self.count * self.record.size)
+    self.file.close()
+
+def main():
+  """
+  Samples system resources until interrupted (SIGINT or SIGTERM).
+  """
+  parser = argparse.ArgumentParser(
+      description="Sample CPU, gcsfuse, network and pressure counters into a binary ring buffer."
+  )
+  parser.add_argument("--output", type=str, required=True, help="Ring buffer file to write")
+  parser.add_argument("--hz", type=float, default=100, help="Samples per second (e.g. 100 to 1000)")
+  parser.add_argument("--capacity", type=int, default=None,
+                      help="Records kept; older ones are overwritten (default: 10 minutes' worth)")
+  parser.add_argument("--process-name", type=str, default="gcsfuse",
+                      help="Command name of the process to sample (the first match)")
+  args = parser.parse_args()
+
+  if args.hz <= 0:
+    parser.error("--hz must be positive.")
+  capacity = args.capacity or int(args.hz * 600)
+  pid = find_pid(args.process_name)
+  if pid is None:
+    print(f"Warning: No {args.process_name} process found; its counters will be 0.", file=sys.stderr)
+
+  stop = []
+  signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+  signal.signal(signal.SIGINT, lambda *_: stop.append(True))
+  # Once the header is written, callers can rely on a signal to stop sampling.
+  sampler = Sampler(args.output, args.hz, capacity, pid)
+  interval = 1.0 / args.hz
+  deadline = time.monotonic()
+  try:
+    while not stop:
+      sampler.sample()
+      deadline += interval
+      delay = deadline - time.monotonic()
+      if delay > 0:
+        time.sleep(delay)
+      else:
+        # Fell behind; skip the missed samples rather than bursting.
+        deadline = time.monotonic()
+  finally:
+    sampler.close()
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,88 @@
+# Runs all cases of a cases file as stonewalled sections of one jobfile (see
+# batch-jobfile.py), so each iteration is a single FIO invocation instead of
+# one per case. The outputs are then split by section and every TESTCASE is
+# parsed and uploaded as run-testcase.sh does.
+# Usage: bash run-batch.sh <cases-file>
+# Takes the same environment as run-testcase.sh, except that adaptive ramp,
+# the convergence check and the run manifest are not supported: every
+# iteration runs all cases with RAMP_TIME.
+set -e
+set -x
+
+CASES_FILE=$(realpath "$1")
+source ${HOMEDIR}/artifacts.sh
+ARTIFACTS_ROOT=${ARTIFACTS_ROOT:-gs://${ARTIFACTS_BUCKET}}
+DIRECT=${DIRECT:-1}
+RUNTIME=${RUNTIME:-2m}
+# All cases run with mount-config.yml; its hash is recorded in fio_results.csv.
+MOUNT_CONFIG_HASH=$(python3 ${HOMEDIR}/mount-variants.py --hash ${HOMEDIR}/mount-config.yml)
+
+BATCHDIR="${HOMEDIR}/batch"
+mkdir -p "$BATCHDIR"
+cd "$BATCHDIR"
+
+python3 ${HOMEDIR}/batch-jobfile.py "$CASES_FILE" --template=${HOMEDIR}/jobfile.fio --output=${BATCHDIR}/batch.fio --list=${BATCHDIR}/testcases.txt
+
+# Lay out the files of all read cases before the timed runs.
+python3 ${HOMEDIR}/dataset-prep.py --directory="$MNT" --cases-file="$CASES_FILE"
+
+# A failed iteration fails every case of the batch, but what it left is still
+# split, parsed and uploaded.
+FAILED_ITERATIONS=""
+for ((i=1; i<=$ITERATIONS; i++)); do
+  output_file="${BATCHDIR}/fio_output_iteration_${i}.json"
+  fio_status=0
+  LOGPREFIX="${BATCHDIR}/fio_log_iteration_${i}" RAMP_TIME=$RAMP_TIME DIRECT=$DIRECT RUNTIME=$RUNTIME LOG_AVG_MSEC=$LOG_AVG_MSEC MNTDIR=${MNT} fio --output-format=json+ ${BATCHDIR}/batch.fio > "$output_file" 2>&1 || fio_status=$?
+  if [[ $fio_status -eq 0 ]]; then
+    echo "FIO batch iteration $i completed successfully. Output saved to: $output_file"
+  else
+    echo "FIO batch iteration $i failed. Output saved to: $output_file"
+    FAILED_ITERATIONS="${FAILED_ITERATIONS} $i"
+  fi
+done
+BATCH_FAILURE=""
+if [[ -n "$FAILED_ITERATIONS" ]]; then
+  BATCH_FAILURE="FIO batch iteration(s)${FAILED_ITERATIONS} failed"
+fi
+
+# One directory per section, holding its share of every iteration; each is
+# reported under the TESTCASE testcases.txt lists it with.
+python3 ${HOMEDIR}/parser-script.py --iterations=$ITERATIONS --output-filepath="${BATCHDIR}/fio_output_iteration_" --split-output-dir="${BATCHDIR}/cases" || BATCH_FAILURE="${BATCH_FAILURE:-not every FIO batch output could be split}"
+
+FAILED_CASES=0
+while read -r SECTION TESTCASE <&3; do
+  CASEDIR="${BATCHDIR}/cases/${SECTION}"
+  if (
+    set -e
+    cd "$CASEDIR"
+    artifacts_cp ${HOMEDIR}/details.txt ${ARTIFACTS_ROOT}/${TESTCASE}/
+    artifacts_cp "${CASEDIR}/fio_output_iteration_*.json" ${ARTIFACTS_ROOT}/${TESTCASE}/raw-fio-output/
+    if [[ $LOG_AVG_MSEC -gt 0 ]]; then
+      # The section's logs, renamed as run-testcase.sh names them.
+      for ((i=1; i<=$ITERATIONS; i++)); do
+        for log_file in ${BATCHDIR}/fio_log_iteration_${i}-${SECTION}_*.log; do
+          mv "$log_file" "${CASEDIR}/fio_log_iteration_${i}_${log_file##*-${SECTION}_}"
+        done
+      done
+      artifacts_cp "${CASEDIR}/fio_log_iteration_*.log" ${ARTIFACTS_ROOT}/${TESTCASE}/raw-fio-logs/
+      python3 ${HOMEDIR}/parser-script.py --iterations=$ITERATIONS --output-filepath="${CASEDIR}/fio_output_iteration_" --jobs=0 --log-prefix="${CASEDIR}/fio_log_iteration_" --steady-window=10 --ramp-time="$RAMP_TIME" --mount-config-hash="$MOUNT_CONFIG_HASH"
+      artifacts_cp fio_timeseries.csv ${ARTIFACTS_ROOT}/${TESTCASE}/results/
+    else
+      python3 ${HOMEDIR}/parser-script.py --iterations=$ITERATIONS --output-filepath="${CASEDIR}/fio_output_iteration_" --jobs=0 --mount-config-hash="$MOUNT_CONFIG_HASH"
+    fi
+    artifacts_cp fio_results.csv ${ARTIFACTS_ROOT}/${TESTCASE}/results/
+  ) && [[ -z "$BATCH_FAILURE" ]]; then
+    echo "Case ${TESTCASE} completed."
+  elif [[ -n "$BATCH_FAILURE" ]]; then
+    echo "Case ${TESTCASE} failed: ${BATCH_FAILURE}."
+    FAILED_CASES=$((FAILED_CASES + 1))
+  else
+    echo "Case ${TESTCASE} failed."
+    FAILED_CASES=$((FAILED_CASES + 1))
+  fi
+done 3< ${BATCHDIR}/testcases.txt
+
+if [[ $FAILED_CASES -gt 0 ]]; then
+  echo "${FAILED_CASES} case(s) of the batch failed."
+  exit 1
+fi
@@ -1,3 +1,14 @@
+# Runs the block-size sweep. By default every block size gets its own VM;
+# with --single-vm the cases of sweep.toml run in sequence on one VM.
+
+if [[ "$1" == "--single-vm" ]]; then
+  CASES_FILE=$(mktemp)
+  python3 sweep-planner.py sweep.toml --output="$CASES_FILE"
+  bash create-vm-and-start-test.sh --sweep "$CASES_FILE"
+  rm -f "$CASES_FILE"
+  exit
+fi
+
 bash create-vm-and-start-test.sh  "4kb"
 bash create-vm-and-start-test.sh  "16kb"
 bash create-vm-and-start-test.sh  "64kb"
@@ -6,4 +17,4 @@ bash create-vm-and-start-test.sh  "1mb"
 bash create-vm-and-start-test.sh  "4mb"
 bash create-vm-and-start-test.sh  "16mb"
 bash create-vm-and-start-test.sh  "64mb"
-bash create-vm-and-start-test.sh  "256mb"
\ No newline at end of file
+bash create-vm-and-start-test.sh  "256mb"
@@ -0,0 +1,65 @@
+# Runs a sweep on this machine without GCE, gcsfuse or GCS, for developing the
+# jobfile, the scripts and the parser. The same run-sweep.sh/run-testcase.sh
+# iteration loop, parsing and reporting as on the VM are used, with FIO running
+# against a local directory and a local directory standing in for the
+# artifacts bucket.
+# Usage: bash run-local.sh <cases-file> [<test-dir>]
+# <test-dir> is where FIO lays out its files (default: a new temporary
+# directory); it can be a tmpfs such as /dev/shm, as O_DIRECT is off unless
+# DIRECT=1. Artifacts go to LOCAL_ARTIFACTS_DIR (default: ./local-artifacts).
+# ITERATIONS, RUNTIME, RAMP_TIME, LOG_AVG_MSEC and the other settings of
+# create-vm-and-start-test.sh can be set in the environment; the defaults
+# keep a run short. With FAKE_METRICS_PORT set, a fake exporter
+# (metrics-scraper.py fake-exporter) listening on that port stands in for the
+# gcsfuse metrics endpoint.
+set -e
+set -x
+
+CASES_FILE=$(realpath "$1")
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+
+export HOMEDIR=$(mktemp -d)
+export MNT=$(realpath "${2:-$(mktemp -d)}")
+export ARTIFACTS_ROOT=$(realpath -m "${LOCAL_ARTIFACTS_DIR:-./local-artifacts}")
+export BUCKET="local:${MNT}"
+export ITERATIONS=${ITERATIONS:-2}
+export MIN_ITERATIONS=${MIN_ITERATIONS:-2}
+export CI_TOLERANCE=${CI_TOLERANCE:-0}
+export NUMFILES=${NUMFILES:-1}
+export IOTYPE=${IOTYPE:-read}
+export FILESIZE=${FILESIZE:-64mb}
+export FILEHANDLECOUNT=${FILEHANDLECOUNT:-1}
+export IODEPTH=${IODEPTH:-1}
+export READ_AHEAD_KB=${READ_AHEAD_KB:-0}
+export LOG_AVG_MSEC=${LOG_AVG_MSEC:-0}
+export RUNTIME=${RUNTIME:-10s}
+export RAMP_TIME=${RAMP_TIME:-0}
+export ADAPTIVE_RAMP=${ADAPTIVE_RAMP:-0}
+export DIRECT=${DIRECT:-0}
+export BATCH=${BATCH:-0}
+export RESOURCE_HZ=${RESOURCE_HZ:-100}
+
+cd "$SCRIPT_DIR"
+cp jobfile.fio parser-script.py run-manifest.py run-testcase.sh run-sweep.sh run-batch.sh batch-jobfile.py sweep-planner.py dataset-prep.py resource-sampler.py gcsfuse-log-analyzer.py metrics-scraper.py fuse-instrument.py mount-variants.py artifacts.sh mount-config.yml ${HOMEDIR}/
+if [[ $LOG_AVG_MSEC -gt 0 ]]; then
+  # Turn on the time-series logs of the jobfile.
+  sed -i "s/^#log //" ${HOMEDIR}/jobfile.fio
+fi
+
+mkdir -p ${HOMEDIR}/toolchain
+echo "fio version : $(fio --version)" > ${HOMEDIR}/toolchain/toolchain.txt
+cp ${HOMEDIR}/toolchain/toolchain.txt ${HOMEDIR}/details.txt
+echo "local test directory : ${MNT}" >> ${HOMEDIR}/details.txt
+
+if [[ -n "$FAKE_METRICS_PORT" ]]; then
+  python3 ${HOMEDIR}/metrics-scraper.py fake-exporter --port=$FAKE_METRICS_PORT &
+  trap "kill $!" EXIT
+  export METRICS_URL="http://localhost:${FAKE_METRICS_PORT}/metrics"
+fi
+
+if [[ $BATCH -eq 1 ]]; then
+  bash ${HOMEDIR}/run-batch.sh "$CASES_FILE"
+else
+  bash ${HOMEDIR}/run-sweep.sh "$CASES_FILE"
+fi
+echo "Artifacts written to ${ARTIFACTS_ROOT}"
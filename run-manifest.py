@@ -0,0 +1,168 @@
+import argparse
+import contextlib
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+
+# Directory of this script, which also holds parser-script.py.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_parser():
+  """
+  Loads parser-script.py as a module.
+
+  Returns:
+      module: The parser-script module.
+  """
+  path = os.path.join(SCRIPT_DIR, 'parser-script.py')
+  spec = importlib.util.spec_from_file_location('parser_script', path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+def file_sha256(file_path):
+  """
+  Returns the SHA-256 hex digest of a file.
+  """
+  digest = hashlib.sha256()
+  with open(file_path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+def load_manifest(manifest_path, config_hash):
+  """
+  Loads the run manifest of a TESTCASE.
+
+  The manifest records the hash of the configuration the case ran with, the
+  ramp time found by calibration, and for every finished iteration the
+  SHA-256 of each of its files (FIO output and time-series logs) by name.
+
+  Args:
+      manifest_path (str): Path of the manifest JSON file.
+      config_hash (str): Hash of the current configuration of the case.
+
+  Returns:
+      dict: The manifest as a dictionary. A new, empty manifest if the file is
+          missing or unreadable, or was written for another configuration, in
+          which case none of its iterations can be reused.
+  """
+  empty = {'config_hash': config_hash, 'ramp_time': None, 'iterations': {}}
+  try:
+    with open(manifest_path, 'r') as f:
+      manifest = json.load(f)
+  except (OSError, ValueError):
+    return empty
+  if manifest.get('config_hash') != config_hash:
+    print(f"Manifest {manifest_path} is for another configuration; not reusing it.", file=sys.stderr)
+    return empty
+  manifest.setdefault('ramp_time', None)
+  manifest.setdefault('iterations', {})
+  return manifest
+
+def save_manifest(manifest_path, manifest):
+  """
+  Writes the manifest, replacing the old file atomically.
+  """
+  temp_path = f"{manifest_path}.tmp"
+  with open(temp_path, 'w') as f:
+    json.dump(manifest, f, indent=2, sort_keys=True)
+  os.replace(temp_path, manifest_path)
+
+def completed_iterations(manifest, directory, output_prefix):
+  """
+  Checks which recorded iterations can be reused.
+
+  An iteration is reused if all of its files are present in directory with
+  the recorded checksums and its FIO output parses to a non-empty result.
+
+  Args:
+      manifest (dict): A manifest as returned by load_manifest().
+      directory (str): Directory holding the downloaded files of the case.
+      output_prefix (str): Prefix of the FIO output files in directory, as
+                           passed to parser-script.py --output-filepath.
+
+  Returns:
+      list[int]: The sorted list of reusable iteration numbers.
+  """
+  parser = None
+  completed = []
+  for iteration, files in manifest['iterations'].items():
+    valid = True
+    for name, sha256 in files.items():
+      path = os.path.join(directory, name)
+      if not os.path.exists(path) or file_sha256(path) != sha256:
+        print(f"Iteration {iteration}: {name} is missing or changed; rerunning it.", file=sys.stderr)
+        valid = False
+        break
+    if not valid:
+      continue
+    if parser is None:
+      parser = load_parser()
+    output_file = f"{output_prefix}{iteration}.json"
+    # The parser reports bad output on stdout, which must only hold the list.
+    with contextlib.redirect_stdout(sys.stderr):
+      result = parser.parse_fio_output(output_file)
+    if not result.metrics:
+      print(f"Iteration {iteration}: {output_file} has no FIO results; rerunning it.", file=sys.stderr)
+      continue
+    completed.append(int(iteration))
+  return sorted(completed)
+
+def main():
+  """
+  Reads and updates the run manifest that lets an interrupted TESTCASE
+  resume from its last finished iteration.
+  """
+  parser = argparse.ArgumentParser(
+      description="Track the finished iterations of a TESTCASE in its run manifest."
+  )
+  parser.add_argument("--manifest", type=str, required=True, help="Path of the manifest JSON file")
+  parser.add_argument("--config-hash", type=str, required=True, help="Hash of the configuration of the case")
+  subparsers = parser.add_subparsers(dest="command", required=True)
+
+  completed_parser = subparsers.add_parser(
+      "completed", help="Print the numbers of the iterations that can be reused")
+  completed_parser.add_argument(
+      "--output-filepath", type=str, required=True,
+      help="Prefix of the FIO output files (as for parser-script.py)")
+  completed_parser.add_argument(
+      "--ramp-output", type=str, default=None,
+      help="File to write the recorded calibrated ramp time to, if there is one")
+
+  record_parser = subparsers.add_parser(
+      "record", help="Record a finished iteration or the calibrated ramp time")
+  record_parser.add_argument("--iteration", type=int, help="Number of the finished iteration")
+  record_parser.add_argument("--files", type=str, nargs="*", default=[], help="Files of the iteration")
+  record_parser.add_argument("--ramp-time", type=int, default=None, help="Calibrated ramp time in seconds")
+  args = parser.parse_args()
+
+  manifest = load_manifest(args.manifest, args.config_hash)
+
+  if args.command == "completed":
+    directory = os.path.dirname(args.output_filepath) or '.'
+    completed = completed_iterations(manifest, directory, args.output_filepath)
+    print(' '.join(str(i) for i in completed))
+    if args.ramp_output and manifest['ramp_time'] is not None:
+      with open(args.ramp_output, 'w') as f:
+        f.write(f"{manifest['ramp_time']}\n")
+    # Forget the iterations that will be rerun.
+    manifest['iterations'] = {str(i): manifest['iterations'][str(i)] for i in completed}
+    save_manifest(args.manifest, manifest)
+    return 0
+
+  if args.ramp_time is not None:
+    manifest['ramp_time'] = args.ramp_time
+  if args.iteration is not None:
+    if not args.files:
+      print("Error: --files is required with --iteration.", file=sys.stderr)
+      return 1
+    manifest['iterations'][str(args.iteration)] = {
+        os.path.basename(path): file_sha256(path) for path in args.files}
+  save_manifest(args.manifest, manifest)
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,88 @@
+# Runs every case of a sweep one after another on this VM, reusing one fio and
+# gcsfuse build and one mount. Results still go to one artifacts directory per
+# TESTCASE.
+# Usage: bash run-sweep.sh <cases-file>
+# Each line of the cases file holds the KEY=VALUE parameters of one case, e.g.
+#   BLOCKSIZE=4kb IODEPTH=1
+# Blank lines and lines starting with # are ignored. Parameters a line leaves
+# out keep their value from the environment (see run-testcase.sh).
+set -e
+set -x
+
+CASES_FILE=$1
+# Parameters a case line may set.
+CASE_KEYS=" NUMFILES IOTYPE FILESIZE BLOCKSIZE FILEHANDLECOUNT IODEPTH MOUNT_CONFIG READ_AHEAD_KB MAX_BACKGROUND CONGESTION_THRESHOLD "
+# Mount settings a case may set, with their fragment of the TESTCASE name (as
+# in sweep-planner.py). Only the settings a case sets are part of its name.
+TUNING_FRAGMENTS="MOUNT_CONFIG:mc READ_AHEAD_KB:ra MAX_BACKGROUND:mb CONGESTION_THRESHOLD:ct"
+# gcsfuse config the bucket is mounted with. Cases with MOUNT_CONFIG=<hash>
+# run with the variant mount-configs/<hash>.yml (see mount-variants.py), and
+# the bucket is remounted whenever the config changes.
+BASE_CONFIG=${HOMEDIR}/mount-config.yml
+CURRENT_CONFIG=$BASE_CONFIG
+# Only a gcsfuse mount can be remounted (not the directory of run-local.sh).
+REMOUNTABLE=0
+if mountpoint -q "$MNT"; then
+  REMOUNTABLE=1
+fi
+
+FAILED_CASES=0
+# Read the cases on file descriptor 3, so nothing run for a case can consume them.
+while read -r line <&3; do
+  line="${line%%#*}"
+  if [[ -z "${line// /}" ]]; then
+    continue
+  fi
+  for assignment in $line; do
+    if [[ "$assignment" != *=* || "$CASE_KEYS" != *" ${assignment%%=*} "* ]]; then
+      echo "Invalid case parameter \"${assignment}\" in ${CASES_FILE}. Aborting."
+      exit 1
+    fi
+  done
+
+  TESTCASE_TUNING=""
+  for tuning in $TUNING_FRAGMENTS; do
+    for assignment in $line; do
+      if [[ "${assignment%%=*}" == "${tuning%%:*}" ]]; then
+        TESTCASE_TUNING="${TESTCASE_TUNING}-${tuning##*:}-${assignment#*=}"
+      fi
+    done
+  done
+
+  config=$BASE_CONFIG
+  for assignment in $line; do
+    if [[ "${assignment%%=*}" == MOUNT_CONFIG ]]; then
+      config="${HOMEDIR}/mount-configs/${assignment#*=}.yml"
+    fi
+  done
+  if [[ "$config" != "$CURRENT_CONFIG" && $REMOUNTABLE -eq 0 ]]; then
+    echo "Case \"${line}\" failed: ${MNT} is not a gcsfuse mount to remount with ${config}."
+    FAILED_CASES=$((FAILED_CASES + 1))
+    continue
+  fi
+  if [[ "$config" != "$CURRENT_CONFIG" ]]; then
+    if ! bash ${HOMEDIR}/mount-gcsfuse.sh "$config"; then
+      echo "Case \"${line}\" failed: could not mount with ${config}."
+      FAILED_CASES=$((FAILED_CASES + 1))
+      # Mount again for the next case, whatever its config.
+      CURRENT_CONFIG=""
+      continue
+    fi
+    CURRENT_CONFIG=$config
+    export METRICS_URL=$(python3 ${HOMEDIR}/metrics-scraper.py url "$config")
+  fi
+
+  # Each case runs in its own process, so its parameters don't leak into the
+  # next case and a failing case doesn't stop the sweep.
+  if env TESTCASE_TUNING="$TESTCASE_TUNING" MOUNT_CONFIG_FILE="$config" $line bash ${HOMEDIR}/run-testcase.sh; then
+    echo "Case \"${line}\" completed."
+  else
+    echo "Case \"${line}\" failed."
+    FAILED_CASES=$((FAILED_CASES + 1))
+  fi
+done 3< "$CASES_FILE"
+
+if [[ $FAILED_CASES -gt 0 ]]; then
+  echo "${FAILED_CASES} case(s) of the sweep failed."
+  exit 1
+fi
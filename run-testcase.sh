@@ -0,0 +1,260 @@
+# Runs the FIO iterations of one TESTCASE against the mounted bucket, parses
+# them and uploads the raw outputs and results to the artifacts bucket.
+# Usage: bash run-testcase.sh
+# Everything comes from the environment: HOMEDIR (holding jobfile.fio,
+# parser-script.py, mount-variants.py, run-manifest.py, dataset-prep.py, resource-sampler.py,
+# gcsfuse-log-analyzer.py, metrics-scraper.py, fuse-instrument.py and
+# artifacts.sh), MNT, BUCKET,
+# READ_AHEAD_KB, ARTIFACTS_BUCKET (or ARTIFACTS_ROOT, see artifacts.sh), the
+# case parameters NUMFILES, IOTYPE, FILESIZE, BLOCKSIZE, FILEHANDLECOUNT and
+# IODEPTH, and ITERATIONS, MIN_ITERATIONS, CI_TOLERANCE, LOG_AVG_MSEC,
+# RAMP_TIME, ADAPTIVE_RAMP, DIRECT (default 1), RUNTIME (default 2m) and
+# RESOURCE_HZ (default 100, 0 to not sample resources or the FUSE connection).
+# If the case sets the mount settings MOUNT_CONFIG, READ_AHEAD_KB,
+# MAX_BACKGROUND or CONGESTION_THRESHOLD, run-sweep.sh passes their TESTCASE
+# name fragments in TESTCASE_TUNING; the sysfs ones are then applied before
+# every run and the previous values restored afterwards. MOUNT_CONFIG_FILE is
+# the gcsfuse config the bucket is mounted with (default:
+# ${HOMEDIR}/mount-config.yml). If GCSFUSE_LOG names
+# the trace log of the mount, the FUSE ops and GCS requests of the iterations
+# are summarized from it, and if METRICS_URL is its Prometheus endpoint, it is
+# scraped during every iteration.
+set -e
+set -x
+
+source ${HOMEDIR}/artifacts.sh
+ARTIFACTS_ROOT=${ARTIFACTS_ROOT:-gs://${ARTIFACTS_BUCKET}}
+DIRECT=${DIRECT:-1}
+RUNTIME=${RUNTIME:-2m}
+RESOURCE_HZ=${RESOURCE_HZ:-100}
+MOUNT_CONFIG_FILE=${MOUNT_CONFIG_FILE:-${HOMEDIR}/mount-config.yml}
+
+TESTCASE="numfile-${NUMFILES}-io-${IOTYPE}-fs-${FILESIZE}-bs-${BLOCKSIZE}-fh-${FILEHANDLECOUNT}${TESTCASE_TUNING}"
+# Read-only cases with the same files share them (see dataset-prep.py); cases
+# that write keep their own, so they never change the files of other cases.
+if [[ " read randread " == *" ${IOTYPE} "* ]]; then
+  DATASET="numfile-${NUMFILES}-fs-${FILESIZE}-fh-${FILEHANDLECOUNT}"
+else
+  DATASET="$TESTCASE"
+fi
+# Outputs of each case are kept apart, so cases of a sweep don't overwrite each other.
+CASEDIR="${HOMEDIR}/cases/${TESTCASE}"
+mkdir -p "$CASEDIR"
+cd "$CASEDIR"
+
+artifacts_cp ${HOMEDIR}/details.txt ${ARTIFACTS_ROOT}/${TESTCASE}/
+# The exact gcsfuse config of the results; its hash is MOUNT_CONFIG, if set.
+artifacts_cp "$MOUNT_CONFIG_FILE" ${ARTIFACTS_ROOT}/${TESTCASE}/mount-config.yml
+# The hash is also computed for mount-config.yml itself and recorded in
+# fio_results.csv, so results can be joined across configs.
+MOUNT_CONFIG_HASH=$(python3 ${HOMEDIR}/mount-variants.py --hash "$MOUNT_CONFIG_FILE")
+
+# The run manifest next to the artifacts records the iterations that already
+# finished with this configuration, so a rerun after an interruption (e.g. a
+# preempted VM) only runs the missing ones. Anything that changes the results
+# is part of the configuration hash.
+CONFIG_HASH=$( {
+  echo "NUMFILES=${NUMFILES} IOTYPE=${IOTYPE} FILESIZE=${FILESIZE} BLOCKSIZE=${BLOCKSIZE} FILEHANDLECOUNT=${FILEHANDLECOUNT} IODEPTH=${IODEPTH}"
+  echo "MAX_BACKGROUND=${MAX_BACKGROUND} CONGESTION_THRESHOLD=${CONGESTION_THRESHOLD}"
+  echo "BUCKET=${BUCKET} READ_AHEAD_KB=${READ_AHEAD_KB} DIRECT=${DIRECT} RUNTIME=${RUNTIME} LOG_AVG_MSEC=${LOG_AVG_MSEC} RAMP_TIME=${RAMP_TIME} ADAPTIVE_RAMP=${ADAPTIVE_RAMP}"
+  cat ${HOMEDIR}/jobfile.fio "$MOUNT_CONFIG_FILE" ${HOMEDIR}/toolchain/toolchain.txt
+} | sha256sum | cut -d' ' -f1)
+MANIFEST="${CASEDIR}/manifest.json"
+# Nothing to download on a first run.
+artifacts_cp ${ARTIFACTS_ROOT}/${TESTCASE}/manifest.json "$MANIFEST" || rm -f "$MANIFEST"
+if [[ -s "$MANIFEST" ]]; then
+  artifacts_cp "${ARTIFACTS_ROOT}/${TESTCASE}/raw-fio-output/fio_output_iteration_*.json" "$CASEDIR/" || true
+  if [[ $LOG_AVG_MSEC -gt 0 ]]; then
+    artifacts_cp "${ARTIFACTS_ROOT}/${TESTCASE}/raw-fio-logs/fio_log_iteration_*.log" "$CASEDIR/" || true
+  fi
+  if [[ $RESOURCE_HZ -gt 0 ]]; then
+    artifacts_cp "${ARTIFACTS_ROOT}/${TESTCASE}/raw-resource-samples/resource_iteration_*.bin" "$CASEDIR/" || true
+  fi
+  if [[ $RESOURCE_HZ -gt 0 ]]; then
+    artifacts_cp "${ARTIFACTS_ROOT}/${TESTCASE}/raw-fuse-stats/fuse_iteration_*.json" "$CASEDIR/" || true
+  fi
+  if [[ -n "$METRICS_URL" ]]; then
+    artifacts_cp "${ARTIFACTS_ROOT}/${TESTCASE}/raw-gcsfuse-metrics/gcsfuse_metrics_iteration_*.json" "$CASEDIR/" || true
+  fi
+fi
+rm -f ${CASEDIR}/ramp_time.txt ${CASEDIR}/iteration_windows.txt
+DONE_ITERATIONS=" $(python3 ${HOMEDIR}/run-manifest.py --manifest="$MANIFEST" --config-hash="$CONFIG_HASH" completed --output-filepath="${CASEDIR}/fio_output_iteration_" --ramp-output="${CASEDIR}/ramp_time.txt") "
+echo "Iterations already done: ${DONE_ITERATIONS}"
+
+# Uploads the manifest after it changed.
+upload_manifest() {
+  artifacts_cp "$MANIFEST" ${ARTIFACTS_ROOT}/${TESTCASE}/manifest.json
+}
+upload_manifest
+
+if [[ " read randread rw readwrite randrw " == *" ${IOTYPE} "* ]]; then
+  # Lay out the files before the timed runs instead of during the first one.
+  python3 ${HOMEDIR}/dataset-prep.py --directory="$MNT" --dataset="$DATASET" --numfiles=$NUMFILES --filesize=$FILESIZE --jobs=$FILEHANDLECOUNT
+fi
+
+# Puts back the mount settings from before the case, for the cases after it.
+restore_tuning() {
+  if [[ -f ${CASEDIR}/tuning_saved.json ]]; then
+    sudo python3 ${HOMEDIR}/fuse-instrument.py restore --mount="$MNT" --saved=${CASEDIR}/tuning_saved.json || true
+  fi
+}
+# Whether the case changes sysfs settings of the mount.
+if [[ "$TESTCASE_TUNING" =~ -(ra|mb|ct)- ]]; then
+  APPLY_TUNING=1
+  rm -f ${CASEDIR}/tuning_saved.json
+  trap restore_tuning EXIT
+fi
+
+# Applies the mount settings of the case; they are re-applied before every
+# run in case anything changed them in between.
+apply_tuning() {
+  if [[ -n "$APPLY_TUNING" ]]; then
+    sudo python3 ${HOMEDIR}/fuse-instrument.py apply --mount="$MNT" --save=${CASEDIR}/tuning_saved.json \
+      ${READ_AHEAD_KB:+--read-ahead-kb=$READ_AHEAD_KB} ${MAX_BACKGROUND:+--max-background=$MAX_BACKGROUND} \
+      ${CONGESTION_THRESHOLD:+--congestion-threshold=$CONGESTION_THRESHOLD}
+  fi
+}
+
+# Runs the jobfile once. Arguments: output file, log prefix, ramp time.
+run_fio() {
+  LOGPREFIX="$2" RAMP_TIME="$3" DIRECT=$DIRECT RUNTIME=$RUNTIME LOG_AVG_MSEC=$LOG_AVG_MSEC MNTDIR=${MNT} IODEPTH=$IODEPTH TESTCASE=$TESTCASE DATASET=$DATASET IOTYPE=$IOTYPE BLOCKSIZE=$BLOCKSIZE FILESIZE=$FILESIZE NUMFILES=$NUMFILES FILEHANDLECOUNT=$FILEHANDLECOUNT fio --output-format=json+ ${HOMEDIR}/jobfile.fio  > "$1" 2>&1
+}
+
+if [[ -s ${CASEDIR}/ramp_time.txt ]]; then
+  # Calibrated by an earlier, interrupted run of this case.
+  RAMP_TIME=$(cat ${CASEDIR}/ramp_time.txt)
+  echo "Using RAMP_TIME=${RAMP_TIME}s from the run manifest"
+elif [[ $ADAPTIVE_RAMP -eq 1 && $LOG_AVG_MSEC -gt 0 ]]; then
+  # Calibration run without ramp_time: the parser finds where bandwidth and
+  # latency settle, and that warm-up becomes the ramp_time of the iterations.
+  apply_tuning
+  run_fio "${CASEDIR}/fio_output_calibration_1.json" "${CASEDIR}/fio_log_calibration_1" 0
+  python3 ${HOMEDIR}/parser-script.py --iterations=1 --output-filepath="${CASEDIR}/fio_output_calibration_" --csv-output=calibration_results.csv --timeseries-csv=calibration_timeseries.csv --log-prefix="${CASEDIR}/fio_log_calibration_" --steady-window=10 --ramp-output="${CASEDIR}/ramp_time.txt"
+  if [[ -s ${CASEDIR}/ramp_time.txt ]]; then
+    RAMP_TIME=$(cat ${CASEDIR}/ramp_time.txt)
+  fi
+  echo "Using RAMP_TIME=${RAMP_TIME}s for the iterations"
+  python3 ${HOMEDIR}/run-manifest.py --manifest="$MANIFEST" --config-hash="$CONFIG_HASH" record --ramp-time="$RAMP_TIME"
+  upload_manifest
+  artifacts_cp ${CASEDIR}/fio_output_calibration_1.json "${CASEDIR}/fio_log_calibration_1_*.log" calibration_results.csv calibration_timeseries.csv ${ARTIFACTS_ROOT}/${TESTCASE}/calibration/
+fi
+
+# Starts a background sampler and waits until it has created its output
+# file. Arguments: output file, then the sampler command.
+start_sampler() {
+  local output=$1
+  shift
+  rm -f "$output"
+  "$@" &
+  SAMPLER_PIDS="$SAMPLER_PIDS $!"
+  while [[ ! -s "$output" ]] && kill -0 $! 2>/dev/null; do
+    sleep 0.1
+  done
+}
+
+# Runs the jobfile once while resource-sampler.py samples CPU, gcsfuse,
+# network and pressure counters into a ring buffer file, fuse-instrument.py
+# records the FUSE connection and bdi settings of the mount and the requests
+# waiting in it, and metrics-scraper.py scrapes the gcsfuse metrics.
+# Arguments: output file, log prefix, ramp time, samples file, metrics file,
+# FUSE record file.
+run_fio_sampled() {
+  apply_tuning
+  SAMPLER_PIDS=""
+  if [[ $RESOURCE_HZ -gt 0 ]]; then
+    start_sampler "$4" python3 ${HOMEDIR}/resource-sampler.py --output="$4" --hz=$RESOURCE_HZ
+    start_sampler "$6" python3 ${HOMEDIR}/fuse-instrument.py record --mount="$MNT" --output="$6" --hz=$RESOURCE_HZ
+  fi
+  if [[ -n "$METRICS_URL" ]]; then
+    start_sampler "$5" python3 ${HOMEDIR}/metrics-scraper.py scrape --url="$METRICS_URL" --output="$5" --skip-seconds="$3"
+  fi
+  local status=0
+  run_fio "$1" "$2" "$3" || status=$?
+  for pid in $SAMPLER_PIDS; do
+    kill -TERM $pid
+    wait $pid || true
+  done
+  return $status
+}
+
+# Adaptive mode is on for any CI_TOLERANCE above zero, however it is written
+# (e.g. 0.0 turns it off too).
+CHECK_CONVERGENCE=0
+if python3 -c 'import sys; sys.exit(float(sys.argv[1]) <= 0)' "$CI_TOLERANCE"; then
+  CHECK_CONVERGENCE=1
+fi
+
+for ((i=1; i<=$ITERATIONS; i++)); do
+  output_file="${CASEDIR}/fio_output_iteration_${i}.json"
+  if [[ "$DONE_ITERATIONS" == *" $i "* ]]; then
+    echo "FIO iteration $i already done. Reusing: $output_file"
+  else
+    window_start=$(date +%s.%N)
+    fio_status=0
+    run_fio_sampled "$output_file" "${CASEDIR}/fio_log_iteration_${i}" "$RAMP_TIME" "${CASEDIR}/resource_iteration_${i}.bin" "${CASEDIR}/gcsfuse_metrics_iteration_${i}.json" "${CASEDIR}/fuse_iteration_${i}.json" || fio_status=$?
+    # Lets the gcsfuse log be attributed to the iterations.
+    echo "$i $window_start $(date +%s.%N)" >> ${CASEDIR}/iteration_windows.txt
+
+    # Check if FIO command was successful
+    if [[ $fio_status -eq 0 ]]; then
+      echo "FIO iteration $i completed successfully. Output saved to: $output_file"
+      artifacts_cp $output_file ${ARTIFACTS_ROOT}/${TESTCASE}/raw-fio-output/
+      iteration_files="$output_file"
+      if [[ $LOG_AVG_MSEC -gt 0 ]]; then
+        artifacts_cp "${CASEDIR}/fio_log_iteration_${i}_*.log" ${ARTIFACTS_ROOT}/${TESTCASE}/raw-fio-logs/
+        iteration_files="$iteration_files $(ls ${CASEDIR}/fio_log_iteration_${i}_*.log)"
+      fi
+      if [[ -s ${CASEDIR}/resource_iteration_${i}.bin ]]; then
+        artifacts_cp ${CASEDIR}/resource_iteration_${i}.bin ${ARTIFACTS_ROOT}/${TESTCASE}/raw-resource-samples/
+        iteration_files="$iteration_files ${CASEDIR}/resource_iteration_${i}.bin"
+      fi
+      if [[ -s ${CASEDIR}/fuse_iteration_${i}.json ]]; then
+        artifacts_cp ${CASEDIR}/fuse_iteration_${i}.json ${ARTIFACTS_ROOT}/${TESTCASE}/raw-fuse-stats/
+        iteration_files="$iteration_files ${CASEDIR}/fuse_iteration_${i}.json"
+      fi
+      if [[ -s ${CASEDIR}/gcsfuse_metrics_iteration_${i}.json ]]; then
+        artifacts_cp ${CASEDIR}/gcsfuse_metrics_iteration_${i}.json ${ARTIFACTS_ROOT}/${TESTCASE}/raw-gcsfuse-metrics/
+        iteration_files="$iteration_files ${CASEDIR}/gcsfuse_metrics_iteration_${i}.json"
+      fi
+      # Recorded only once everything of the iteration is uploaded.
+      python3 ${HOMEDIR}/run-manifest.py --manifest="$MANIFEST" --config-hash="$CONFIG_HASH" record --iteration=$i --files $iteration_files
+      upload_manifest
+    else
+      echo "FIO iteration $i failed. Output saved to: $output_file"
+      # You can add more error handling here, e.g., exit the script.
+    fi
+  fi
+  COMPLETED_ITERATIONS=$i
+
+  # Adaptive mode: stop as soon as bandwidth and p99 latency have converged.
+  if [[ $CHECK_CONVERGENCE -eq 1 && $i -ge $MIN_ITERATIONS && $i -lt $ITERATIONS ]]; then
+    if python3 ${HOMEDIR}/parser-script.py --iterations=$i --output-filepath="${CASEDIR}/fio_output_iteration_" --jobs=0 --csv-output=/dev/null --check-convergence="$CI_TOLERANCE"; then
+      echo "Converged after $i iterations."
+      break
+    fi
+  fi
+done
+ITERATIONS=$COMPLETED_ITERATIONS
+
+# Parsing logic
+RESOURCE_ARGS=""
+if [[ $RESOURCE_HZ -gt 0 ]]; then
+  RESOURCE_ARGS="--resource-prefix=${CASEDIR}/resource_iteration_ --fuse-prefix=${CASEDIR}/fuse_iteration_"
+fi
+if [[ -n "$METRICS_URL" ]]; then
+  RESOURCE_ARGS="$RESOURCE_ARGS --metrics-prefix=${CASEDIR}/gcsfuse_metrics_iteration_"
+fi
+if [[ $LOG_AVG_MSEC -gt 0 ]]; then
+  python3 ${HOMEDIR}/parser-script.py --iterations=$ITERATIONS --output-filepath="${CASEDIR}/fio_output_iteration_" --jobs=0 --log-prefix="${CASEDIR}/fio_log_iteration_" --steady-window=10 --ramp-time="$RAMP_TIME" --mount-config-hash="$MOUNT_CONFIG_HASH" $RESOURCE_ARGS
+  artifacts_cp fio_timeseries.csv ${ARTIFACTS_ROOT}/${TESTCASE}/results/
+else
+  python3 ${HOMEDIR}/parser-script.py --iterations=$ITERATIONS --output-filepath="${CASEDIR}/fio_output_iteration_" --jobs=0 --ramp-time="$RAMP_TIME" --mount-config-hash="$MOUNT_CONFIG_HASH" $RESOURCE_ARGS
+fi
+artifacts_cp fio_results.csv ${ARTIFACTS_ROOT}/${TESTCASE}/results/
+
+if [[ -n "$GCSFUSE_LOG" && -f "$GCSFUSE_LOG" && -s ${CASEDIR}/iteration_windows.txt ]]; then
+  # Latency of every FUSE op and GCS request type per iteration. The offset
+  # file makes each case read only what was logged since the previous one.
+  python3 ${HOMEDIR}/gcsfuse-log-analyzer.py "$GCSFUSE_LOG" --windows=${CASEDIR}/iteration_windows.txt --skip-seconds="$RAMP_TIME" --offset-file=${HOMEDIR}/gcsfuse-log.offset --output=gcsfuse_ops.csv
+  artifacts_cp gcsfuse_ops.csv ${ARTIFACTS_ROOT}/${TESTCASE}/results/
+fi
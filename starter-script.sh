@@ -2,42 +2,14 @@ set -x
 # Exit immediately if a command exits with a non-zero status.
 set -e
 
-# Extract the metadata parameters passed, for which we need the zone of the GCE VM
-# on which the tests are supposed to run.
-ZONE=$(curl -H "Metadata-Flavor: Google" http://metadata.google.internal/computeMetadata/v1/instance/zone)
-echo "Got ZONE=\"${ZONE}\" from metadata server."
-# The format for the above extracted zone is projects/{project-id}/zones/{zone}, thus, from this
-# need extracted zone name.
-ZONE_NAME=$(basename $ZONE)
-# This parameter is passed as the GCE VM metadata at the time of creation.(Logic is handled in louhi stage script)
-
-# ITERATIONS
-ITERATIONS=$(gcloud compute instances describe "$HOSTNAME" --zone="$ZONE_NAME" --format='get(metadata.ITERATIONS)')
-echo "ITERATIONS : \"${ITERATIONS}\""
-# IODEPTH
-IODEPTH=$(gcloud compute instances describe "$HOSTNAME" --zone="$ZONE_NAME" --format='get(metadata.IODEPTH)')
-echo "IODEPTH : \"${IODEPTH}\""
-# READ_AHEAD_KB
-READ_AHEAD_KB=$(gcloud compute instances describe "$HOSTNAME" --zone="$ZONE_NAME" --format='get(metadata.READ_AHEAD_KB)')
-echo "READ_AHEAD_KB : \"${READ_AHEAD_KB}\""
-# FILESIZE
-FILESIZE=$(gcloud compute instances describe "$HOSTNAME" --zone="$ZONE_NAME" --format='get(metadata.FILESIZE)')
-echo "FILESIZE : \"${FILESIZE}\""
-# BLOCKSIZE
-BLOCKSIZE=$(gcloud compute instances describe "$HOSTNAME" --zone="$ZONE_NAME" --format='get(metadata.BLOCKSIZE)')
-echo "BLOCKSIZE : \"${BLOCKSIZE}\""
-# FILEHANDLECOUNT
-FILEHANDLECOUNT=$(gcloud compute instances describe "$HOSTNAME" --zone="$ZONE_NAME" --format='get(metadata.FILEHANDLECOUNT)')
-echo "FILEHANDLECOUNT : \"${FILEHANDLECOUNT}\""
-# IOTYPE
-IOTYPE=$(gcloud compute instances describe "$HOSTNAME" --zone="$ZONE_NAME" --format='get(metadata.IOTYPE)')
-echo "IOTYPE : \"${IOTYPE}\""
-# NUMFILES
-NUMFILES=$(gcloud compute instances describe "$HOSTNAME" --zone="$ZONE_NAME" --format='get(metadata.NUMFILES)')
-echo "NUMFILES : \"${NUMFILES}\""
-# BUCKET
-BUCKET=$(gcloud compute instances describe "$HOSTNAME" --zone="$ZONE_NAME" --format='get(metadata.BUCKET)')
-echo "BUCKET : \"${BUCKET}\""
+# All run parameters are passed as GCE VM metadata attributes (see
+# create-vm-and-start-test.sh). metadata-bootstrap.py, itself shipped as an
+# attribute, reads them in a single request to the metadata server, validates
+# them and prints them as export statements.
+curl -sf -H "Metadata-Flavor: Google" http://metadata.google.internal/computeMetadata/v1/instance/attributes/metadata-bootstrap -o /tmp/metadata-bootstrap.py
+METADATA_EXPORTS=$(python3 /tmp/metadata-bootstrap.py)
+echo "${METADATA_EXPORTS}"
+eval "${METADATA_EXPORTS}"
 
 # Disable automatic updates
 sudo systemctl stop apt-daily.timer
@@ -45,8 +17,11 @@ sudo systemctl stop apt-daily-upgrade.timer
 sudo systemctl mask apt-daily.timer
 sudo systemctl mask apt-daily-upgrade.timer
 
-# run the following commands to add starterscriptuser
-sudo adduser --ingroup google-sudoers --disabled-password --home=/home/starterscriptuser --gecos "" starterscriptuser
+# run the following commands to add starterscriptuser (unless the script runs
+# again after a restart of the VM)
+if ! id starterscriptuser > /dev/null 2>&1; then
+  sudo adduser --ingroup google-sudoers --disabled-password --home=/home/starterscriptuser --gecos "" starterscriptuser
+fi
 # Run the following as starterscriptuser
 sudo -u starterscriptuser bash -c '
   set -e
@@ -60,7 +35,23 @@ sudo -u starterscriptuser bash -c '
   export IOTYPE='$IOTYPE'
   export NUMFILES='$NUMFILES'
   export BUCKET='$BUCKET'
-  export ARTIFACTS_BUCKET='anushkadhn-test'
+  export LOG_AVG_MSEC='$LOG_AVG_MSEC'
+  export RAMP_TIME='$RAMP_TIME'
+  export ADAPTIVE_RAMP='$ADAPTIVE_RAMP'
+  export MIN_ITERATIONS='$MIN_ITERATIONS'
+  export CI_TOLERANCE='$CI_TOLERANCE'
+  export BATCH='$BATCH'
+  export RESOURCE_HZ='$RESOURCE_HZ'
+  export RUN_DIR='$RUN_DIR'
+  export ARTIFACTS_BUCKET='$ARTIFACTS_BUCKET'
+
+  # Leaves the exit status of the run next to its scripts, so whoever started
+  # the VM knows when it is done (see sweep-scheduler.py).
+  report_status() {
+    local status=$?
+    echo "$status" | gsutil cp - gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/sweep-status.txt
+  }
+  trap report_status EXIT
 
   retry_apt_command() {
     local max_retries=10
@@ -84,69 +75,77 @@ sudo -u starterscriptuser bash -c '
   echo "Installing dependencies..."
   retry_apt_command sudo apt-get install libaio-dev
   retry_apt_command sudo apt-get install gcc make git
+  # mount-variants.py needs PyYAML to hash the mount config of the results.
+  retry_apt_command sudo apt-get install python3-yaml
+  if [[ $LOG_AVG_MSEC -gt 0 ]]; then
+    # The parser needs NumPy to analyze the time-series logs.
+    retry_apt_command sudo apt-get install python3-numpy
+  fi
 
 
-  TESTCASE="numfile-${NUMFILES}-io-${IOTYPE}-fs-${FILESIZE}-bs-${BLOCKSIZE}-fh-${FILEHANDLECOUNT}"
   cd ~
   HOMEDIR=$(pwd)
-
-  git clone -b fio-3.39 https://github.com/axboe/fio.git
-  cd fio
-  ./configure && sudo make && sudo make install
-  cd ..
-
-  wget -O go_tar.tar.gz https://go.dev/dl/go1.24.4.linux-amd64.tar.gz -q
-  sudo rm -rf /usr/local/go && tar -xzf go_tar.tar.gz && sudo mv go /usr/local
-  export PATH=$PATH:/usr/local/go/bin
-
-  git clone https://github.com/GoogleCloudPlatform/gcsfuse.git
-  cd gcsfuse
-  git checkout v3.0.0
-  go build .
-  cd ..
-
-
-  touch details.txt
-  echo "go version : $(go version)" >> details.txt
+  export HOMEDIR
+
+  # Scripts and the list of cases of this run, uploaded by create-vm-and-start-test.sh.
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/jobfile.fio ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/parser-script.py ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/mount-config.yml ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/run-testcase.sh ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/run-sweep.sh ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/run-manifest.py ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/artifacts.sh ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/run-batch.sh ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/batch-jobfile.py ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/sweep-planner.py ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/dataset-prep.py ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/resource-sampler.py ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/gcsfuse-log-analyzer.py ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/metrics-scraper.py ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/fuse-instrument.py ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/mount-gcsfuse.sh ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/mount-variants.py ${HOMEDIR}/
+  # Variants of mount-config.yml for cases with MOUNT_CONFIG, if the sweep has any.
+  gsutil -m cp -r gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/mount-configs ${HOMEDIR}/ || true
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/toolchain-cache.sh ${HOMEDIR}/
+  gsutil cp gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/cases.txt ${HOMEDIR}/
+
+  # Prebuilt fio and gcsfuse binaries come from the artifacts bucket; they are
+  # only built (and then cached) the first time this toolchain is used.
+  bash ${HOMEDIR}/toolchain-cache.sh gs://${ARTIFACTS_BUCKET}/toolchain-cache ${HOMEDIR}/toolchain
+
+  cp ${HOMEDIR}/toolchain/toolchain.txt details.txt
   echo "fio version : $(fio --version)" >> details.txt
-  echo "GCSFuse version: 3.0.0" >> details.txt
-  gsutil cp details.txt gs://${ARTIFACTS_BUCKET}/${TESTCASE}/
-
-  gsutil cp gs://${ARTIFACTS_BUCKET}/${TESTCASE}/jobfile.fio ${HOMEDIR}/
-  gsutil cp gs://${ARTIFACTS_BUCKET}/${TESTCASE}/parser-script.py ${HOMEDIR}/
-  gsutil cp gs://${ARTIFACTS_BUCKET}/${TESTCASE}/mount-config.yml ${HOMEDIR}/
+  echo "GCSFuse version: $(${HOMEDIR}/toolchain/gcsfuse --version)" >> details.txt
 
-  mkdir ${HOMEDIR}/mnt
-
-  ${HOMEDIR}/gcsfuse/gcsfuse --config-file=${HOMEDIR}/mount-config.yml $BUCKET ${HOMEDIR}/mnt
+  if [[ $LOG_AVG_MSEC -gt 0 ]]; then
+    # Turn on the time-series logs of the jobfile.
+    sed -i "s/^#log //" ${HOMEDIR}/jobfile.fio
+  fi
 
   export MNT="${HOMEDIR}"/mnt
-  # Get device ID from mount path (as root)
-  DEVICE_ID=$(stat -c "%d" ${HOMEDIR}/mnt)
-  # Then use the device ID to write to the read_ahead_kb as root
-  echo "${READ_AHEAD_KB}" | sudo tee /sys/class/bdi/0:${DEVICE_ID}/read_ahead_kb
-
-
-  for ((i=1; i<=$ITERATIONS; i++)); do
-    output_file="${HOMEDIR}/fio_output_iteration_${i}.json"
-    MNTDIR=${HOMEDIR}/mnt IODEPTH=$IODEPTH TESTCASE=$TESTCASE IOTYPE=$IOTYPE BLOCKSIZE=$BLOCKSIZE FILESIZE=$FILESIZE NUMFILES=$NUMFILES FILEHANDLECOUNT=$FILEHANDLECOUNT fio --output-format=json ${HOMEDIR}/jobfile.fio  > "$output_file" 2>&1
-
-    # Check if FIO command was successful
-    if [[ $? -eq 0 ]]; then
-      echo "FIO iteration $i completed successfully. Output saved to: $output_file"
-      gsutil cp $output_file gs://${ARTIFACTS_BUCKET}/${TESTCASE}/raw-fio-output/
-    else
-      echo "FIO iteration $i failed. Output saved to: $output_file"
-      # You can add more error handling here, e.g., exit the script.
-    fi
-  done
-
+  export GCSFUSE_LOG=${HOMEDIR}/gcsfuse.log
+  # The FUSE connection and bdi settings the cases run with go into details.txt.
+  bash ${HOMEDIR}/mount-gcsfuse.sh ${HOMEDIR}/mount-config.yml >> details.txt
+  # The Prometheus endpoint turned on in mount-config.yml, if any, is scraped
+  # during every iteration.
+  export METRICS_URL=$(python3 ${HOMEDIR}/metrics-scraper.py url ${HOMEDIR}/mount-config.yml)
+
+  # All cases run against this one build and mount; the sweep keeps going
+  # past a failed case and reports it at the end.
+  SWEEP_STATUS=0
+  if [[ $BATCH -eq 1 ]]; then
+    bash ${HOMEDIR}/run-batch.sh ${HOMEDIR}/cases.txt || SWEEP_STATUS=$?
+  else
+    bash ${HOMEDIR}/run-sweep.sh ${HOMEDIR}/cases.txt || SWEEP_STATUS=$?
+  fi
 
   umount ${HOMEDIR}/mnt
-
-  # Parsing logic
-  python3 parser-script.py --iterations=$ITERATIONS --output-filepath="${HOMEDIR}/fio_output_iteration_"
-  gsutil cp fio_results.csv gs://$ARTIFACTS_BUCKET/${TESTCASE}/results/
+  # The current log compressed, along with the ones gcsfuse rotated, which it
+  # names gcsfuse-<timestamp>.log(.gz).
+  gzip -f ${GCSFUSE_LOG}
+  gsutil -m cp ${HOMEDIR}/gcsfuse*.log* gs://${ARTIFACTS_BUCKET}/${RUN_DIR}/gcsfuse-logs/ || true
+  exit $SWEEP_STATUS
 
 '
 
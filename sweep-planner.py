@@ -0,0 +1,275 @@
+import argparse
+import itertools
+import sys
+import tomllib
+
+try:
+  import yaml
+except ImportError:  # Only needed for YAML sweep specs
+  yaml = None
+
+# Parameters a case can set (see run-sweep.sh): name -> (fragment of the
+# TESTCASE name, or None if the parameter is not part of it, and the default
+# cost of changing it between two cases on the same VM). Changing the number,
+# size or handle count of the files makes FIO lay out a new dataset, which is
+# far more expensive than switching the block size or access pattern, and
+# switching the gcsfuse config (a variant of mount-variants.py, by hash)
+# remounts the bucket, which is more expensive still. The kernel readahead
+# and FUSE queue settings are re-applied through sysfs without remounting, so
+# they are cheap.
+CASE_KEYS = {
+    'NUMFILES': ('numfile', 10),
+    'IOTYPE': ('io', 1),
+    'FILESIZE': ('fs', 10),
+    'BLOCKSIZE': ('bs', 1),
+    'FILEHANDLECOUNT': ('fh', 10),
+    'IODEPTH': (None, 1),
+    'MOUNT_CONFIG': ('mc', 20),
+    'READ_AHEAD_KB': ('ra', 1),
+    'MAX_BACKGROUND': ('mb', 1),
+    'CONGESTION_THRESHOLD': ('ct', 1),
+}
+# Mount settings a case may leave out to keep those of the mount. When a case
+# sets them, they are appended to its TESTCASE name (see run-sweep.sh).
+TUNING_KEYS = ['MOUNT_CONFIG', 'READ_AHEAD_KB', 'MAX_BACKGROUND', 'CONGESTION_THRESHOLD']
+# Parameters every case needs.
+REQUIRED_KEYS = [key for key in CASE_KEYS if key not in TUNING_KEYS]
+# Parameters that always make up the TESTCASE name, in order.
+TESTCASE_KEYS = [key for key, (fragment, _) in CASE_KEYS.items() if fragment and key not in TUNING_KEYS]
+# Parameters that determine the files FIO reads, i.e. the dataset.
+DATASET_KEYS = ['NUMFILES', 'FILESIZE', 'FILEHANDLECOUNT']
+# IOTYPEs that only read their files, so cases can share them. Cases that write
+# keep files of their own, named after their TESTCASE, so they never change
+# the files of other cases.
+SHARED_DATASET_IOTYPES = ['read', 'randread']
+
+def load_spec(path):
+  """
+  Loads a sweep spec from a TOML or (if PyYAML is installed) YAML file.
+
+  A spec has the sections:
+    axes: parameter -> list of values; the sweep is their cartesian product.
+    defaults: parameter -> value, for parameters that don't vary.
+    exclude: list of conditions; cases matching any of them are dropped.
+    override: list of {match = condition, set = {parameter = value}} applied
+      in order to the matching cases.
+    costs: parameter -> cost of changing it between consecutive cases.
+  A condition maps parameters to a value or a list of accepted values.
+
+  Args:
+      path (str): Path of the spec file (.toml, .yml or .yaml).
+
+  Returns:
+      dict: The spec as a dictionary.
+  """
+  if path.endswith(('.yml', '.yaml')):
+    if yaml is None:
+      raise ValueError("PyYAML is needed to read YAML sweep specs.")
+    with open(path, 'r') as f:
+      return yaml.safe_load(f) or {}
+  with open(path, 'rb') as f:
+    return tomllib.load(f)
+
+def matches(params, condition):
+  """
+  Checks whether the parameters of a case satisfy a condition.
+
+  Args:
+      params (dict): A dictionary of parameter names to values (strings).
+      condition (dict): A dictionary of parameter names to a value or a list of
+                        values.
+
+  Returns:
+      bool: True if every parameter of the condition has one of its values.
+  """
+  for key, accepted in condition.items():
+    if not isinstance(accepted, list):
+      accepted = [accepted]
+    if params.get(key) not in [str(value) for value in accepted]:
+      return False
+  return True
+
+def testcase_name(params):
+  """
+  Builds the TESTCASE name of a case, as run-testcase.sh does.
+
+  Args:
+      params (dict): A dictionary of parameter names to values.
+
+  Returns:
+      str: The name, e.g. numfile-1-io-read-fs-1gb-bs-4kb-fh-1, or with tuning
+          numfile-1-io-read-fs-1gb-bs-4kb-fh-1-mc-0aecb516943f-ra-4096-mb-64.
+  """
+  keys = TESTCASE_KEYS + [key for key in TUNING_KEYS if params.get(key)]
+  return '-'.join(f"{CASE_KEYS[key][0]}-{params[key]}" for key in keys)
+
+def dataset_name(params):
+  """
+  Builds the name of the dataset a case reads, as run-testcase.sh does. Cases
+  with the same name share their files.
+
+  Args:
+      params (dict): A dictionary of parameter names to values.
+
+  Returns:
+      str: The name, e.g. numfile-1-fs-1gb-fh-1, or the TESTCASE name for a case
+          that writes.
+  """
+  if params.get('IOTYPE') not in SHARED_DATASET_IOTYPES:
+    return testcase_name(params)
+  return '-'.join(f"{CASE_KEYS[key][0]}-{params[key]}" for key in DATASET_KEYS)
+
+def transition_cost(previous, params, costs):
+  """
+  Returns the cost of running a case right after another one on the same VM.
+
+  Args:
+      previous (dict): Parameters of the previous case, or None for the first
+                       case.
+      params (dict): Parameters of the case.
+      costs (dict): A dictionary of parameter names to the cost of changing
+                    them.
+
+  Returns:
+      int: The sum of the costs of the parameters that change.
+  """
+  if previous is None:
+    return 0
+  return sum(costs[key] for key in params if previous.get(key) != params[key])
+
+def plan_cases(spec):
+  """
+  Expands a sweep spec into its cases, ordered to keep expensive transitions
+  rare: cases are sorted by their parameters, with the most expensive ones
+  outermost, so e.g. all block sizes run on one dataset before the next
+  dataset is laid out.
+
+  Args:
+      spec (dict): A sweep spec as returned by load_spec().
+
+  Returns:
+      tuple[list[dict], dict]: A tuple (cases, costs): the list of case
+          parameter dictionaries in run order, and the transition cost per
+          parameter.
+  """
+  axes = spec.get('axes', {})
+  defaults = spec.get('defaults', {})
+  overrides = spec.get('override', [])
+  exclusions = spec.get('exclude', [])
+
+  for key in list(axes) + list(defaults):
+    if key not in CASE_KEYS:
+      raise ValueError(f"Unknown sweep parameter {key}. Known parameters: {', '.join(CASE_KEYS)}.")
+  # Values end up in KEY=VALUE case lines, which only hold scalars.
+  scalars = [('defaults', key, value) for key, value in defaults.items()]
+  scalars += [('override', key, value) for override in overrides
+              for key, value in override.get('set', {}).items()]
+  for section, key, value in scalars:
+    if isinstance(value, (list, dict)):
+      raise ValueError(f"{key} = {value} under {section} is not a single value; "
+                       f"list the values to sweep under axes.")
+  if 'IODEPTH' in axes:
+    raise ValueError("IODEPTH can't be an axis: it is not part of the TESTCASE name, so cases differing "
+                     "only in IODEPTH would share their artifacts. Set it per case with an override, "
+                     "or plan one sweep per IODEPTH.")
+  missing = [key for key in REQUIRED_KEYS if key not in axes and key not in defaults]
+  if missing:
+    raise ValueError(f"No value for {', '.join(missing)}: set them under axes or defaults.")
+
+  costs = {key: cost for key, (_, cost) in CASE_KEYS.items()}
+  costs.update(spec.get('costs', {}))
+
+  # Rank of every value of a parameter, in the order the spec lists them.
+  ranks = {key: {} for key in CASE_KEYS}
+  for key, values in list(axes.items()) + [(key, [value]) for key, value in defaults.items()]:
+    for value in values:
+      ranks[key].setdefault(str(value), len(ranks[key]))
+
+  cases = []
+  seen = set()
+  axis_keys = list(axes)
+  for values in itertools.product(*(axes[key] for key in axis_keys)):
+    params = {key: str(value) for key, value in defaults.items()}
+    params.update((key, str(value)) for key, value in zip(axis_keys, values))
+    for override in overrides:
+      if matches(params, override.get('match', {})):
+        params.update((key, str(value)) for key, value in override.get('set', {}).items())
+    if any(matches(params, condition) for condition in exclusions):
+      continue
+    # Overrides may turn different combinations into the same case.
+    identity = tuple(params.get(key, '') for key in CASE_KEYS)
+    if identity in seen:
+      continue
+    seen.add(identity)
+    for key, value in params.items():
+      ranks[key].setdefault(value, len(ranks[key]))
+    cases.append(params)
+
+  names = [testcase_name(params) for params in cases]
+  duplicates = sorted({name for name in names if names.count(name) > 1})
+  if duplicates:
+    raise ValueError(f"Cases would share the artifacts of TESTCASE {', '.join(duplicates)}.")
+
+  spec_order = list(CASE_KEYS)
+  sort_keys = sorted(CASE_KEYS, key=lambda key: (-costs[key], spec_order.index(key)))
+  cases.sort(key=lambda params: [ranks[key].get(params.get(key), -1) for key in sort_keys])
+  return cases, costs
+
+def main():
+  """
+  Plans a sweep from a spec file and writes it as a cases file for
+  run-sweep.sh (one line of KEY=VALUE parameters per case).
+  """
+  parser = argparse.ArgumentParser(
+      description="Expand a sweep spec into an ordered list of test cases."
+  )
+  parser.add_argument(
+      "spec",
+      type=str,
+      help="Sweep spec file (.toml, or .yml/.yaml with PyYAML installed)"
+  )
+  parser.add_argument(
+      "--output",
+      type=str,
+      default="-",
+      help="Cases file to write ('-' for stdout)"
+  )
+  parser.add_argument(
+      "--list",
+      action="store_true",
+      help="Print the TESTCASE names and transition costs instead of the cases file"
+  )
+  args = parser.parse_args()
+
+  try:
+    spec = load_spec(args.spec)
+    cases, costs = plan_cases(spec)
+  except (OSError, ValueError, tomllib.TOMLDecodeError) as e:
+    print(f"Error: Could not plan sweep {args.spec}: {e}", file=sys.stderr)
+    return 1
+  if not cases:
+    print(f"Error: Sweep {args.spec} has no cases.", file=sys.stderr)
+    return 1
+
+  lines = []
+  previous = None
+  total_cost = 0
+  for params in cases:
+    cost = transition_cost(previous, params, costs)
+    total_cost += cost
+    previous = params
+    if args.list:
+      lines.append(f"{testcase_name(params)} iodepth={params['IODEPTH']} transition-cost={cost}")
+    else:
+      lines.append(' '.join(f"{key}={params[key]}" for key in CASE_KEYS if key in params))
+
+  if args.output == '-':
+    print('\n'.join(lines))
+  else:
+    with open(args.output, 'w') as f:
+      f.write('\n'.join(lines) + '\n')
+  print(f"Planned {len(cases)} cases with a total transition cost of {total_cost}.", file=sys.stderr)
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
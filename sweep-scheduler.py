@@ -0,0 +1,417 @@
+import argparse
+import importlib.util
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Case states, in the order a case goes through them. A case that ends in any
+# other way is 'failed'.
+CASE_STATES = ('pending', 'provisioning', 'running', 'uploaded', 'parsed')
+
+# gcloud errors worth retrying: quota exhausted, or no capacity in the zone
+# (the latter also moves the VM to the next zone).
+QUOTA_ERROR = re.compile(r'QUOTA_EXCEEDED|Quota .* exceeded|RATE_LIMIT_EXCEEDED|rateLimitExceeded')
+ZONE_ERROR = re.compile(r'ZONE_RESOURCE_POOL_EXHAUSTED|does not have enough resources|RESOURCE_NOT_AVAILABLE|stockout', re.IGNORECASE)
+
+# Directory of this script, which also holds sweep-planner.py and
+# create-vm-and-start-test.sh.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_sweep_planner():
+  """
+  Loads sweep-planner.py as a module.
+
+  Returns:
+      module: The sweep-planner module.
+  """
+  path = os.path.join(SCRIPT_DIR, 'sweep-planner.py')
+  spec = importlib.util.spec_from_file_location('sweep_planner', path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+def read_cases(file_path, planner):
+  """
+  Reads a cases file as written by sweep-planner.py.
+
+  Args:
+      file_path (str): Path of the cases file.
+      planner (module): The sweep-planner module, for the TESTCASE names.
+
+  Returns:
+      list[tuple[str, str]]: A list of (testcase, line) tuples in file order.
+  """
+  cases = []
+  with open(file_path, 'r') as f:
+    for line in f:
+      line = line.split('#', 1)[0].strip()
+      if not line:
+        continue
+      params = dict(assignment.split('=', 1) for assignment in line.split())
+      missing = [key for key in planner.TESTCASE_KEYS if key not in params]
+      if missing:
+        raise ValueError(f"Case \"{line}\" does not set {', '.join(missing)}.")
+      cases.append((planner.testcase_name(params), line))
+  return cases
+
+class CloudError(Exception):
+  """
+  A failed cloud operation. retryable is set for quota and zone capacity
+  errors, zone_exhausted for the latter.
+  """
+
+  def __init__(self, message, retryable=False, zone_exhausted=False):
+    super().__init__(message)
+    self.retryable = retryable
+    self.zone_exhausted = zone_exhausted
+
+def classify_error(output):
+  """
+  Turns the output of a failed gcloud command into a CloudError.
+
+  Args:
+      output (str): The combined stdout and stderr of the command.
+
+  Returns:
+      CloudError: A CloudError, retryable if the output shows a quota or zone
+          error.
+  """
+  zone_exhausted = bool(ZONE_ERROR.search(output))
+  retryable = zone_exhausted or bool(QUOTA_ERROR.search(output))
+  lines = output.strip().splitlines()
+  return CloudError(lines[-1] if lines else "unknown error", retryable, zone_exhausted)
+
+class GceBackend:
+  """
+  Runs sweeps on GCE VMs created by create-vm-and-start-test.sh and follows
+  their progress through the artifacts bucket.
+  """
+
+  def __init__(self, artifacts_bucket, project):
+    self.artifacts_bucket = artifacts_bucket
+    self.project = project
+
+  def create_vm(self, run_dir, cases_file, zone):
+    """
+    Creates a VM that runs the cases of cases_file, and returns its name.
+    Raises CloudError if the VM could not be created.
+    """
+    env = dict(os.environ, RUN_DIR=run_dir, ZONE=zone, ARTIFACTS_BUCKET=self.artifacts_bucket)
+    result = subprocess.run(
+        ['bash', 'create-vm-and-start-test.sh', '--sweep', cases_file],
+        cwd=SCRIPT_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    if result.returncode != 0:
+      raise classify_error(result.stdout)
+    return f"rapid-perf-{run_dir}"
+
+  def _newest_object_time(self, prefix):
+    """Returns the creation time of the newest object under prefix, or None."""
+    result = subprocess.run(['gsutil', 'ls', '-l', prefix],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    times = []
+    for line in result.stdout.splitlines():
+      fields = line.split()
+      if len(fields) == 3 and fields[2].startswith('gs://'):
+        times.append(datetime.strptime(fields[1], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc))
+    return max(times) if times else None
+
+  def _uploaded_since(self, prefix, since):
+    newest = self._newest_object_time(prefix)
+    return newest is not None and newest.timestamp() >= since
+
+  def case_progress(self, run_dir, index, testcase, since):
+    """
+    Returns how far case number index of a run got: 'running', 'uploaded'
+    (raw FIO output is in the bucket) or 'parsed' (results are in the
+    bucket). Only objects written after since (a Unix time) count, so earlier
+    runs of the case are ignored.
+    """
+    base = f"gs://{self.artifacts_bucket}/{testcase}"
+    if self._uploaded_since(f"{base}/results/fio_results.csv", since):
+      return 'parsed'
+    if self._uploaded_since(f"{base}/raw-fio-output/", since):
+      return 'uploaded'
+    return 'running'
+
+  def run_status(self, run_dir, since):
+    """Returns the exit status of the run, or None while it is running."""
+    status_file = f"gs://{self.artifacts_bucket}/{run_dir}/sweep-status.txt"
+    if not self._uploaded_since(status_file, since):
+      return None
+    result = subprocess.run(['gsutil', 'cat', status_file],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+      return int(result.stdout.strip() or 1)
+    except ValueError:
+      # A partial or garbled status file; count the run as failed.
+      return 1
+
+  def delete_vm(self, vm_name, zone):
+    """Deletes the VM."""
+    subprocess.run(['gcloud', 'compute', 'instances', 'delete', vm_name,
+                    f'--project={self.project}', f'--zone={zone}', '--quiet'],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+class FakeCloudBackend:
+  """
+  An offline stand-in for GceBackend to exercise the scheduler: at most quota
+  VMs can exist at once, VM creation fails with a quota or zone error at the
+  given rate, and every case takes case_seconds (half of it to upload).
+  """
+
+  def __init__(self, quota, error_rate, case_seconds, seed=None):
+    self.quota = quota
+    self.error_rate = error_rate
+    self.case_seconds = case_seconds
+    self.random = random.Random(seed)
+    self.lock = threading.Lock()
+    self.vms = {}
+
+  def create_vm(self, run_dir, cases_file, zone):
+    with self.lock:
+      if len(self.vms) >= self.quota:
+        raise CloudError("QUOTA_EXCEEDED: Quota 'C4_CPUS' exceeded.", retryable=True)
+      if self.random.random() < self.error_rate:
+        if self.random.random() < 0.5:
+          raise CloudError(f"ZONE_RESOURCE_POOL_EXHAUSTED in {zone}.", retryable=True, zone_exhausted=True)
+        raise CloudError("QUOTA_EXCEEDED: Quota 'C4_CPUS' exceeded.", retryable=True)
+      with open(cases_file, 'r') as f:
+        lines = [line.strip() for line in f if line.strip()]
+      vm_name = f"rapid-perf-{run_dir}"
+      self.vms[vm_name] = (run_dir, time.time(), len(lines))
+      return vm_name
+
+  def _vm_of(self, run_dir):
+    with self.lock:
+      for vm_run_dir, started, case_count in self.vms.values():
+        if vm_run_dir == run_dir:
+          return started, case_count
+    return None
+
+  def case_progress(self, run_dir, index, testcase, since):
+    vm = self._vm_of(run_dir)
+    if vm is None:
+      return 'running'
+    elapsed = time.time() - vm[0]
+    if elapsed >= (index + 1) * self.case_seconds:
+      return 'parsed'
+    if elapsed >= (index + 0.5) * self.case_seconds:
+      return 'uploaded'
+    return 'running'
+
+  def run_status(self, run_dir, since):
+    vm = self._vm_of(run_dir)
+    if vm is None or time.time() - vm[0] < vm[1] * self.case_seconds:
+      return None
+    return 0
+
+  def delete_vm(self, vm_name, zone):
+    with self.lock:
+      self.vms.pop(vm_name, None)
+
+class SweepScheduler:
+  """
+  Runs the cases of a sweep on up to max_vms VMs at once. Cases are packed
+  onto VMs in consecutive groups of cases_per_vm, keeping the planner's
+  order within a VM. VM creation is retried with exponential backoff on
+  quota and zone errors, moving to the next zone on the latter. The state of
+  every case and VM is kept in a JSON state file.
+  """
+
+  def __init__(self, backend, cases, sweep_name, state_file, max_vms=4, cases_per_vm=1,
+               zones=('us-west4-a',), max_attempts=8, backoff_seconds=30.0,
+               max_backoff_seconds=600.0, poll_seconds=60.0, vm_timeout_seconds=None):
+    self.backend = backend
+    self.sweep_name = sweep_name
+    self.state_file = state_file
+    self.max_vms = max_vms
+    self.zones = list(zones)
+    self.max_attempts = max_attempts
+    self.backoff_seconds = backoff_seconds
+    self.max_backoff_seconds = max_backoff_seconds
+    self.poll_seconds = poll_seconds
+    self.vm_timeout_seconds = vm_timeout_seconds
+    self.lock = threading.Lock()
+    self.groups = [cases[i:i + cases_per_vm] for i in range(0, len(cases), cases_per_vm)]
+    self.state = {
+        'sweep': sweep_name,
+        'cases': {testcase: {'state': 'pending', 'params': line, 'vm': None}
+                  for testcase, line in cases},
+        'vms': {},
+    }
+
+  def _update(self, testcase=None, vm=None, **fields):
+    """Updates a case or VM entry and writes the state file."""
+    with self.lock:
+      if testcase is not None:
+        entry = self.state['cases'][testcase]
+        if 'state' in fields and fields['state'] != entry['state']:
+          print(f"{testcase}: {entry['state']} -> {fields['state']}")
+      else:
+        entry = self.state['vms'].setdefault(vm, {})
+      entry.update(fields)
+      if self.state_file:
+        temp_path = f"{self.state_file}.tmp"
+        with open(temp_path, 'w') as f:
+          json.dump(self.state, f, indent=2)
+        os.replace(temp_path, self.state_file)
+
+  def _backoff(self, attempt):
+    """Returns the delay before retry number attempt, with jitter."""
+    delay = min(self.backoff_seconds * 2 ** attempt, self.max_backoff_seconds)
+    return delay * random.uniform(0.5, 1.0)
+
+  def _provision(self, run_dir, group):
+    """Creates the VM of a group of cases. Returns (vm_name, zone) or None."""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+      f.write(''.join(f"{line}\n" for _, line in group))
+      cases_file = f.name
+    zone_index = 0
+    try:
+      for attempt in range(self.max_attempts):
+        zone = self.zones[zone_index % len(self.zones)]
+        self._update(vm=run_dir, state='provisioning', zone=zone, attempts=attempt + 1)
+        try:
+          return self.backend.create_vm(run_dir, cases_file, zone), zone
+        except CloudError as e:
+          print(f"{run_dir}: could not create VM in {zone}: {e}")
+          self._update(vm=run_dir, last_error=str(e))
+          if not e.retryable:
+            break
+          if e.zone_exhausted:
+            zone_index += 1
+          if attempt + 1 < self.max_attempts:
+            time.sleep(self._backoff(attempt))
+    finally:
+      os.remove(cases_file)
+    return None
+
+  def run_group(self, index, group):
+    """Runs one group of cases on its own VM, from creation to deletion."""
+    run_dir = f"{self.sweep_name}-vm{index}"
+    for testcase, _ in group:
+      self._update(testcase, state='provisioning', vm=run_dir)
+    started = time.time()
+    provisioned = self._provision(run_dir, group)
+    if provisioned is None:
+      self._update(vm=run_dir, state='failed')
+      for testcase, _ in group:
+        self._update(testcase, state='failed')
+      return
+    vm_name, zone = provisioned
+    self._update(vm=run_dir, state='running', name=vm_name)
+    for testcase, _ in group:
+      self._update(testcase, state='running')
+
+    try:
+      while True:
+        status = self.backend.run_status(run_dir, started)
+        for case_index, (testcase, _) in enumerate(group):
+          current = self.state['cases'][testcase]['state']
+          if current != 'parsed':
+            progress = self.backend.case_progress(run_dir, case_index, testcase, started)
+            if CASE_STATES.index(progress) > CASE_STATES.index(current):
+              self._update(testcase, state=progress)
+        timed_out = (self.vm_timeout_seconds is not None
+                     and time.time() - started > self.vm_timeout_seconds)
+        if status is not None or timed_out:
+          break
+        time.sleep(self.poll_seconds)
+      for testcase, _ in group:
+        if self.state['cases'][testcase]['state'] != 'parsed':
+          self._update(testcase, state='failed')
+      self._update(vm=run_dir, state='timed out' if status is None else 'done', exit_status=status)
+    finally:
+      self.backend.delete_vm(vm_name, zone)
+
+  def run(self):
+    """
+    Runs all groups, at most max_vms at a time.
+
+    Returns:
+        int: The number of cases that did not reach the 'parsed' state.
+    """
+    with ThreadPoolExecutor(max_workers=self.max_vms) as executor:
+      futures = [executor.submit(self.run_group, index, group)
+                 for index, group in enumerate(self.groups)]
+      for future in futures:
+        future.result()
+    return sum(1 for case in self.state['cases'].values() if case['state'] != 'parsed')
+
+def main():
+  """
+  Schedules the cases of a cases file across several VMs in parallel.
+  """
+  parser = argparse.ArgumentParser(
+      description="Run the cases of a sweep in parallel on a bounded number of VMs."
+  )
+  parser.add_argument(
+      "cases_file",
+      type=str,
+      help="Cases file, e.g. written by sweep-planner.py"
+  )
+  parser.add_argument(
+      "--backend",
+      choices=["gce", "fake"],
+      default="gce",
+      help="Cloud backend; 'fake' simulates VMs locally for testing"
+  )
+  parser.add_argument("--artifacts-bucket", type=str, help="Artifacts bucket (gce backend)")
+  parser.add_argument("--project", type=str, default="gcs-fuse-test", help="GCP project (gce backend)")
+  parser.add_argument("--zones", type=str, default="us-west4-a",
+                      help="Comma-separated zones to try, in order, when a zone runs out of capacity")
+  parser.add_argument("--max-vms", type=int, default=4, help="Maximum number of VMs at once")
+  parser.add_argument("--cases-per-vm", type=int, default=1, help="Number of cases run in sequence on each VM")
+  parser.add_argument("--max-attempts", type=int, default=8, help="Attempts to create a VM before giving up")
+  parser.add_argument("--backoff-seconds", type=float, default=30.0, help="Initial retry delay, doubled per attempt")
+  parser.add_argument("--poll-seconds", type=float, default=60.0, help="Interval between progress checks")
+  parser.add_argument("--vm-timeout-hours", type=float, default=None, help="Give up on a VM after this many hours")
+  parser.add_argument("--sweep-name", type=str, default=None,
+                      help="Prefix of the artifacts directories and VM names (default: sweep-<timestamp>)")
+  parser.add_argument("--state-file", type=str, default="sweep-state.json", help="JSON file tracking case states")
+  parser.add_argument("--fake-quota", type=int, default=2, help="VMs the fake backend allows at once")
+  parser.add_argument("--fake-error-rate", type=float, default=0.2, help="Rate of quota/zone errors of the fake backend")
+  parser.add_argument("--fake-case-seconds", type=float, default=1.0, help="Duration of a case in the fake backend")
+  args = parser.parse_args()
+
+  planner = load_sweep_planner()
+  try:
+    cases = read_cases(args.cases_file, planner)
+  except (OSError, ValueError) as e:
+    print(f"Error: Could not read cases from {args.cases_file}: {e}", file=sys.stderr)
+    return 1
+
+  if args.backend == "gce":
+    if not args.artifacts_bucket:
+      print("Error: --artifacts-bucket is required with the gce backend.", file=sys.stderr)
+      return 1
+    backend = GceBackend(args.artifacts_bucket, args.project)
+  else:
+    backend = FakeCloudBackend(args.fake_quota, args.fake_error_rate, args.fake_case_seconds)
+
+  scheduler = SweepScheduler(
+      backend, cases,
+      sweep_name=args.sweep_name or f"sweep-{time.strftime('%Y%m%d-%H%M%S')}",
+      state_file=args.state_file,
+      max_vms=args.max_vms,
+      cases_per_vm=args.cases_per_vm,
+      zones=args.zones.split(','),
+      max_attempts=args.max_attempts,
+      backoff_seconds=args.backoff_seconds,
+      poll_seconds=args.poll_seconds,
+      vm_timeout_seconds=args.vm_timeout_hours * 3600 if args.vm_timeout_hours else None,
+  )
+  failed = scheduler.run()
+  print(f"{len(cases) - failed} of {len(cases)} cases parsed.")
+  return 1 if failed else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
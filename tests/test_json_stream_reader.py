@@ -0,0 +1,119 @@
+import importlib.util
+import io
+import json
+import os
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_parser():
+  path = os.path.join(SCRIPT_DIR, 'parser-script.py')
+  spec = importlib.util.spec_from_file_location('parser_script', path)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+parser = load_parser()
+
+WARNINGS = [
+    'fio: file "x missing',
+    'warning: ] here',
+    'fio: io_u error: [{"bad"}]',
+    'note: {',
+    'fio: } and ] and "',
+]
+
+def fio_document():
+  """A pretty-printed FIO output with the kinds of blocks load_fio_jobs skips."""
+  job = {
+      'jobname': 'seq_read',
+      'groupid': 0,
+      'error': 0,
+      'job options': {'name': 'seq_read', 'bs': '1M', 'filename': '/mnt/data'},
+      'read': {
+          'io_bytes': 1048576,
+          'bw': 1024,
+          'iops': 1.0,
+          'runtime': 1000,
+          'clat_ns': {
+              'min': 1, 'max': 9, 'mean': 5.0,
+              'percentile': {'50.000000': 5, '99.000000': 9},
+              'bins': {str(i): i % 3 for i in range(1, 40)},
+          },
+          'nested': {'a': [1, 2, {'b': [3, 4]}], 'c': 'text with ] and {'},
+      },
+      'write': {'io_bytes': 0, 'bw': 0, 'iops': 0.0, 'runtime': 0},
+  }
+  document = {
+      'fio version': 'fio-3.35',
+      'global options': {'directory': '/mnt'},
+      'jobs': [job],
+      'disk_util': [{'name': 'sda', 'read_ios': 10, 'util': 1.5}],
+  }
+  return json.dumps(document, indent=2)
+
+def skipped_line_numbers(text):
+  """Numbers of the lines inside the skipped blocks of the document."""
+  lines = text.split('\n')
+  numbers = []
+  inside = None
+  for number, line in enumerate(lines):
+    stripped = line.strip()
+    if inside is None:
+      for key in ('"job options"', '"nested"', '"disk_util"', '"bins"'):
+        if stripped.startswith(key) and stripped.endswith(('{', '[')):
+          inside = len(line) - len(line.lstrip())
+    elif len(line) - len(line.lstrip()) == inside and stripped[:1] in '}]':
+      inside = None
+    else:
+      numbers.append(number)
+  return numbers
+
+@pytest.mark.parametrize('chunk_size', [7, 64, 1 << 20])
+@pytest.mark.parametrize('warning', WARNINGS)
+def test_warning_lines_in_skipped_blocks(chunk_size, warning):
+  document = fio_document()
+  expected = parser.load_fio_jobs(io.StringIO(document))[0]
+  lines = document.split('\n')
+  for number in skipped_line_numbers(document):
+    text = '\n'.join(lines[:number] + [warning] + lines[number:])
+    reader = parser.JsonStreamReader(io.StringIO(text), chunk_size=chunk_size)
+    jobs = []
+    assert reader.peek() == '{'
+    for key in reader.iter_object():
+      if key == 'jobs':
+        for _ in reader.iter_array():
+          jobs.append(parser._read_fio_job(reader))
+      else:
+        reader.skip_value()
+    assert reader.peek() == ''
+    assert jobs == expected
+    assert reader.diagnostics == [warning]
+
+@pytest.mark.parametrize('chunk_size', [7, 1 << 20])
+def test_compact_document(chunk_size):
+  document = json.dumps(json.loads(fio_document()))
+  jobs, diagnostics = parser.load_fio_jobs(io.StringIO(document))
+  expected = parser.load_fio_jobs(io.StringIO(fio_document()))[0]
+  assert jobs == expected
+  assert not diagnostics
+
+def test_small_file_matches_streaming(tmp_path, monkeypatch):
+  path = tmp_path / 'output.json'
+  path.write_text(fio_document())
+  with open(path, 'r') as f:
+    decoded = parser.load_fio_jobs(f)
+  monkeypatch.setattr(parser, 'STREAM_THRESHOLD_BYTES', 0)
+  with open(path, 'r') as f:
+    streamed = parser.load_fio_jobs(f)
+  assert decoded == streamed
+  assert decoded[0][0]['read']['bw'] == 1024
+
+def test_small_file_with_warnings_falls_back_to_streaming(tmp_path):
+  path = tmp_path / 'output.json'
+  path.write_text('fio: some warning\n' + fio_document())
+  with open(path, 'r') as f:
+    jobs, diagnostics = parser.load_fio_jobs(f)
+  assert jobs == parser.load_fio_jobs(io.StringIO(fio_document()))[0]
+  assert diagnostics == ['fio: some warning']
@@ -0,0 +1,108 @@
+# Installs fio and gcsfuse from a cache of prebuilt binaries, building them
+# only when the cache has no entry for this toolchain.
+# Usage: bash toolchain-cache.sh <cache-root> <install-dir>
+# <cache-root> is a gs:// path in the artifacts bucket or, for testing, a local
+# directory. Entries are keyed by a hash of the fio tag, gcsfuse ref, Go
+# version, OS image and machine architecture, and hold the fio `make install`
+# tree (fio.tar.gz) and the gcsfuse binary with their SHA256SUMS. Afterwards
+# fio is installed under /usr/local, as `make install` does, and gcsfuse is
+# <install-dir>/gcsfuse. The versions can be overridden with FIO_TAG,
+# GCSFUSE_REF and GO_VERSION.
+set -e
+set -x
+
+CACHE_ROOT=${1%/}
+INSTALL_DIR=$2
+FIO_TAG=${FIO_TAG:-fio-3.39}
+GCSFUSE_REF=${GCSFUSE_REF:-v3.0.0}
+GO_VERSION=${GO_VERSION:-1.24.4}
+# OS image, e.g. ubuntu-24.04.
+OS_IMAGE=${OS_IMAGE:-$(. /etc/os-release && echo "${ID}-${VERSION_ID}")}
+ARCH=$(uname -m)
+# Go names the architectures of its downloads differently.
+case "$ARCH" in
+  x86_64) GO_ARCH=amd64 ;;
+  aarch64) GO_ARCH=arm64 ;;
+  *) echo "Error: No Go download for architecture ${ARCH}." >&2; exit 1 ;;
+esac
+
+CACHE_KEY=$(echo "fio=${FIO_TAG} gcsfuse=${GCSFUSE_REF} go=${GO_VERSION} os=${OS_IMAGE} arch=${ARCH}" | sha256sum | cut -d' ' -f1)
+CACHE_DIR="${CACHE_ROOT}/${CACHE_KEY}"
+BINARIES="fio.tar.gz gcsfuse"
+
+# Copies a file from or to the cache, which may be local or in a bucket.
+cache_cp() {
+  if [[ "$1" == gs://* || "$2" == gs://* ]]; then
+    gsutil -q cp "$1" "$2"
+  else
+    mkdir -p "$(dirname "$2")"
+    cp "$1" "$2"
+  fi
+}
+
+# Fetches the cached binaries into INSTALL_DIR and checks them against
+# SHA256SUMS. Fails on a cache miss or a corrupt entry.
+fetch_binaries() {
+  cache_cp "${CACHE_DIR}/SHA256SUMS" "${INSTALL_DIR}/SHA256SUMS" || return 1
+  for binary in $BINARIES; do
+    cache_cp "${CACHE_DIR}/${binary}" "${INSTALL_DIR}/${binary}" || return 1
+  done
+  (cd "$INSTALL_DIR" && sha256sum --check --strict SHA256SUMS) || return 1
+}
+
+# Builds fio and gcsfuse from source into INSTALL_DIR.
+build_binaries() {
+  local build_dir
+  build_dir=$(mktemp -d)
+  cd "$build_dir"
+
+  git clone -b ${FIO_TAG} https://github.com/axboe/fio.git
+  cd fio
+  ./configure && make
+  # Everything `make install` installs (fio, its helper scripts and man
+  # pages), to be unpacked at / on every VM.
+  make install DESTDIR="${build_dir}/fio-root"
+  tar -czf "${INSTALL_DIR}/fio.tar.gz" -C "${build_dir}/fio-root" .
+  cd ..
+
+  wget -O go_tar.tar.gz https://go.dev/dl/go${GO_VERSION}.linux-${GO_ARCH}.tar.gz -q
+  tar -xzf go_tar.tar.gz
+
+  git clone https://github.com/GoogleCloudPlatform/gcsfuse.git
+  cd gcsfuse
+  git checkout ${GCSFUSE_REF}
+  "${build_dir}/go/bin/go" build .
+  cp gcsfuse "${INSTALL_DIR}/"
+  cd ..
+
+  cd "$INSTALL_DIR"
+  rm -rf "$build_dir"
+  sha256sum $BINARIES > SHA256SUMS
+}
+
+mkdir -p "$INSTALL_DIR"
+INSTALL_DIR=$(cd "$INSTALL_DIR" && pwd)
+
+if fetch_binaries; then
+  echo "Toolchain cache hit: ${CACHE_DIR}"
+else
+  echo "Toolchain cache miss: ${CACHE_DIR}. Building fio and gcsfuse."
+  rm -f "${INSTALL_DIR}/SHA256SUMS"
+  build_binaries
+  # Store the binaries before their checksums, so an interrupted upload is
+  # never taken for a complete entry.
+  for binary in $BINARIES; do
+    cache_cp "${INSTALL_DIR}/${binary}" "${CACHE_DIR}/${binary}"
+  done
+  cache_cp "${INSTALL_DIR}/SHA256SUMS" "${CACHE_DIR}/SHA256SUMS"
+fi
+
+chmod 755 "${INSTALL_DIR}/gcsfuse"
+sudo tar -xzf "${INSTALL_DIR}/fio.tar.gz" -C / --no-same-owner --no-overwrite-dir
+cat > "${INSTALL_DIR}/toolchain.txt" <<EOT
+toolchain cache key : ${CACHE_KEY}
+fio tag : ${FIO_TAG}
+gcsfuse ref : ${GCSFUSE_REF}
+go version : ${GO_VERSION}
+os image : ${OS_IMAGE}
+EOT